@@ -0,0 +1,24 @@
+"""
+Offline benchmarks, run with `python -m benchmarks.<name>`.
+
+Importing peacebot reads every settings class from the environment. The
+benchmarks need no real credentials, so the settings default to placeholders
+when there is no .env to read them from.
+"""
+
+import os
+
+for key, value in {
+    "BOT_TOKEN": "benchmark",
+    "BOT_PREFIX": ";",
+    "BOT_TEST_GUILDS": "[]",
+    "POSTGRES_DB": "benchmark",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PASSWORD": "benchmark",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "benchmark",
+    "LAVALINK_PASSWORD": "benchmark",
+    "REDDIT_CLIENT_ID": "benchmark",
+    "REDDIT_CLIENT_SECRET": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,258 @@
+"""
+Resident memory of the hikari cache for every cache profile.
+
+Builds a bot with the intents and cache settings of each profile, feeds it
+synthetic GUILD_CREATE payloads shaped like what the gateway sends for those
+intents (members and presences only arrive with the matching intents), and
+reports the resident-set size growth per 1000 guilds. Every profile is measured
+in its own interpreter.
+
+Usage:
+    python -m benchmarks.cache_memory --guilds 2000 --members 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import subprocess
+import sys
+import typing as t
+
+import hikari
+
+from peacebot.core.utils.cache_profile import CACHE_PROFILES, resolve_cache_profile
+
+BOT_ID = 1
+
+
+class StubShard:
+    id = 0
+
+    async def request_guild_members(self, *_: t.Any, **__: t.Any) -> None:
+        pass
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except FileNotFoundError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def user_payload(user_id: int) -> dict[str, t.Any]:
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "discriminator": "0001",
+        "avatar": None,
+        "bot": user_id == BOT_ID,
+    }
+
+
+def member_payload(user_id: int, role_ids: list[str]) -> dict[str, t.Any]:
+    return {
+        "user": user_payload(user_id),
+        "nick": None,
+        "roles": role_ids,
+        "joined_at": "2021-01-01T00:00:00+00:00",
+        "premium_since": None,
+        "deaf": False,
+        "mute": False,
+        "pending": False,
+    }
+
+
+def presence_payload(user_id: int, guild_id: int) -> dict[str, t.Any]:
+    return {
+        "user": {"id": str(user_id)},
+        "guild_id": str(guild_id),
+        "status": "online",
+        "activities": [
+            {
+                "name": "a game",
+                "type": 0,
+                "created_at": 1_600_000_000_000,
+                "timestamps": {"start": 1_600_000_000_000},
+            }
+        ],
+        "client_status": {"desktop": "online"},
+    }
+
+
+def guild_payload(
+    guild_id: int, members: int, intents: hikari.Intents
+) -> dict[str, t.Any]:
+    base = guild_id * 100_000
+    role_ids = [str(base + i) for i in range(1, 11)]
+    channels = [
+        {
+            "id": str(base + 100 + i),
+            "type": 0 if i % 4 else 2,
+            "name": f"channel-{i}",
+            "position": i,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+            "topic": None,
+            "last_message_id": None,
+            "rate_limit_per_user": 0,
+            "bitrate": 64000,
+            "user_limit": 0,
+            "rtc_region": None,
+        }
+        for i in range(20)
+    ]
+    roles = [
+        {
+            "id": str(guild_id),
+            "name": "@everyone",
+            "color": 0,
+            "hoist": False,
+            "position": 0,
+            "permissions": "0",
+            "managed": False,
+            "mentionable": False,
+        },
+        *(
+            {
+                "id": role_id,
+                "name": f"role-{role_id}",
+                "color": 0,
+                "hoist": False,
+                "position": index + 1,
+                "permissions": "0",
+                "managed": False,
+                "mentionable": False,
+            }
+            for index, role_id in enumerate(role_ids)
+        ),
+    ]
+
+    # The gateway only sends other members and presences with the matching intents
+    user_ids = [BOT_ID]
+    if intents & hikari.Intents.GUILD_MEMBERS:
+        user_ids += range(base + 1000, base + 1000 + members)
+    presences = []
+    if intents & hikari.Intents.GUILD_PRESENCES:
+        presences = [presence_payload(user_id, guild_id) for user_id in user_ids]
+    voice_states = []
+    if intents & hikari.Intents.GUILD_VOICE_STATES:
+        voice_states = [
+            {
+                "guild_id": str(guild_id),
+                "channel_id": channels[0]["id"],
+                "user_id": str(user_id),
+                "session_id": "session",
+                "deaf": False,
+                "mute": False,
+                "self_deaf": False,
+                "self_mute": False,
+                "self_video": False,
+                "suppress": False,
+                "request_to_speak_timestamp": None,
+            }
+            for user_id in user_ids[:5]
+        ]
+
+    return {
+        "id": str(guild_id),
+        "unavailable": False,
+        "name": f"guild-{guild_id}",
+        "icon": None,
+        "splash": None,
+        "discovery_splash": None,
+        "owner_id": str(BOT_ID),
+        "afk_channel_id": None,
+        "afk_timeout": 300,
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "roles": roles,
+        "emojis": [],
+        "features": [],
+        "mfa_level": 0,
+        "application_id": None,
+        "system_channel_id": None,
+        "system_channel_flags": 0,
+        "rules_channel_id": None,
+        "joined_at": "2021-01-01T00:00:00+00:00",
+        "large": False,
+        "member_count": members + 1,
+        "voice_states": voice_states,
+        "members": [member_payload(user_id, role_ids[:2]) for user_id in user_ids],
+        "channels": channels,
+        "threads": [],
+        "presences": presences,
+        "max_presences": None,
+        "max_members": 250000,
+        "vanity_url_code": None,
+        "description": None,
+        "banner": None,
+        "premium_tier": 0,
+        "premium_subscription_count": 0,
+        "preferred_locale": "en-US",
+        "public_updates_channel_id": None,
+        "nsfw_level": 0,
+        "stage_instances": [],
+    }
+
+
+async def measure(profile: str, guilds: int, members: int) -> None:
+    intents, cache_settings = resolve_cache_profile(profile)
+    bot = hikari.GatewayBot(
+        "benchmark", intents=intents, cache_settings=cache_settings, banner=None
+    )
+    shard = StubShard()
+
+    gc.collect()
+    before = rss_bytes()
+    for guild_id in range(1, guilds + 1):
+        await bot.event_manager.on_guild_create(
+            shard, guild_payload(guild_id, members, intents)
+        )
+    gc.collect()
+    after = rss_bytes()
+
+    print(
+        f"{profile:<10} {(after - before) / guilds * 1000 / 2**20:10.1f} MiB"
+        f"   (members cached: {len(bot.cache.get_members_view())} guilds,"
+        f" presences cached: {len(bot.cache.get_presences_view())} guilds)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--guilds", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--profile", choices=CACHE_PROFILES)
+    args = parser.parse_args()
+
+    if args.profile:
+        asyncio.run(measure(args.profile, args.guilds, args.members))
+        return
+
+    print(f"RSS per 1000 guilds ({args.members} members each)")
+    for profile in CACHE_PROFILES:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.cache_memory",
+                "--guilds",
+                str(args.guilds),
+                "--members",
+                str(args.members),
+                "--profile",
+                profile,
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Guild placement and failover of the Lavalink node pool.
+
+Runs `LavalinkPool` over several stand-in lavasnek clients from
+`benchmarks.music_enqueue`, each with its own CPU cost per player, and joins
+a few hundred guilds the way the play command does, with node stats coming
+in every so often. Reports where the guilds ended up against putting every
+guild on a single node. Then one node stops, and its guilds are moved to the
+others; their queues, text channels and positions are checked on the nodes
+they were moved to.
+
+Usage:
+    python -m benchmarks.lavalink_pool --guilds 300 --nodes a:0.002 b:0.002 c:0.004
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import typing as t
+from types import SimpleNamespace
+
+from benchmarks.music_enqueue import StandInLavalink
+from benchmarks.queue_store import REQUESTER, StandInRedis, make_track
+from peacebot.core.utils.guild_queue import GuildQueues
+from peacebot.core.utils.lavalink_pool import LavalinkPool
+from peacebot.core.utils.queue_store import QueueStore
+
+BOT_ID = 1
+BASE_CPU = 0.05
+
+
+class StandInBot:
+    def __init__(self) -> None:
+        self.voice_states: dict[int, SimpleNamespace] = {}
+        self.cache = SimpleNamespace(
+            get_voice_state=lambda guild_id, _: self.voice_states.get(guild_id)
+        )
+        self.d = SimpleNamespace(
+            redis=StandInRedis(), data=SimpleNamespace(lavalink=None)
+        )
+        self.d.queue_store = QueueStore(self)
+        self.d.queues = GuildQueues(
+            lambda: self.d.data.lavalink, on_change=self.d.queue_store.mark
+        )
+
+    def get_me(self) -> SimpleNamespace:
+        return SimpleNamespace(id=BOT_ID)
+
+    async def update_voice_state(
+        self, guild_id: int, channel_id: int | None, **kwargs: t.Any
+    ) -> None:
+        # Discord answers with the bot's voice state and the voice server
+        asyncio.create_task(self._voice_events(guild_id, channel_id))
+
+    async def _voice_events(self, guild_id: int, channel_id: int | None) -> None:
+        pool: LavalinkPool = self.d.data.lavalink
+        state = SimpleNamespace(
+            guild_id=guild_id,
+            user_id=BOT_ID,
+            session_id=f"session-{guild_id}",
+            channel_id=channel_id,
+        )
+        if channel_id is None:
+            self.voice_states.pop(guild_id, None)
+        else:
+            self.voice_states[guild_id] = state
+        await pool.on_voice_state_update(SimpleNamespace(state=state))
+        if channel_id is not None:
+            await pool.on_voice_server_update(
+                SimpleNamespace(
+                    guild_id=guild_id,
+                    endpoint="voice.example.com:443",
+                    token=f"token-{guild_id}",
+                )
+            )
+
+
+def cpu_load(client: StandInLavalink, cost: float) -> float:
+    return BASE_CPU + cost * len(client.nodes)
+
+
+def send_stats(
+    pool: LavalinkPool, clients: dict[str, StandInLavalink], costs: dict[str, float]
+) -> None:
+    for name, client in clients.items():
+        if client.down:
+            continue
+        pool.update_stats(
+            name,
+            SimpleNamespace(
+                playing_players=len(client.nodes),
+                cpu_system_load=min(cpu_load(client, costs[name]), 1.0),
+                frame_stats_deficit=0 if client.nodes else None,
+            ),
+        )
+
+
+async def play(
+    bot: StandInBot, catalog: dict[str, t.Any], guild_id: int, tracks: int
+) -> None:
+    lavalink = bot.d.data.lavalink
+    connection_info = await lavalink.join(guild_id, guild_id * 10)
+    await lavalink.create_session(connection_info)
+    node = await lavalink.get_guild_node(guild_id)
+    node.set_data({guild_id: guild_id * 100})
+    queued = [make_track(guild_id, index) for index in range(tracks)]
+    for track in queued:
+        catalog[track.info.uri] = track
+    await lavalink.play(guild_id, queued[0]).requester(REQUESTER).queue()
+    queue = await bot.d.queues.get(guild_id)
+    queue.extend(
+        lavalink.play(guild_id, track).requester(REQUESTER).to_track_queue()
+        for track in queued[1:]
+    )
+
+
+def report(
+    name: str, clients: dict[str, StandInLavalink], costs: dict[str, float]
+) -> None:
+    placed = "   ".join(
+        f"{node}: {len(client.nodes):4} guilds, CPU {cpu_load(client, costs[node]):4.0%}"
+        for node, client in clients.items()
+        if not client.down
+    )
+    print(f"  {name:<12} {placed}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    costs = {
+        name: float(cost)
+        for name, _, cost in map(lambda n: n.partition(":"), args.nodes)
+    }
+    # One catalog, as every Lavalink node can load the same tracks
+    catalog: dict[str, t.Any] = {}
+    clients = {name: StandInLavalink(0) for name in costs}
+    for client in clients.values():
+        client.catalog = catalog
+
+    bot = StandInBot()
+    pool = LavalinkPool(
+        bot,
+        {name: f"lavalink-{name}:2333" for name in costs},
+        detach=bot.d.queue_store.detach,
+        reattach=bot.d.queue_store.resume,
+    )
+
+    async def build(node: t.Any) -> StandInLavalink:
+        return clients[node.name]
+
+    await pool.connect(build)
+    bot.d.data.lavalink = pool
+    # Idle nodes, which send no frame stats
+    send_stats(pool, clients, costs)
+    assert all(node.frame_deficit == 0 for node in pool.healthy)
+
+    print(f"{args.guilds} guilds on {len(clients)} nodes ({', '.join(args.nodes)})")
+    single_cpu = BASE_CPU + min(costs.values()) * args.guilds
+    print(f"  {'single node':<12} {args.guilds:4} guilds, CPU {single_cpu:4.0%}")
+    for guild_id in range(1, args.guilds + 1):
+        await play(bot, catalog, guild_id, args.tracks)
+        if guild_id % args.stats_every == 0:
+            send_stats(pool, clients, costs)
+    send_stats(pool, clients, costs)
+    report("pool", clients, costs)
+
+    rng = random.Random(0)
+    for guild_id in range(1, args.guilds + 1):
+        bot.d.queue_store.update_position(guild_id, rng.randrange(200_000))
+        await bot.d.queues.release(guild_id)
+
+    failed = pool.nodes[args.fail]
+    moving = sorted(failed.guilds)
+    before = {
+        guild_id: [
+            tq.track.info.uri for tq in clients[args.fail].nodes[guild_id]._queue
+        ]
+        for guild_id in moving
+    }
+    positions = {guild_id: bot.d.queue_store.position(guild_id) for guild_id in moving}
+    clients[args.fail].down = True
+    start = time.perf_counter()
+    await pool.fail(failed)
+    elapsed = time.perf_counter() - start
+    for guild_id in moving:
+        await bot.d.queues.release(guild_id)
+
+    for guild_id in moving:
+        node = pool.node_of(guild_id)
+        assert node is not None and node.healthy, f"guild {guild_id} was not moved"
+        moved = clients[node.name].nodes[guild_id]
+        after = [tq.track.info.uri for tq in moved._queue]
+        assert before[guild_id] == after, f"the queue of guild {guild_id} changed"
+        assert moved.get_data() == {guild_id: guild_id * 100}
+        assert 0 <= moved._queue[0].start_time - positions[guild_id] < 5000
+    send_stats(pool, clients, costs)
+    print(
+        f"\n{args.fail} stopped, moved {pool.failovers}/{len(moving)} guilds"
+        f" in {elapsed * 1e3:.1f}ms, queues and positions checked"
+    )
+    report("after", clients, costs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--guilds", type=int, default=300)
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument(
+        "--nodes",
+        nargs="+",
+        default=["a:0.002", "b:0.002", "c:0.004"],
+        help="name:CPU share per player",
+    )
+    parser.add_argument("--stats-every", type=int, default=25)
+    parser.add_argument("--fail", default="b")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
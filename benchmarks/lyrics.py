@@ -0,0 +1,173 @@
+"""
+Latency of /lyrics with the Redis lyrics cache and prefetching.
+
+Plays tracks with a Zipf popularity across guilds, with a few different
+uploads per song ("(Official Video)", "[Lyrics]", ...), and asks for the
+lyrics of a share of them shortly after they start. Compares asking the
+lyrics source on every /lyrics (as the command used to) with
+`LyricsService`, which prefetches on track start and caches in a stand-in
+Redis. The source is the offline `LocalLyrics` behind a fixed latency. Also
+times showing the first lyrics page, eagerly and with lazy pages.
+
+Usage:
+    python -m benchmarks.lyrics --plays 2000 --songs 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+import typing as t
+
+from benchmarks.queue_pages import measure
+from peacebot.core.plugins.Music.music import LYRICS_PAGE_LINES, _lyrics_page
+from peacebot.core.utils.lyrics import LocalLyrics, LyricsService
+from peacebot.core.utils.pagination import LazyPages
+
+UPLOADS = ("{}", "{} (Official Video)", "{} [Lyrics]", "{} (Official Audio)")
+
+
+class StandInRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        await asyncio.sleep(0)
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        await asyncio.sleep(0)
+        self.values[key] = value.encode()
+
+
+class SlowLyrics(LocalLyrics):
+    def __init__(self, lyrics: dict[str, str], latency: float) -> None:
+        super().__init__(lyrics)
+        self.latency = latency
+        self.requests = 0
+
+    async def fetch(self, title: str) -> str | None:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return await super().fetch(title)
+
+
+def make_lyrics(songs: int, lines: int) -> dict[str, str]:
+    return {
+        f"Artist {i} - Song {i}": "\n".join(
+            f"Line {n} of the lyrics of song {i}" for n in range(lines)
+        )
+        for i in range(songs)
+        # Some songs have no lyrics
+        if i % 10
+    }
+
+
+def make_plays(
+    args: argparse.Namespace, rng: random.Random
+) -> list[tuple[float, str, bool]]:
+    weights = [1 / (rank + 1) for rank in range(args.songs)]
+    songs = rng.choices(range(args.songs), weights, k=args.plays)
+    return [
+        (
+            index * args.spacing,
+            rng.choice(UPLOADS).format(f"Artist {song} - Song {song}"),
+            rng.random() < args.ask,
+        )
+        for index, song in enumerate(songs)
+    ]
+
+
+async def replay(
+    plays: list[tuple[float, str, bool]],
+    think: float,
+    track_start: t.Callable[[str], None],
+    lyrics: t.Callable[[str], t.Awaitable[t.Any]],
+) -> list[float]:
+    latencies: list[float] = []
+
+    async def play(at: float, title: str, ask: bool) -> None:
+        await asyncio.sleep(at)
+        track_start(title)
+        if not ask:
+            return
+        await asyncio.sleep(think)
+        start = time.perf_counter()
+        await lyrics(title)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(play(*entry) for entry in plays))
+    return latencies
+
+
+def report(name: str, latencies: list[float], requests: int) -> None:
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)]
+    print(
+        f"  {name:<10} {len(latencies):5} /lyrics   mean {statistics.mean(latencies) * 1e3:7.2f}ms"
+        f"   p95 {p95 * 1e3:7.2f}ms   {requests:5} source requests"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    catalog = make_lyrics(args.songs, args.lines)
+    plays = make_plays(args, random.Random(0))
+    print(
+        f"{args.plays} plays of {args.songs} songs, /lyrics for {args.ask:.0%},"
+        f" {args.think * 1e3:.0f}ms after the track starts,"
+        f" source latency {args.latency * 1e3:.0f}ms"
+    )
+
+    source = SlowLyrics(catalog, args.latency)
+    latencies = await replay(plays, args.think, lambda _: None, source.fetch)
+    report("uncached", latencies, source.requests)
+
+    source = SlowLyrics(catalog, args.latency)
+    service = LyricsService(StandInRedis(), source)
+    latencies = await replay(plays, args.think, service.prefetch, service.get)
+    report("service", latencies, source.requests)
+    print(
+        f"  {'':<10} {service.hits} cache hits, {service.misses} misses,"
+        f" {service.coalesced} coalesced, {service.prefetched} prefetched"
+    )
+
+    lines = next(iter(catalog.values())).splitlines() * args.repeat
+
+    def eager() -> None:
+        [
+            _lyrics_page("Song", "https://youtu.be/x", lines, index)
+            for index in range(math.ceil(len(lines) / LYRICS_PAGE_LINES))
+        ][0]
+
+    def lazy() -> None:
+        LazyPages(
+            math.ceil(len(lines) / LYRICS_PAGE_LINES),
+            lambda index: _lyrics_page("Song", "https://youtu.be/x", lines, index),
+        )[0]
+
+    print(f"\n== first page of {len(lines)} lines ==")
+    measure("eager", eager)
+    measure("lazy", lazy)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plays", type=int, default=2000)
+    parser.add_argument("--songs", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=60)
+    parser.add_argument("--ask", type=float, default=0.2)
+    parser.add_argument("--think", type=float, default=0.5)
+    parser.add_argument("--spacing", type=float, default=0.001)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
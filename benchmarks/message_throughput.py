@@ -0,0 +1,229 @@
+"""
+Offline throughput benchmark for the GuildMessageCreateEvent hot path.
+
+Drives synthetic guild messages through `Peacebot.determine_prefix`,
+`Peacebot.on_message` and the AutoResponse `on_message` listener, against an
+in-memory SQLite database and stubbed channels, and reports the throughput,
+the p50/p99 latency of every handler and the database queries per message.
+
+Usage:
+    python -m benchmarks.message_throughput --messages 20000 --guilds 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import typing as t
+from types import SimpleNamespace
+
+import hikari
+from tortoise import Tortoise
+
+from models import AutoResponseModel, GuildModel
+from peacebot.core.bot import Peacebot
+from peacebot.core.plugins.AutoResponse.autoresponse import (
+    on_message as autoresponse_on_message,
+)
+
+BOT_ID = hikari.Snowflake(1000)
+DB_METHODS = (
+    "execute_insert",
+    "execute_many",
+    "execute_query",
+    "execute_query_dict",
+    "execute_script",
+)
+WORDS = ("hello", "there", "how", "is", "everyone", "doing", "today", "lol", "gg")
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.responses = 0
+        self.latencies: dict[str, list[float]] = {
+            "determine_prefix": [],
+            "on_message": [],
+            "autoresponse": [],
+        }
+
+
+class StubChannel:
+    def __init__(self, stats: Stats) -> None:
+        self.stats = stats
+
+    async def send(self, *_: t.Any, **__: t.Any) -> None:
+        self.stats.responses += 1
+
+
+class StubMessage:
+    def __init__(
+        self, stats: Stats, id: int, guild_id: int, channel_id: int, content: str
+    ) -> None:
+        self.stats = stats
+        self.id = hikari.Snowflake(id)
+        self.guild_id = hikari.Snowflake(guild_id)
+        self.channel_id = hikari.Snowflake(channel_id)
+        self.content = content
+
+    async def respond(self, *_: t.Any, **__: t.Any) -> None:
+        self.stats.responses += 1
+
+
+class StubEvent:
+    is_human = True
+
+    def __init__(self, app: Peacebot, message: StubMessage) -> None:
+        self.app = app
+        self.message = message
+        self.guild_id = message.guild_id
+        self.author = SimpleNamespace(id=hikari.Snowflake(1), mention="<@1>")
+        self._channel = StubChannel(message.stats)
+
+    def get_channel(self) -> StubChannel:
+        return self._channel
+
+
+class QueryCounter:
+    """
+    Counts the queries sent through the default connection's client class,
+    which also covers the transaction wrappers derived from it.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        client_class = type(Tortoise.get_connection("default"))
+        for name in DB_METHODS:
+            setattr(client_class, name, self._counted(getattr(client_class, name)))
+
+    def _counted(self, method: t.Callable) -> t.Callable:
+        async def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            self.count += 1
+            return await method(*args, **kwargs)
+
+        return wrapper
+
+
+async def seed_database(guilds: int, autoresponses: int) -> None:
+    await Tortoise.init(
+        db_url="sqlite://:memory:",
+        modules={"main": ["models"]},
+    )
+    await Tortoise.generate_schemas()
+    await GuildModel.bulk_create([GuildModel(id=i) for i in range(1, guilds + 1)])
+    await AutoResponseModel.bulk_create(
+        [
+            AutoResponseModel(
+                guild_id=guild_id,
+                trigger=f"trigger{i}",
+                response="Triggered!",
+                extra_text=bool(i % 2),
+                created_by=1,
+            )
+            for guild_id in range(1, guilds + 1)
+            for i in range(autoresponses)
+        ]
+    )
+
+
+def build_events(
+    bot: Peacebot,
+    stats: Stats,
+    first_id: int,
+    count: int,
+    guilds: int,
+    autoresponses: int,
+) -> list[StubEvent]:
+    rng = random.Random(first_id)
+    events = []
+    for message_id in range(first_id, first_id + count):
+        roll = rng.random()
+        if roll < 0.02:
+            content = f"<@{BOT_ID}>"
+        elif roll < 0.1 and autoresponses:
+            content = f"trigger{rng.randrange(autoresponses)}"
+        else:
+            content = " ".join(rng.choices(WORDS, k=rng.randint(1, 12)))
+
+        guild_id = rng.randint(1, guilds)
+        message = StubMessage(stats, message_id, guild_id, guild_id * 10, content)
+        events.append(StubEvent(bot, message))
+
+    return events
+
+
+async def timed(stats: Stats, name: str, coro: t.Awaitable) -> None:
+    start = time.perf_counter()
+    await coro
+    stats.latencies[name].append(time.perf_counter() - start)
+
+
+async def handle(bot: Peacebot, stats: Stats, event: StubEvent) -> None:
+    await asyncio.gather(
+        timed(stats, "determine_prefix", bot.determine_prefix(bot, event.message)),
+        timed(stats, "on_message", bot.on_message(event)),
+        timed(stats, "autoresponse", autoresponse_on_message(event)),
+    )
+
+
+def report(name: str, stats: Stats, messages: int, elapsed: float) -> None:
+    print(f"\n== {name} ==")
+    print(f"messages:            {messages}")
+    print(f"throughput:          {messages / elapsed:,.0f} msg/s")
+    print(f"db queries/message:  {stats.queries / messages:.3f}")
+    print(f"responses sent:      {stats.responses}")
+    for handler, latencies in stats.latencies.items():
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{handler + ':':<20} p50 {percentiles[49] * 1e6:8.1f}us"
+            f"   p99 {percentiles[98] * 1e6:8.1f}us"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    await seed_database(args.guilds, args.autoresponses)
+    bot = Peacebot()
+    bot.get_me = lambda: SimpleNamespace(id=BOT_ID, mention=f"<@{BOT_ID}>")
+    queries = QueryCounter()
+
+    for round_ in range(1, args.rounds + 1):
+        stats = Stats()
+        events = build_events(
+            bot,
+            stats,
+            (round_ - 1) * args.messages + 1,
+            args.messages,
+            args.guilds,
+            args.autoresponses,
+        )
+        queries_before = queries.count
+        start = time.perf_counter()
+        for index in range(0, len(events), args.concurrency):
+            await asyncio.gather(
+                *(
+                    handle(bot, stats, event)
+                    for event in events[index : index + args.concurrency]
+                )
+            )
+        elapsed = time.perf_counter() - start
+        stats.queries = queries.count - queries_before
+        report(f"round {round_}", stats, len(events), elapsed)
+
+    await Tortoise.close_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--autoresponses", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Playlist enqueue time of the play command.
+
+Queues synthetic playlists on a local stand-in for lavasnek's `Lavalink`,
+which charges a fixed round trip for every awaited call like the real client
+does when it takes the node lock and talks to the Lavalink websocket, and
+compares queueing every track with `PlayBuilder.queue()` with `_enqueue`,
+which queues the first track and appends the rest in one node update. Reports
+the time until the reply can be sent and until the whole playlist is queued.
+
+Usage:
+    python -m benchmarks.music_enqueue --tracks 500 --latency 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import time
+import typing as t
+from types import SimpleNamespace
+
+import lavasnek_rs
+
+from peacebot.core.plugins.Music import _enqueue
+from peacebot.core.utils.guild_queue import GuildQueue
+
+GUILD_ID = 1
+REQUESTER = 2
+
+
+class StandInNode:
+    def __init__(self, guild: int) -> None:
+        self.guild = guild
+        self.now_playing: SimpleNamespace | None = None
+        self._queue: list[SimpleNamespace] = []
+        self._data: dict[int, int] = {}
+
+    # Like lavasnek, the node converts every entry of its queue on the way
+    # in and out of Rust
+    @property
+    def queue(self) -> list[SimpleNamespace]:
+        return [copy.copy(track_queue) for track_queue in self._queue]
+
+    @queue.setter
+    def queue(self, queue: list[SimpleNamespace]) -> None:
+        self._queue = [copy.copy(track_queue) for track_queue in queue]
+
+    def get_data(self) -> dict[int, int]:
+        return self._data
+
+    def set_data(self, data: dict[int, int]) -> None:
+        self._data.clear()
+        self._data.update(data)
+
+
+class StandInPlayBuilder:
+    def __init__(self, lavalink: StandInLavalink, guild_id: int, track: t.Any) -> None:
+        self.lavalink = lavalink
+        self.guild_id = guild_id
+        self.track = track
+        self._requester = 0
+        self._start_time = 0
+
+    def requester(self, requester: int) -> StandInPlayBuilder:
+        self._requester = requester
+        return self
+
+    def start_time_millis(self, start: int) -> StandInPlayBuilder:
+        self._start_time = start
+        return self
+
+    def to_track_queue(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            track=self.track,
+            requester=self._requester,
+            start_time=self._start_time,
+            end_time=0,
+        )
+
+    async def queue(self) -> None:
+        await self.lavalink.round_trip()
+        node = self.lavalink.nodes.setdefault(self.guild_id, StandInNode(self.guild_id))
+        track_queue = self.to_track_queue()
+        if not node._queue:
+            node.now_playing = track_queue
+        node._queue.append(track_queue)
+
+
+class StandInLavalink:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.nodes: dict[int, StandInNode] = {}
+        # Tracks that get_tracks can load, by URI
+        self.catalog: dict[str, t.Any] = {}
+        self.round_trips = 0
+        # A stopped Lavalink server, only lavasnek's own state still answers
+        self.down = False
+
+    async def round_trip(self) -> None:
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    def play(self, guild_id: int, track: t.Any) -> StandInPlayBuilder:
+        return StandInPlayBuilder(self, guild_id, track)
+
+    async def get_guild_node(self, guild_id: int) -> StandInNode | None:
+        await self.round_trip()
+        node = self.nodes.get(guild_id)
+        if node is None:
+            return None
+        copy = StandInNode(guild_id)
+        copy.now_playing, copy.queue = node.now_playing, node._queue
+        copy._data = node._data
+        return copy
+
+    async def set_guild_node(self, guild_id: int, node: StandInNode) -> None:
+        await self.round_trip()
+        self.nodes[guild_id] = node
+
+    async def join(self, guild_id: int, channel_id: int) -> dict[str, t.Any]:
+        await self.round_trip()
+        return {"guild_id": guild_id, "channel_id": channel_id}
+
+    async def create_session(self, connection_info: dict[str, t.Any]) -> None:
+        await self.round_trip()
+        guild_id = connection_info["guild_id"]
+        self.nodes.setdefault(guild_id, StandInNode(guild_id))
+
+    async def stop(self, guild_id: int) -> None:
+        await self.round_trip()
+        node = self.nodes.get(guild_id)
+        if node is not None:
+            node.now_playing, node._queue = None, []
+
+    async def destroy(self, guild_id: int) -> None:
+        await self.round_trip()
+
+    async def remove_guild_node(self, guild_id: int) -> None:
+        self.nodes.pop(guild_id, None)
+
+    async def remove_guild_from_loops(self, guild_id: int) -> None:
+        pass
+
+    def raw_handle_event_voice_state_update(self, *args: t.Any) -> None:
+        pass
+
+    async def raw_handle_event_voice_server_update(self, *args: t.Any) -> None:
+        pass
+
+    async def get_tracks(self, uri: str) -> SimpleNamespace:
+        if self.down:
+            raise lavasnek_rs.NetworkError("Lavalink is not reachable")
+        await self.round_trip()
+        track = self.catalog.get(uri)
+        return SimpleNamespace(tracks=[track] if track is not None else [])
+
+
+async def sequential(lavalink: StandInLavalink, tracks: list[t.Any]) -> float:
+    for track in tracks:
+        await lavalink.play(GUILD_ID, track).requester(REQUESTER).queue()
+    return time.perf_counter()
+
+
+async def batched(lavalink: StandInLavalink, tracks: list[t.Any]) -> float:
+    first, *rest = tracks
+    await lavalink.play(GUILD_ID, first).requester(REQUESTER).queue()
+    replied = time.perf_counter()
+    queue = GuildQueue(lambda: lavalink, GUILD_ID)
+    await _enqueue(lavalink, queue, rest, REQUESTER)
+    await queue.flush()
+    return replied
+
+
+async def measure(
+    name: str,
+    enqueue: t.Callable[[StandInLavalink, list[t.Any]], t.Awaitable[float]],
+    tracks: int,
+    latency: float,
+) -> None:
+    lavalink = StandInLavalink(latency)
+    playlist = [SimpleNamespace(track=f"track-{i}") for i in range(tracks)]
+
+    start = time.perf_counter()
+    replied = await enqueue(lavalink, playlist)
+    done = time.perf_counter()
+
+    queued = [item.track for item in lavalink.nodes[GUILD_ID].queue]
+    assert queued == playlist, "the playlist was not queued in order"
+    print(
+        f"  {name:<11} reply after {(replied - start) * 1e3:9.2f}ms"
+        f"   queued after {(done - start) * 1e3:9.2f}ms"
+        f"   ({lavalink.round_trips} round trips)"
+    )
+
+
+async def run(tracks: list[int], latency: float) -> None:
+    for count in tracks:
+        print(f"\n== {count} tracks, {latency * 1e3:g}ms per round trip ==")
+        await measure("sequential", sequential, count, latency)
+        await measure("batched", batched, count, latency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, nargs="+", default=[50, 500, 1000])
+    parser.add_argument(
+        "--latency", type=float, default=1, help="milliseconds per round trip"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.tracks, args.latency / 1e3))
+
+
+if __name__ == "__main__":
+    main()
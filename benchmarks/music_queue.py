@@ -0,0 +1,124 @@
+"""
+Cost of queue edits on long queues.
+
+Fills the stand-in lavasnek node from `benchmarks.music_enqueue` with a long
+queue and replays a burst of move, remove, shuffle and re-queue edits, once
+the way the commands used to do them (read `node.queue`, edit the list and
+write it back with `set_guild_node` for every edit) and once through
+`GuildQueue`, which edits its own copy and writes it back once per burst.
+
+Usage:
+    python -m benchmarks.music_queue --tracks 1000 5000 --edits 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import typing as t
+from types import SimpleNamespace
+
+from benchmarks.music_enqueue import GUILD_ID, StandInLavalink
+from peacebot.core.utils.guild_queue import GuildQueue
+
+Edit = tuple[str, int, int]
+
+
+def make_edits(tracks: int, edits: int, seed: int = 0) -> list[Edit]:
+    rng = random.Random(seed)
+    operations = ("move", "move", "remove", "requeue", "shuffle")
+    return [
+        (
+            rng.choice(operations),
+            rng.randrange(1, tracks // 2),
+            rng.randrange(1, tracks // 2),
+        )
+        for _ in range(edits)
+    ]
+
+
+async def fill(lavalink: StandInLavalink, tracks: int) -> None:
+    for i in range(tracks):
+        track = SimpleNamespace(
+            track=f"track-{i}", info=SimpleNamespace(title=f"Song {i}", length=180_000)
+        )
+        await lavalink.play(GUILD_ID, track).requester(1).queue()
+
+
+async def legacy(lavalink: StandInLavalink, edits: list[Edit]) -> None:
+    for operation, a, b in edits:
+        node = await lavalink.get_guild_node(GUILD_ID)
+        queue = node.queue
+        if operation == "move":
+            queue.insert(b, queue.pop(a))
+        elif operation == "remove":
+            queue.pop(a)
+        elif operation == "requeue":
+            queue.insert(1, queue[0])
+        else:
+            upcoming = queue[1:]
+            random.shuffle(upcoming)
+            queue[1:] = upcoming
+        node.queue = queue
+        await lavalink.set_guild_node(GUILD_ID, node)
+
+
+async def guild_queue(lavalink: StandInLavalink, edits: list[Edit]) -> None:
+    queue = await GuildQueue(lambda: lavalink, GUILD_ID).load()
+    for operation, a, b in edits:
+        if operation == "move":
+            queue.move(a, b)
+        elif operation == "remove":
+            queue.remove(a)
+        elif operation == "requeue":
+            queue.requeue()
+        else:
+            queue.shuffle()
+    await queue.flush()
+
+
+async def measure(
+    name: str,
+    replay: t.Callable[[StandInLavalink, list[Edit]], t.Awaitable[None]],
+    tracks: int,
+    edits: list[Edit],
+    latency: float,
+) -> None:
+    lavalink = StandInLavalink(latency)
+    await fill(lavalink, tracks)
+    lavalink.round_trips = 0
+
+    start = time.perf_counter()
+    await replay(lavalink, edits)
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {name:<11} {elapsed * 1e3:9.2f}ms"
+        f"   {elapsed / len(edits) * 1e6:9.1f}us per edit"
+        f"   ({lavalink.round_trips} round trips)"
+    )
+
+
+async def run(tracks: list[int], edits: int, latency: float) -> None:
+    for count in tracks:
+        edit_list = make_edits(count, edits)
+        print(f"\n== {count} tracks, {edits} edits ==")
+        await measure("legacy", legacy, count, edit_list, latency)
+        await measure("GuildQueue", guild_queue, count, edit_list, latency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="milliseconds per round trip"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.tracks, args.edits, args.latency / 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Cost of announcing track changes under track turnover.
+
+Plays a few tracks back to back in many guilds and announces every track the
+way `EventHandler.track_start` used to (a new message with its own miru view,
+then `view.wait()` inside the Lavalink event callback) and with
+`NowPlayingAnnouncer`, which edits one message per guild from a background
+task. Reports how long the track events take to return, how many views and
+tasks are still alive after the turnover, and the messages sent and edited on
+a stand-in REST client with a fixed latency.
+
+Usage:
+    python -m benchmarks.now_playing --guilds 200 --tracks 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import time
+import tracemalloc
+import typing as t
+from types import SimpleNamespace
+
+import hikari
+import miru
+from hikari.impl.special_endpoints import ActionRowBuilder
+
+from peacebot.core.utils.now_playing import NowPlayingAnnouncer
+
+VIEW_TIMEOUT = 120
+
+
+class StandInApp(hikari.GatewayBot):
+    # miru waits for interactions through the bot, which refuses to while it
+    # is not connected, the event manager works all the same
+    async def wait_for(
+        self,
+        event_type: t.Type[hikari.Event],
+        /,
+        timeout: float | None,
+        predicate: t.Callable[[t.Any], bool] | None = None,
+    ) -> t.Any:
+        return await self.event_manager.wait_for(
+            event_type, timeout=timeout, predicate=predicate
+        )
+
+
+class StandInRest:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.created = 0
+        self.edited = 0
+        self._ids = itertools.count(1)
+
+    def build_action_row(self) -> ActionRowBuilder:
+        return ActionRowBuilder()
+
+    async def create_message(self, channel: int, **kwargs: t.Any) -> SimpleNamespace:
+        await asyncio.sleep(self.latency)
+        self.created += 1
+        return SimpleNamespace(id=next(self._ids), channel_id=channel)
+
+    async def edit_message(self, channel: int, message: int, **kwargs: t.Any) -> None:
+        await asyncio.sleep(self.latency)
+        self.edited += 1
+
+
+class LegacyControls(miru.View):
+    @miru.button(label="Play/Pause", style=hikari.ButtonStyle.SUCCESS)
+    async def play_pause_button(self, _: miru.Button, __: miru.Interaction) -> None:
+        pass
+
+    @miru.button(label="Re-Queue", style=hikari.ButtonStyle.PRIMARY)
+    async def requeue_button(self, _: miru.Button, __: miru.Interaction) -> None:
+        pass
+
+    @miru.button(label="Skip", style=hikari.ButtonStyle.DANGER)
+    async def skip_button(self, _: miru.Button, __: miru.Interaction) -> None:
+        pass
+
+
+def make_embed(guild_id: int, track: int) -> hikari.Embed:
+    return (
+        hikari.Embed(
+            title="Now Playing",
+            description=f"[Song {track}](https://youtu.be/{guild_id:05}{track:06})",
+        )
+        .add_field(name="Requested By", value="<@1000>", inline=True)
+        .add_field(name="Author", value="Someone", inline=True)
+    )
+
+
+async def legacy_track_start(
+    app: StandInApp, rest: StandInRest, guild_id: int, track: int
+) -> None:
+    view = LegacyControls(app, timeout=VIEW_TIMEOUT)
+    message = await rest.create_message(
+        guild_id * 10, embed=make_embed(guild_id, track), components=view.build()
+    )
+    # What `view.start(message)` does, the stand-in message is no hikari.Message
+    view._listener_task = asyncio.create_task(view._listen_for_events(message.id))
+    await view.wait()
+
+
+async def turnover(
+    name: str,
+    guilds: int,
+    tracks: int,
+    interval: float,
+    track_start: t.Callable[[int, int], t.Awaitable[None]],
+    settle: t.Callable[[], t.Awaitable[None]],
+) -> None:
+    handlers: list[asyncio.Task[None]] = []
+    returned: list[float] = []
+
+    async def handle(guild_id: int, track: int) -> None:
+        start = time.perf_counter()
+        await track_start(guild_id, track)
+        returned.append(time.perf_counter() - start)
+
+    baseline = len(asyncio.all_tasks())
+    tracemalloc.start()
+    start = time.perf_counter()
+    for track in range(tracks):
+        for guild_id in range(1, guilds + 1):
+            handlers.append(asyncio.create_task(handle(guild_id, track)))
+        await asyncio.sleep(interval)
+    await settle()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    live_views = sum(
+        1 for task in asyncio.all_tasks() if "_listen_for_events" in repr(task)
+    )
+    alive = len(asyncio.all_tasks()) - baseline
+    mean = sum(returned) / len(returned) * 1e3 if returned else float("nan")
+    print(
+        f"  {name:<10} {len(returned):6}/{len(handlers)} events returned"
+        f" (mean {mean:7.2f}ms)   {live_views:6} live views   {alive:6} live tasks"
+        f"   peak {peak / 2**10:8.1f} KiB   in {elapsed:.2f}s"
+    )
+    leftover = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in leftover:
+        task.cancel()
+    await asyncio.gather(*leftover, return_exceptions=True)
+
+
+async def run(args: argparse.Namespace) -> None:
+    events = args.guilds * args.tracks
+    print(
+        f"{args.guilds} guilds, {args.tracks} tracks each ({events} track starts),"
+        f" REST latency {args.latency * 1e3:.0f}ms"
+    )
+
+    app = StandInApp("x" * 30, banner=None)
+    rest = StandInRest(args.latency)
+    await turnover(
+        "view",
+        args.guilds,
+        args.tracks,
+        args.interval,
+        lambda guild_id, track: legacy_track_start(app, rest, guild_id, track),
+        lambda: asyncio.sleep(args.latency * 2),
+    )
+    print(f"  {'':<10} {rest.created:6} messages sent, {rest.edited} edited")
+
+    rest = StandInRest(args.latency)
+    announcer = NowPlayingAnnouncer(rest)
+
+    async def announce(guild_id: int, track: int) -> None:
+        announcer.announce(guild_id, guild_id * 10, make_embed(guild_id, track))
+
+    async def drain() -> None:
+        while announcer.in_flight:
+            await asyncio.sleep(args.latency)
+
+    await turnover(
+        "announcer", args.guilds, args.tracks, args.interval, announce, drain
+    )
+    print(
+        f"  {'':<10} {rest.created:6} messages sent, {rest.edited} edited,"
+        f" {announcer.coalesced} track changes coalesced"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
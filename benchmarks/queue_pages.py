@@ -0,0 +1,123 @@
+"""
+Time and memory to show the queue command's first page.
+
+Renders the queue of a guild the way the command used to (every track line
+and every page embed before the navigator shows page 1) and with the lazy
+pages that render a page when it is shown, on synthetic queues. The cost of
+paging through the queue a second time shows the effect of the cached track
+lines.
+
+Usage:
+    python -m benchmarks.queue_pages --tracks 1000 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import time
+import tracemalloc
+import typing as t
+from datetime import datetime
+from types import SimpleNamespace
+
+import hikari
+
+from benchmarks.music_enqueue import GUILD_ID, StandInLavalink
+from peacebot.core.plugins.Music.music import QUEUE_PAGE_SIZE, _queue_page, _track_line
+from peacebot.core.utils.embed_colors import EmbedColors
+from peacebot.core.utils.guild_queue import GuildQueue
+from peacebot.core.utils.pagination import LazyPages
+from peacebot.core.utils.utilities import _chunk
+
+
+def legacy_pages(queue: GuildQueue) -> list[hikari.Embed]:
+    song_queue = []
+    for song in queue:
+        song_queue += [
+            f"[{song.track.info.title}]({song.track.info.uri}) [<@{song.requester}>]"
+        ]
+
+    fields = []
+    counter = 1
+    for index, track in enumerate(_chunk(song_queue[1:], 8)):
+        string = """**Next Up**\n"""
+        for i in track:
+            amount = queue[counter].track.info.length
+            millis = int(amount)
+            l_seconds = (millis / 1000) % 60
+            l_seconds = int(l_seconds)
+            l_minutes = (millis / (1000 * 60)) % 60
+            l_minutes = int(l_minutes)
+            first_n = int(l_seconds / 10)
+            string += f"""{counter}.`{l_minutes}:{l_seconds if first_n !=0 else f'0{l_seconds}'}` {i}\n"""
+
+            counter += 1
+        embed = hikari.Embed(
+            title="Queue",
+            color=EmbedColors.INFO,
+            timestamp=datetime.now().astimezone(),
+            description=string,
+        )
+        embed.set_footer(text=f"Page {index+1}")
+        embed.add_field(
+            name="Now Playing",
+            value=f"[{queue.now_playing.track.info.title}]({queue.now_playing.track.info.uri}) [<@{queue.now_playing.requester}>]",  # noqa: E501
+        )
+        fields.append(embed)
+    return fields
+
+
+def lazy_pages(queue: GuildQueue) -> LazyPages[hikari.Embed]:
+    upcoming = queue[1:]
+    now_playing = queue.line(queue.now_playing, _track_line)
+    return LazyPages(
+        math.ceil(len(upcoming) / QUEUE_PAGE_SIZE),
+        lambda index: _queue_page("Queue", queue, upcoming, now_playing, index),
+    )
+
+
+def measure(name: str, func: t.Callable[[], t.Any]) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:<28} {elapsed * 1e3:9.2f}ms   peak {peak / 2**10:9.1f} KiB")
+
+
+async def load_queue(tracks: int) -> GuildQueue:
+    lavalink = StandInLavalink(0)
+    for i in range(tracks):
+        track = SimpleNamespace(
+            track=f"track-{i}",
+            info=SimpleNamespace(
+                title=f"Song number {i}",
+                uri=f"https://youtu.be/{i:011}",
+                length=(i % 600) * 1000 + 61_000,
+            ),
+        )
+        await lavalink.play(GUILD_ID, track).requester(1000 + i % 7).queue()
+    return await GuildQueue(lambda: lavalink, GUILD_ID).load()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    for count in args.tracks:
+        queue = asyncio.run(load_queue(count))
+        print(f"\n== {count} tracks ==")
+        measure("eager, first page", lambda: legacy_pages(queue)[0])
+        measure("lazy, first page", lambda: lazy_pages(queue)[0])
+        pages = lazy_pages(queue)
+        measure("lazy, every page", lambda: [pages[i] for i in range(len(pages))])
+        pages = lazy_pages(queue)
+        measure("lazy, every page again", lambda: [pages[i] for i in range(len(pages))])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Cost of persisting the music queues, and a save/restore round trip.
+
+Gives a few hundred guilds a long queue on the stand-in lavasnek client from
+`benchmarks.music_enqueue`, makes a burst of queue edits in every guild, and
+compares the Redis writes of `QueueStore` (one batched HSET per write-behind
+window) with writing a snapshot on every change. The saved snapshots are then
+restored into a fresh stand-in client, and the restored queues and positions
+are checked against the originals.
+
+Usage:
+    python -m benchmarks.queue_store --guilds 300 --tracks 200 --changes 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import typing as t
+from types import SimpleNamespace
+
+from benchmarks.music_enqueue import StandInLavalink
+from peacebot.core.utils.guild_queue import GuildQueues
+from peacebot.core.utils.queue_store import (
+    QUEUE_SNAPSHOTS_KEY,
+    QueueSnapshot,
+    QueueStore,
+)
+
+REQUESTER = 1000
+
+
+class StandInRedis:
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[bytes, bytes]] = {}
+        self.commands = 0
+        self.bytes_written = 0
+
+    async def hset(self, key: str, mapping: dict[str, str]) -> None:
+        self.commands += 1
+        self.bytes_written += sum(len(k) + len(v) for k, v in mapping.items())
+        self.hashes.setdefault(key, {}).update(
+            (k.encode(), v.encode()) for k, v in mapping.items()
+        )
+
+    async def hdel(self, key: str, *fields: str) -> None:
+        self.commands += 1
+        for field in fields:
+            self.hashes.get(key, {}).pop(field.encode(), None)
+
+    async def hgetall(self, key: str) -> dict[bytes, bytes]:
+        self.commands += 1
+        return dict(self.hashes.get(key, {}))
+
+
+def make_bot(lavalink: StandInLavalink, redis: StandInRedis, delay: float) -> t.Any:
+    bot = SimpleNamespace(
+        cache=SimpleNamespace(
+            get_voice_state=lambda guild_id, _: SimpleNamespace(
+                channel_id=guild_id * 10
+            )
+        ),
+        get_me=lambda: None,
+        d=SimpleNamespace(redis=redis, data=SimpleNamespace(lavalink=lavalink)),
+    )
+    bot.d.queue_store = QueueStore(bot, delay)
+    bot.d.queues = GuildQueues(lambda: lavalink, on_change=bot.d.queue_store.mark)
+    return bot
+
+
+def make_track(guild_id: int, index: int) -> SimpleNamespace:
+    video_id = f"{guild_id:05}{index:06}"
+    return SimpleNamespace(
+        track=f"QAAAjQIAJVJpY2sgQXN0bGV5IC0g{video_id}" * 4,
+        info=SimpleNamespace(
+            uri=f"https://www.youtube.com/watch?v={video_id}",
+            title=f"Song {index}",
+            length=200_000,
+        ),
+    )
+
+
+async def fill(lavalink: StandInLavalink, guilds: int, tracks: int) -> None:
+    for guild_id in range(1, guilds + 1):
+        for index in range(tracks):
+            track = make_track(guild_id, index)
+            lavalink.catalog[track.info.uri] = track
+            await lavalink.play(guild_id, track).requester(REQUESTER).queue()
+        lavalink.nodes[guild_id].set_data({guild_id: guild_id * 100})
+
+
+async def churn(bot: t.Any, guilds: int, changes: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    for _ in range(changes):
+        for guild_id in range(1, guilds + 1):
+            queue = await bot.d.queues.get(guild_id)
+            queue.move(rng.randrange(1, len(queue)), rng.randrange(1, len(queue)))
+            bot.d.queue_store.update_position(guild_id, rng.randrange(200_000))
+        await asyncio.sleep(0)
+
+
+async def run(args: argparse.Namespace) -> None:
+    lavalink = StandInLavalink(0)
+    await fill(lavalink, args.guilds, args.tracks)
+    redis = StandInRedis()
+    bot = make_bot(lavalink, redis, args.delay)
+
+    start = time.perf_counter()
+    await churn(bot, args.guilds, args.changes)
+    churn_time = time.perf_counter() - start
+    store: QueueStore = bot.d.queue_store
+    flush_start = time.perf_counter()
+    await store.flush()
+    flush_time = time.perf_counter() - flush_start
+
+    saved = dict(redis.hashes[QUEUE_SNAPSHOTS_KEY])
+    snapshot_size = sum(map(len, saved.values())) / len(saved)
+    changes = args.guilds * args.changes
+    print(
+        f"{args.guilds} guilds, {args.tracks} tracks each, {changes} queue changes"
+        f" in {churn_time * 1e3:.1f}ms"
+    )
+    print(f"  snapshot size:      {snapshot_size / 2**10:8.1f} KiB")
+    print(
+        f"  write-through:      {changes:8} HSETs"
+        f"   {changes * snapshot_size / 2**20:8.1f} MiB"
+    )
+    print(
+        f"  write-behind:       {redis.commands:8} HSETs"
+        f"   {redis.bytes_written / 2**20:8.1f} MiB"
+        f"   ({store.writes} snapshots in {store.batches} batches,"
+        f" last flush {flush_time * 1e3:.1f}ms)"
+    )
+
+    # Restore into a fresh client, as after a restart
+    restored_lavalink = StandInLavalink(0)
+    restored_lavalink.catalog = lavalink.catalog
+    restored = make_bot(restored_lavalink, redis, args.delay)
+    start = time.perf_counter()
+    await restored.d.queue_store.restore()
+    restore_time = time.perf_counter() - start
+    for guild_id in range(1, args.guilds + 1):
+        await bot.d.queues.release(guild_id)
+        await restored.d.queues.release(guild_id)
+
+    for guild_id in range(1, args.guilds + 1):
+        before = [tq.track.info.uri for tq in lavalink.nodes[guild_id].queue]
+        node = restored_lavalink.nodes[guild_id]
+        after = [tq.track.info.uri for tq in node.queue]
+        assert before == after, f"the queue of guild {guild_id} was not restored"
+        assert node.get_data() == {guild_id: guild_id * 100}
+        snapshot = QueueSnapshot.loads(saved[str(guild_id).encode()])
+        assert node.queue[0].start_time == snapshot.position
+    print(f"  restored and checked {args.guilds} queues in {restore_time:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--guilds", type=int, default=300)
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Records the objects.inv of every RTFM source into benchmarks/fixtures, so the
+RTFM benchmarks can run offline against real inventories.
+
+Usage:
+    python -m benchmarks.record_inventories
+"""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import aiohttp
+
+from peacebot.config.rtfm import rtfm_config
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures"
+
+
+async def record() -> None:
+    FIXTURES_PATH.mkdir(exist_ok=True)
+    async with aiohttp.ClientSession() as session:
+        for slug, url in rtfm_config.sources.items():
+            async with session.get(url + "/objects.inv") as resp:
+                resp.raise_for_status()
+                data = await resp.read()
+
+            (FIXTURES_PATH / f"{slug}.inv").write_bytes(data)
+            print(f"{slug:<10} {len(data):>10,} bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(record())
@@ -0,0 +1,77 @@
+"""
+Throughput of the rtfm `object` autocomplete.
+
+Replays users typing the recorded query corpus one keystroke at a time,
+concurrently, against the indexed inventory fixtures. Every keystroke is one
+autocomplete request, answered by `RTFMManager.autocomplete`. The first pass
+starts from an empty memo, the second pass has every prefix memoized.
+
+Usage:
+    python -m benchmarks.rtfm_autocomplete --users 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.rtfm_cache import load_inventories
+from benchmarks.rtfm_search import load_queries
+from peacebot.core.utils.rtfm_helper import RTFMManager, build_lookup_table
+
+
+async def type_queries(
+    manager: RTFMManager, queries: list[str], latencies: list[float]
+) -> None:
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            manager.autocomplete(query[:end])
+            latencies.append(time.perf_counter() - start)
+            # Let the other users type in between
+            await asyncio.sleep(0)
+
+
+async def run(args: argparse.Namespace) -> None:
+    queries = load_queries()
+    for slug, data in load_inventories().items():
+        url = "https://docs.example.com/"
+        manager = RTFMManager(slug, url)
+        manager.set_lookup_table(*build_lookup_table(slug, url, data))
+
+        print(
+            f"\n== {slug}: {len(manager._rtfm_cache):,} entries, {args.users} users =="
+        )
+        for name in ("cold memo", "warm memo"):
+            latencies: list[float] = []
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    type_queries(
+                        manager,
+                        random.Random(user).sample(queries, len(queries)),
+                        latencies,
+                    )
+                    for user in range(args.users)
+                )
+            )
+            elapsed = time.perf_counter() - start
+            percentiles = statistics.quantiles(latencies, n=100)
+            print(
+                f"  {name}: {len(latencies) / elapsed:>9,.0f} responses/s"
+                f"   p50 {percentiles[49] * 1e3:6.3f}ms   p99 {percentiles[98] * 1e3:6.3f}ms"
+                f"   max {max(latencies) * 1e3:6.2f}ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Offline benchmark of the RTFM inventory cache.
+
+Serves the objects.inv fixtures recorded by `benchmarks.record_inventories`
+from a local HTTP server that honours ETag/If-Modified-Since, and compares a
+cold start (download, inflate and parse) with a restart that loads the on-disk
+cache, and with the conditional request that revalidates it. Without a
+recorded python inventory, one is synthesised from the standard library.
+
+Usage:
+    python -m benchmarks.rtfm_cache --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import statistics
+import sys
+import tempfile
+import time
+import typing as t
+import zlib
+from pathlib import Path
+
+from aiohttp import web
+
+from peacebot.core.utils.rtfm_helper import RTFMManager
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures"
+ETAG = '"benchmark"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+# Standard library modules with side effects on import
+STDLIB_SKIP = frozenset({"antigravity", "idlelib", "this", "tkinter", "turtle"})
+
+
+def stdlib_modules() -> list[str]:
+    return sorted(
+        name
+        for name in sys.stdlib_module_names
+        if not name.startswith("_") and name not in STDLIB_SKIP
+    )
+
+
+def synthesise_inventory(project: str, modules: t.Iterable[str]) -> bytes:
+    """
+    Builds a Sphinx v2 inventory with an entry for every public member of the
+    modules, shaped like the ones pdoc and Sphinx publish.
+    """
+    lines = []
+    for module_name in modules:
+        try:
+            module = importlib.import_module(module_name)
+        except Exception:
+            continue
+
+        page = module_name.replace(".", "/") + ".html"
+        # Like the Python docs, builtins are documented without their module
+        prefix = "" if module_name == "builtins" else f"{module_name}."
+        lines.append(f"{module_name} py:module 0 {page}#module-$ -")
+        lines.append(f"{module_name} std:doc -1 {page} {module_name}")
+        for name, member in vars(module).items():
+            if name.startswith("_"):
+                continue
+
+            directive = "py:class" if inspect.isclass(member) else "py:function"
+            lines.append(f"{prefix}{name} {directive} 1 {page}#$ -")
+            for attribute in vars(member) if inspect.isclass(member) else ():
+                if not attribute.startswith("_"):
+                    lines.append(
+                        f"{prefix}{name}.{attribute} py:attribute 1 {page}#$ -"
+                    )
+
+    header = (
+        "# Sphinx inventory version 2\n"
+        f"# Project: {project}\n"
+        "# Version: 1.0\n"
+        "# The remainder of this file is compressed using zlib.\n"
+    )
+    return header.encode() + zlib.compress("\n".join(lines).encode())
+
+
+def load_inventories() -> dict[str, bytes]:
+    inventories = {
+        path.stem: path.read_bytes() for path in sorted(FIXTURES_PATH.glob("*.inv"))
+    }
+    if "python" not in inventories:
+        print("No recorded python inventory, synthesising one instead")
+        inventories["python"] = synthesise_inventory("Python", stdlib_modules())
+
+    return inventories
+
+
+async def serve(inventories: dict[str, bytes]) -> tuple[web.AppRunner, str]:
+    async def objects_inv(request: web.Request) -> web.Response:
+        if (
+            request.headers.get("If-None-Match") == ETAG
+            or request.headers.get("If-Modified-Since") == LAST_MODIFIED
+        ):
+            return web.Response(status=304)
+
+        return web.Response(
+            body=inventories[request.match_info["slug"]],
+            headers={"ETag": ETAG, "Last-Modified": LAST_MODIFIED},
+        )
+
+    app = web.Application()
+    app.router.add_get("/{slug}/objects.inv", objects_inv)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def timed(coro: t.Awaitable) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(f"  {name + ':':<22} median {statistics.median(timings) * 1e3:9.2f}ms")
+
+
+async def run(args: argparse.Namespace) -> None:
+    inventories = load_inventories()
+    runner, base_url = await serve(inventories)
+
+    for slug, data in inventories.items():
+        url = f"{base_url}/{slug}"
+        cold, restart, revalidate = [], [], []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                manager = RTFMManager(slug, url, Path(cache_dir))
+                cold.append(await timed(manager.ensure_lookup_table()))
+
+                restarted = RTFMManager(slug, url, Path(cache_dir))
+                start = time.perf_counter()
+                assert restarted.load_disk_cache()
+                restart.append(time.perf_counter() - start)
+                assert restarted._rtfm_cache == manager._rtfm_cache
+
+                revalidate.append(
+                    await timed(restarted.build_rtfm_lookup_table(url, revalidate=True))
+                )
+
+        print(
+            f"\n== {slug}: {len(data):,} bytes, {len(manager._rtfm_cache):,} entries =="
+        )
+        report("cold download+parse", cold)
+        report("restart from disk", restart)
+        report("revalidation (304)", revalidate)
+
+    await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Event loop lag during a cold load of every RTFM source.
+
+Loads all inventory fixtures from a local HTTP server with an empty disk
+cache while a ticker measures how late the event loop wakes it up, with
+parsing and indexing run inline on the loop (as before), in a thread pool and
+in a process pool like the bot's.
+
+Usage:
+    python -m benchmarks.rtfm_loop_lag
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import tempfile
+import time
+import typing as t
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.rtfm_cache import load_inventories, serve
+from peacebot.core.utils.rtfm_helper import RTFMManager, refresh_rtfm_sources
+
+TICK = 0.001
+
+
+class InlineExecutor(Executor):
+    """Runs the work on the calling thread, i.e. on the event loop."""
+
+    def submit(self, fn: t.Callable, /, *args: t.Any, **kwargs: t.Any) -> Future:
+        future: Future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+async def measure_lag(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def cold_load(
+    executor: Executor, base_url: str, slugs: t.Iterable[str]
+) -> tuple[list[float], float]:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        managers = [
+            RTFMManager(slug, f"{base_url}/{slug}", Path(cache_dir)) for slug in slugs
+        ]
+        for manager in managers:
+            manager.executor = executor
+
+        lags: list[float] = []
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_lag(lags, stop))
+        start = time.perf_counter()
+        await refresh_rtfm_sources(managers)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+    return lags, elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    inventories = load_inventories()
+    runner, base_url = await serve(inventories)
+    loop = asyncio.get_running_loop()
+
+    executors = {
+        "inline": InlineExecutor(),
+        "thread pool": ThreadPoolExecutor(max_workers=args.workers),
+        "process pool": ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+        ),
+    }
+    print(f"{'executor':<14} {'load':>10} {'max lag':>10} {'p99 lag':>10}")
+    for name, executor in executors.items():
+        # Start the workers outside of the measurement
+        await loop.run_in_executor(executor, time.sleep, 0)
+        lags, elapsed = await cold_load(executor, base_url, inventories)
+        executor.shutdown()
+
+        p99 = sorted(lags)[int(0.99 * (len(lags) - 1))]
+        print(
+            f"{name:<14} {elapsed * 1e3:8.1f}ms {max(lags) * 1e3:8.1f}ms"
+            f" {p99 * 1e3:8.1f}ms   ({len(lags)} ticks)"
+        )
+
+    await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
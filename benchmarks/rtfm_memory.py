@@ -0,0 +1,64 @@
+"""
+Memory report of the RTFM lookup tables.
+
+Compares the bytes per entry of the compact `Inventory` with the dict of full
+URLs the lookup tables used to be, and with the search index built on top, for
+every inventory fixture.
+
+Usage:
+    python -m benchmarks.rtfm_memory
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import tracemalloc
+import typing as t
+
+from benchmarks.rtfm_cache import load_inventories
+from peacebot.core.utils.rtfm_helper import (
+    RTFMManager,
+    SphinxObjectFileReader,
+    TrigramIndex,
+)
+
+
+def allocated(build: t.Callable[[], t.Any]) -> tuple[t.Any, int]:
+    """Returns what `build` returns and the memory it still holds on to."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def main() -> None:
+    tracemalloc.start()
+    url = "https://docs.example.com/en/latest/"
+    print(
+        f"{'inventory':<12} {'entries':>8} {'dict':>12} {'Inventory':>12} {'index':>12}"
+    )
+    for slug, data in load_inventories().items():
+        manager = RTFMManager(slug, url)
+        inventory, compact = allocated(
+            lambda: manager.parse_object_inv(SphinxObjectFileReader(data), url)
+        )
+        # What parse_object_inv used to return
+        _, legacy = allocated(
+            lambda: {
+                key: os.path.join(url, inventory.location(index))
+                for index, key in enumerate(inventory)
+            }
+        )
+        _, index = allocated(lambda: TrigramIndex(inventory))
+
+        entries = len(inventory)
+        print(
+            f"{slug:<12} {entries:>8,} {legacy / entries:>10.1f} B"
+            f" {compact / entries:>10.1f} B {index / entries:>10.1f} B"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark of SphinxObjectFileReader.read_compressed_lines.
+
+Compares the streaming line reader with the previous implementation, which
+re-sliced the whole buffer after every line, on the django objects.inv
+fixture and a python inventory (recorded, or synthesised from the standard
+library), and checks that `RTFMManager.parse_object_inv` builds the same
+lookup table with both.
+
+Usage:
+    python -m benchmarks.rtfm_reader --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import time
+import typing as t
+
+from benchmarks.rtfm_cache import load_inventories
+from peacebot.core.utils.rtfm_helper import RTFMManager, SphinxObjectFileReader
+
+
+class LegacySphinxObjectFileReader(SphinxObjectFileReader):
+    def read_compressed_lines(self) -> t.Iterator[str]:
+        buf = b""
+        for chunk in self.read_compressed_chunks():
+            buf += chunk
+            pos = buf.find(b"\n")
+            while pos != -1:
+                yield buf[:pos].decode("utf-8")
+                buf = buf[pos + 1 :]
+                pos = buf.find(b"\n")
+
+
+def skip_header(reader: SphinxObjectFileReader) -> SphinxObjectFileReader:
+    for _ in range(4):
+        reader.skipline()
+    return reader
+
+
+def drain(reader: SphinxObjectFileReader) -> None:
+    collections.deque(skip_header(reader).read_compressed_lines(), maxlen=0)
+
+
+def best_of(repeat: int, func: t.Callable[[], t.Any]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for slug, data in load_inventories().items():
+        manager = RTFMManager(slug, "https://example.com")
+        legacy_table = manager.parse_object_inv(LegacySphinxObjectFileReader(data), "")
+        table = manager.parse_object_inv(SphinxObjectFileReader(data), "")
+        # The previous reader dropped a final line without a trailing newline
+        assert legacy_table.items() <= table.items()
+
+        lines = sum(
+            1 for _ in skip_header(SphinxObjectFileReader(data)).read_compressed_lines()
+        )
+        legacy = best_of(
+            args.repeat,
+            lambda: drain(LegacySphinxObjectFileReader(data)),
+        )
+        streaming = best_of(
+            args.repeat,
+            lambda: drain(SphinxObjectFileReader(data)),
+        )
+        parse = best_of(
+            args.repeat,
+            lambda: manager.parse_object_inv(SphinxObjectFileReader(data), ""),
+        )
+
+        print(f"\n== {slug}: {len(data):,} bytes, {lines:,} lines ==")
+        print(f"  legacy reader:    {legacy * 1e3:8.2f}ms")
+        print(
+            f"  streaming reader: {streaming * 1e3:8.2f}ms  ({legacy / streaming:.1f}x)"
+        )
+        print(f"  full parse:       {parse * 1e3:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
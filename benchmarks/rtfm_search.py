@@ -0,0 +1,86 @@
+"""
+Benchmark of the RTFM fuzzy search.
+
+Runs the recorded query corpus against every inventory fixture with the
+trigram index and with the previous full `process.extract` scan, checks that
+both return the same top 10 and reports the latency of each.
+
+Usage:
+    python -m benchmarks.rtfm_search --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from rapidfuzz import fuzz, process
+
+from benchmarks.rtfm_cache import load_inventories
+from peacebot.core.utils.rtfm_helper import (
+    RTFMManager,
+    SphinxObjectFileReader,
+    TrigramIndex,
+)
+
+QUERIES_PATH = Path(__file__).parent / "fixtures" / "rtfm_queries.txt"
+
+
+def load_queries() -> list[str]:
+    lines = QUERIES_PATH.read_text().splitlines()
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    queries = load_queries()
+
+    for slug, data in load_inventories().items():
+        manager = RTFMManager(slug, "https://example.com")
+        table = manager.parse_object_inv(SphinxObjectFileReader(data), "")
+
+        start = time.perf_counter()
+        index = TrigramIndex(table)
+        build = time.perf_counter() - start
+
+        full_scan: list[float] = []
+        indexed: list[float] = []
+        mismatches = 0
+        for query in queries:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                expected = process.extract(
+                    query, table.keys(), scorer=fuzz.QRatio, limit=10
+                )
+                full_scan.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                found = index.search(query, limit=10)
+                indexed.append(time.perf_counter() - start)
+
+            if [(key, score) for key, score, _ in expected] != [
+                (key, score) for key, score, _ in found
+            ]:
+                mismatches += 1
+                print(f"  mismatch for {query!r}")
+
+        print(
+            f"\n== {slug}: {len(index):,} keys, index built in {build * 1e3:.1f}ms =="
+        )
+        for name, timings in (("full scan", full_scan), ("trigram index", indexed)):
+            percentiles = statistics.quantiles(timings, n=100)
+            print(
+                f"  {name + ':':<15} p50 {percentiles[49] * 1e3:7.2f}ms"
+                f"   p99 {percentiles[98] * 1e3:7.2f}ms"
+            )
+        print(
+            f"  identical top 10 for {len(queries) - mismatches}/{len(queries)} queries"
+        )
+
+
+if __name__ == "__main__":
+    main()
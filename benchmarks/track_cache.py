@@ -0,0 +1,159 @@
+"""
+Hit rate and search time saved by the track search cache.
+
+Replays Zipf-distributed `/play` searches, spread over several shards that
+each keep their own in-process cache but share one Redis, against local
+stand-ins for Lavalink (a fixed search and load time) and Redis (a fixed round
+trip). Compares the total search time with and without `TrackSearchCache`.
+
+Usage:
+    python -m benchmarks.track_cache --searches 5000 --songs 2000 --shards 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import typing as t
+from types import SimpleNamespace
+
+from peacebot.core.utils.track_cache import TrackSearchCache
+
+
+class StandInRedis:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.data: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        await asyncio.sleep(self.latency)
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        await asyncio.sleep(self.latency)
+        self.data[key] = value.encode()
+
+
+class StandInLavalink:
+    def __init__(self, search_latency: float, load_latency: float) -> None:
+        self.search_latency = search_latency
+        self.load_latency = load_latency
+        self.searches = 0
+        self.loads = 0
+
+    @staticmethod
+    def _tracks(uri: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            tracks=[SimpleNamespace(track=uri, info=SimpleNamespace(uri=uri))],
+            playlist_info=SimpleNamespace(name=None, selected_track=None),
+            load_type="TRACK_LOADED",
+        )
+
+    async def auto_search_tracks(self, query: str) -> SimpleNamespace:
+        self.searches += 1
+        await asyncio.sleep(self.search_latency)
+        return self._tracks(f"https://youtu.be/{abs(hash(query)) % 10**11}")
+
+    async def get_tracks(self, uri: str) -> SimpleNamespace:
+        self.loads += 1
+        await asyncio.sleep(self.load_latency)
+        return self._tracks(uri)
+
+
+def zipf_queries(searches: int, songs: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, songs + 1)]
+    picks = rng.choices(range(songs), weights, k=searches)
+    # Users type the same song in different ways
+    return [
+        rng.choice(
+            ("song {} by artist", "Song {} By Artist", " song {}  by artist")
+        ).format(pick)
+        for pick in picks
+    ]
+
+
+async def replay(
+    queries: list[str],
+    shards: int,
+    search: t.Callable[[int, str], t.Awaitable[t.Any]],
+    concurrency: int,
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    elapsed = 0.0
+
+    async def play(index: int, query: str) -> None:
+        nonlocal elapsed
+        async with semaphore:
+            start = time.perf_counter()
+            await search(index % shards, query)
+            elapsed += time.perf_counter() - start
+
+    await asyncio.gather(*(play(i, query) for i, query in enumerate(queries)))
+    return elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    queries = zipf_queries(args.searches, args.songs)
+    search_latency, load_latency = args.search_ms / 1e3, args.load_ms / 1e3
+
+    lavalink = StandInLavalink(search_latency, load_latency)
+    uncached = await replay(
+        queries,
+        args.shards,
+        lambda _, query: lavalink.auto_search_tracks(query),
+        args.concurrency,
+    )
+
+    lavalink = StandInLavalink(search_latency, load_latency)
+    redis = StandInRedis(args.redis_ms / 1e3)
+    caches = [
+        TrackSearchCache(redis, max_size=args.cache_size) for _ in range(args.shards)
+    ]
+    cached = await replay(
+        queries,
+        args.shards,
+        lambda shard, query: caches[shard].search(lavalink, query),
+        args.concurrency,
+    )
+
+    hits = sum(cache.hits for cache in caches)
+    redis_hits = sum(cache.redis_hits for cache in caches)
+    misses = sum(cache.misses for cache in caches)
+    coalesced = sum(cache.coalesced for cache in caches)
+    print(
+        f"{args.searches} searches for {args.songs} songs over {args.shards} shards,"
+        f" {args.cache_size} entries per shard"
+    )
+    print(
+        f"  memory hits {hits / args.searches:6.1%}   redis hits"
+        f" {redis_hits / args.searches:6.1%}   misses {misses / args.searches:6.1%}"
+        f"   (coalesced {coalesced})"
+    )
+    print(f"  lavalink searches: {lavalink.searches}, loads by uri: {lavalink.loads}")
+    print(
+        f"  search time: {uncached:8.1f}s uncached, {cached:8.1f}s cached"
+        f" ({1 - cached / uncached:.1%} saved,"
+        f" {sum(cache.saved for cache in caches):.1f}s estimated by the cache)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--searches", type=int, default=5000)
+    parser.add_argument("--songs", type=int, default=2000)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--search-ms", type=float, default=400)
+    parser.add_argument("--load-ms", type=float, default=60)
+    parser.add_argument("--redis-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Voice sessions and memory held by guilds nobody listens to anymore.
+
+Joins a batch of guilds every round the way the play command does, each with
+a listener in the voice channel and a queue of tracks on a stand-in lavasnek
+client from `benchmarks.music_enqueue`. Then some listeners walk away, and
+some queues run out. Without a reaper, the sessions stay until someone runs
+`leave`, which nobody does here. With `VoiceSessionReaper`, the idle ones are
+torn down through `end_voice_session` after the idle period. Reports the sessions,
+players and traced memory left after every round, and the gauges.
+
+Usage:
+    python -m benchmarks.voice_reaper --rounds 8 --joins 100 --idle-after 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import tracemalloc
+import typing as t
+from types import SimpleNamespace
+
+from benchmarks.lavalink_pool import BOT_ID, StandInBot, play
+from benchmarks.music_enqueue import StandInLavalink
+from peacebot.core.utils.lavalink_pool import LavalinkPool
+from peacebot.core.utils.voice_reaper import VoiceSessionReaper
+
+LISTENER = 2
+
+
+class StandInAnnouncer:
+    async def close(self, guild_id: int) -> None:
+        pass
+
+
+class ReapedBot(StandInBot):
+    def __init__(self, idle_after: float | None) -> None:
+        super().__init__()
+        self.listeners: dict[int, dict[int, SimpleNamespace]] = {}
+        self.cache.get_voice_states_view_for_guild = lambda guild_id: (
+            self.listeners.get(guild_id, {})
+        )
+        self.d.now_playing = StandInAnnouncer()
+        self.d.voice_reaper = VoiceSessionReaper(
+            self, idle_after=idle_after if idle_after is not None else float("inf")
+        )
+        self.reaping = idle_after is not None
+
+    async def _voice_events(self, guild_id: int, channel_id: int | None) -> None:
+        await super()._voice_events(guild_id, channel_id)
+        state = SimpleNamespace(
+            guild_id=guild_id, user_id=BOT_ID, channel_id=channel_id
+        )
+        await self.d.voice_reaper.on_voice_state_update(
+            SimpleNamespace(state=state, old_state=None)
+        )
+
+    async def move_listener(self, guild_id: int, channel_id: int | None) -> None:
+        states = self.listeners.setdefault(guild_id, {})
+        old_state = states.get(LISTENER)
+        state = SimpleNamespace(
+            guild_id=guild_id,
+            user_id=LISTENER,
+            channel_id=channel_id,
+            member=SimpleNamespace(is_bot=False),
+        )
+        if channel_id is None:
+            states.pop(LISTENER, None)
+        else:
+            states[LISTENER] = state
+        await self.d.voice_reaper.on_voice_state_update(
+            SimpleNamespace(state=state, old_state=old_state)
+        )
+
+
+async def simulate(args: argparse.Namespace, idle_after: float | None) -> list[str]:
+    client = StandInLavalink(0)
+    bot = ReapedBot(idle_after)
+    pool = LavalinkPool(
+        bot,
+        {"main": "lavalink:2333"},
+        detach=bot.d.queue_store.detach,
+        reattach=bot.d.queue_store.resume,
+    )
+
+    async def build(node: t.Any) -> StandInLavalink:
+        return client
+
+    await pool.connect(build)
+    bot.d.data.lavalink = pool
+    reaper = bot.d.voice_reaper
+
+    rng = random.Random(0)
+    lines = []
+    tracemalloc.start()
+    next_guild = 1
+    for round_ in range(1, args.rounds + 1):
+        for guild_id in range(next_guild, next_guild + args.joins):
+            await bot.move_listener(guild_id, guild_id * 10)
+            # No failover here, so the tracks are not kept for reloading
+            await play(bot, {}, guild_id, args.tracks)
+        next_guild += args.joins
+
+        for guild_id in list(client.nodes):
+            roll = rng.random()
+            if roll < args.leave:
+                await bot.move_listener(guild_id, None)
+            elif roll < args.leave + args.finish:
+                # The queue ran out, like after the last track_finish
+                await bot.d.queues.release(guild_id)
+                await client.stop(guild_id)
+
+        # Two checks, one to notice and one after the idle period
+        for _ in range(2):
+            if bot.reaping:
+                await reaper.reap()
+            await asyncio.sleep(args.idle_after)
+        await bot.d.queue_store.flush()
+
+        memory = tracemalloc.get_traced_memory()[0]
+        lines.append(
+            f"  round {round_:2}: {len(bot.voice_states):5} sessions,"
+            f" {len(client.nodes):5} players, {memory / 2**20:6.2f} MiB"
+            + (
+                f"   active {reaper.active:4}, idle {reaper.idle:4},"
+                f" reaped {reaper.reaped:5}"
+                if bot.reaping
+                else ""
+            )
+        )
+    tracemalloc.stop()
+    return lines
+
+
+async def run(args: argparse.Namespace) -> None:
+    print(
+        f"{args.joins} guilds join each round, {args.leave:.0%} of the sessions lose"
+        f" their listener and {args.finish:.0%} their queue every round"
+    )
+    print("without reaper")
+    print("\n".join(await simulate(args, None)))
+    print(f"with reaper, idle after {args.idle_after * 1e3:.0f}ms")
+    print("\n".join(await simulate(args, args.idle_after)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--joins", type=int, default=100)
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--leave", type=float, default=0.3)
+    parser.add_argument("--finish", type=float, default=0.2)
+    parser.add_argument("--idle-after", type=float, default=0.05)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
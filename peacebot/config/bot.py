@@ -1,3 +1,5 @@
+import typing as t
+
 from pydantic import BaseSettings
 
 
@@ -5,6 +7,9 @@ class BotConfig(BaseSettings):
     token: str
     prefix: str
     test_guilds: list[int]
+    metrics_host: str = "0.0.0.0"
+    metrics_port: int = 9100
+    cache_profile: t.Literal["full", "standard", "minimal"] = "full"
 
     class Config:
         env_file = ".env"
@@ -3,6 +3,11 @@ from pydantic import BaseSettings
 
 class LavalinkConfig(BaseSettings):
     password: str
+    # Lavalink nodes to place guilds on, by name, as "host:port"
+    nodes: dict[str, str] = {"main": "lavalink:2333"}
+    ssl: bool = False
+    # Minutes a voice session may sit alone or silent before the bot leaves
+    idle_minutes: float = 5
 
     class Config:
         env_file = ".env"
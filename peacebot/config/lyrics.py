@@ -0,0 +1,14 @@
+from pydantic import BaseSettings
+
+
+class LyricsConfig(BaseSettings):
+    # An HTTP(S) lyrics API, or a JSON file of titles to lyrics to run offline
+    source: str = "https://some-random-api.ml/lyrics"
+    ttl_hours: int = 24
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "lyrics_"
+
+
+lyrics_config = LyricsConfig()
@@ -0,0 +1,20 @@
+from pydantic import BaseSettings
+
+
+class RTFMConfig(BaseSettings):
+    sources: dict[str, str] = {
+        "python": "https://docs.python.org/3/",
+        "hikari": "https://hikari-py.github.io/hikari/",
+        "lightbulb": "https://hikari-lightbulb.readthedocs.io/en/latest",
+        "django": "https://django.readthedocs.io/en/latest/",
+        "flask": "https://flask.palletsprojects.com/en/2.0.x/",
+    }
+    memory_budget_mb: int = 64
+    refresh_hours: int = 12
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "rtfm_"
+
+
+rtfm_config = RTFMConfig()
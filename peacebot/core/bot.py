@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import multiprocessing
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aioredis
@@ -14,35 +17,51 @@ from lightbulb.utils.data_store import DataStore
 from reddist import RedisRedditCacher
 from tortoise import Tortoise
 
-from models import GuildModel
 from peacebot import bot_config, lavalink_config
+from peacebot.config.lyrics import lyrics_config
 from peacebot.config.reddit import reddit_config
 from peacebot.core.event_handler import EventHandler
 from peacebot.core.utils.activity import CustomActivity
+from peacebot.core.utils.cache_profile import resolve_cache_profile
 from peacebot.core.utils.embed_colors import EmbedColors
 from peacebot.core.utils.errors import on_error
+from peacebot.core.utils.guild_cache import GuildCache
+from peacebot.core.utils.guild_queue import GuildQueues
+from peacebot.core.utils.lavalink_pool import LavalinkPool, PoolNode
+from peacebot.core.utils.lyrics import LyricsService, lyrics_source
+from peacebot.core.utils.message_pipeline import MessagePipeline
+from peacebot.core.utils.metrics import DB_METHODS, HTTP_METHODS, Metrics
+from peacebot.core.utils.now_playing import NowPlayingAnnouncer
+from peacebot.core.utils.queue_store import QueueStore
+from peacebot.core.utils.track_cache import TrackSearchCache
+from peacebot.core.utils.voice_reaper import REAP_INTERVAL, REAP_JOB, VoiceSessionReaper
 from tortoise_config import tortoise_config
 
 logger = logging.getLogger("peacebot.main")
 logger.setLevel(logging.DEBUG)
 
-HIKARI_VOICE = False
+GUILD_WARMUP_DELAY = 2
+EXECUTOR_WORKERS = 2
 
 
 class Data:
     def __init__(self) -> None:
-        self.lavalink: lavasnek_rs.Lavalink | None = None
+        self.lavalink: LavalinkPool | None = None
 
 
 class Peacebot(lightbulb.BotApp):
     """Custom class for initiating Lightbulb's BotApp"""
 
     def __init__(self) -> None:
+        self.metrics = Metrics()
+        self._listeners: dict[tuple[type, t.Callable], t.Callable] = {}
+        intents, cache_settings = resolve_cache_profile(bot_config.cache_profile)
         super().__init__(
             token=bot_config.token,
             prefix=lightbulb.when_mentioned_or(self.determine_prefix),
             default_enabled_guilds=bot_config.test_guilds,
-            intents=hikari.Intents.ALL,
+            intents=intents,
+            cache_settings=cache_settings,
             banner="peacebot.assets",
         )
         redis = aioredis.from_url(url="redis://redis")
@@ -58,25 +77,188 @@ class Peacebot(lightbulb.BotApp):
                 redis,
             ),
             scheduler=AsyncIOScheduler(),
+            guild_cache=GuildCache(),
+            queues=GuildQueues(
+                lambda: self.d.data.lavalink,
+                on_change=lambda guild_id: self.d.queue_store.mark(guild_id),
+            ),
+            queue_store=QueueStore(self),
+            now_playing=NowPlayingAnnouncer(self.rest),
+            voice_reaper=VoiceSessionReaper(
+                self, idle_after=lavalink_config.idle_minutes * 60
+            ),
+            message_pipeline=MessagePipeline(self),
+            track_cache=TrackSearchCache(
+                redis,
+                on_lookup=lambda source, seconds: self.metrics.latency[
+                    "track_search", source
+                ].observe(seconds),
+            ),
+            lyrics=LyricsService(
+                redis,
+                lyrics_source(lyrics_config.source),
+                ttl=lyrics_config.ttl_hours * 60 * 60,
+                on_lookup=lambda source, seconds: self.metrics.latency[
+                    "lyrics", source
+                ].observe(seconds),
+            ),
+            # CPU bound work that would otherwise stall the event loop, the
+            # workers are not forked from the bot and its running event loop
+            executor=ProcessPoolExecutor(
+                max_workers=EXECUTOR_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            ),
         )
         self.scheduler = AsyncIOScheduler()
         self.custom_activity = CustomActivity(self)
+        self._db_connected = asyncio.Event()
+        self._pending_guilds: set[int] = set()
+        self._warmup_task: asyncio.Task | None = None
+
+        self.metrics.count_calls(type(self.rest), HTTP_METHODS, "http")
+        guild_cache = self.d.guild_cache
+        self.metrics.register_gauge(
+            "peacebot_guild_cache_hits",
+            "Guild config cache hits.",
+            lambda: guild_cache.hits,
+        )
+        self.metrics.register_gauge(
+            "peacebot_guild_cache_misses",
+            "Guild config cache misses.",
+            lambda: guild_cache.misses,
+        )
+        self.metrics.register_gauge(
+            "peacebot_guild_cache_coalesced",
+            "Guild config lookups that shared an in-flight query.",
+            lambda: guild_cache.coalesced,
+        )
+        track_cache = self.d.track_cache
+        self.metrics.register_gauge(
+            "peacebot_track_cache_hits",
+            "Track searches answered from memory.",
+            lambda: track_cache.hits,
+        )
+        self.metrics.register_gauge(
+            "peacebot_track_cache_redis_hits",
+            "Track searches resolved through the URI cached in Redis.",
+            lambda: track_cache.redis_hits,
+        )
+        self.metrics.register_gauge(
+            "peacebot_track_cache_misses",
+            "Track searches that went to Lavalink.",
+            lambda: track_cache.misses,
+        )
+        self.metrics.register_gauge(
+            "peacebot_track_cache_saved_seconds",
+            "Search time saved by the track cache, against the mean miss.",
+            lambda: track_cache.saved,
+        )
+        queue_store = self.d.queue_store
+        self.metrics.register_gauge(
+            "peacebot_queue_snapshots_written",
+            "Music queue snapshots written to or deleted from Redis.",
+            lambda: queue_store.writes,
+        )
+        self.metrics.register_gauge(
+            "peacebot_queue_snapshots_pending",
+            "Guilds whose music queue snapshot is waiting to be written.",
+            lambda: queue_store.pending,
+        )
+        now_playing = self.d.now_playing
+        self.metrics.register_gauge(
+            "peacebot_now_playing_messages",
+            "Now playing messages kept for editing, one per guild.",
+            lambda: len(now_playing),
+        )
+        self.metrics.register_gauge(
+            "peacebot_now_playing_sent",
+            "Now playing messages sent.",
+            lambda: now_playing.sent,
+        )
+        self.metrics.register_gauge(
+            "peacebot_now_playing_edited",
+            "Track changes shown by editing the guild's now playing message.",
+            lambda: now_playing.edited,
+        )
+        self.metrics.register_gauge(
+            "peacebot_lavalink_nodes_healthy",
+            "Lavalink nodes of the pool that guilds can be placed on.",
+            lambda: len(self.d.data.lavalink.healthy) if self.d.data.lavalink else 0,
+        )
+        self.metrics.register_gauge(
+            "peacebot_lavalink_failovers",
+            "Guilds moved to another Lavalink node after theirs failed.",
+            lambda: self.d.data.lavalink.failovers if self.d.data.lavalink else 0,
+        )
+        voice_reaper = self.d.voice_reaper
+        self.metrics.register_gauge(
+            "peacebot_voice_sessions_active",
+            "Voice sessions with someone listening to a playing track.",
+            lambda: voice_reaper.active,
+        )
+        self.metrics.register_gauge(
+            "peacebot_voice_sessions_idle",
+            "Voice sessions alone in their channel or with nothing playing.",
+            lambda: voice_reaper.idle,
+        )
+        self.metrics.register_gauge(
+            "peacebot_voice_sessions_reaped",
+            "Voice sessions left after staying idle for too long.",
+            lambda: voice_reaper.reaped,
+        )
+        lyrics = self.d.lyrics
+        self.metrics.register_gauge(
+            "peacebot_lyrics_cache_hits",
+            "Lyrics lookups answered from Redis.",
+            lambda: lyrics.hits,
+        )
+        self.metrics.register_gauge(
+            "peacebot_lyrics_cache_misses",
+            "Lyrics lookups that went to the lyrics source.",
+            lambda: lyrics.misses,
+        )
+        self.metrics.register_gauge(
+            "peacebot_lyrics_prefetched",
+            "Lyrics looked up in the background when a track started.",
+            lambda: lyrics.prefetched,
+        )
 
     async def determine_prefix(self, _, message: hikari.Message) -> str:
         if not message.guild_id:
             return bot_config.prefix
 
-        data, _ = await GuildModel.get_or_create(id=message.guild_id)
-        return str(data.prefix)
+        context = await self.d.message_pipeline.process(message)
+        return str(context.guild.prefix)
+
+    def subscribe(self, event_type: type, callback: t.Callable) -> None:
+        wrapped = self.metrics.instrument_listener(callback)
+        self._listeners[event_type, callback] = wrapped
+        super().subscribe(event_type, wrapped)
+
+    def unsubscribe(self, event_type: type, callback: t.Callable) -> None:
+        wrapped = self._listeners.pop((event_type, callback), callback)
+        super().unsubscribe(event_type, wrapped)
 
     def run(self) -> None:
         self.event_manager.subscribe(hikari.StartingEvent, self.on_starting)
         self.event_manager.subscribe(hikari.StartedEvent, self.on_started)
         self.event_manager.subscribe(hikari.StoppingEvent, self.on_stopping)
         self.event_manager.subscribe(hikari.StoppedEvent, self.on_stopped)
-        self.event_manager.subscribe(lightbulb.CommandErrorEvent, on_error)
-        self.event_manager.subscribe(hikari.ShardReadyEvent, self.on_shard_ready)
-        self.event_manager.subscribe(hikari.GuildMessageCreateEvent, self.on_message)
+        self.event_manager.subscribe(
+            lightbulb.events.CommandInvocationEvent, self.metrics.on_command_invocation
+        )
+        self.event_manager.subscribe(
+            lightbulb.events.CommandCompletionEvent, self.metrics.on_command_completion
+        )
+        self.event_manager.subscribe(
+            lightbulb.CommandErrorEvent, self.metrics.on_command_error
+        )
+        self.subscribe(lightbulb.CommandErrorEvent, on_error)
+        self.subscribe(hikari.ShardReadyEvent, self.on_shard_ready)
+        self.subscribe(hikari.GuildMessageCreateEvent, self.on_message)
+        self.subscribe(hikari.GuildAvailableEvent, self.on_guild_available)
+        self.subscribe(hikari.VoiceStateUpdateEvent, self.on_voice_state_update)
+        self.subscribe(hikari.VoiceServerUpdateEvent, self.on_voice_server_update)
 
         super().run(asyncio_debug=True)
 
@@ -85,25 +267,68 @@ class Peacebot(lightbulb.BotApp):
         asyncio.create_task(self.connect_db())
 
     async def on_shard_ready(self, _: hikari.ShardReadyEvent) -> None:
+        if self.d.data.lavalink is not None:
+            return
+
+        pool = LavalinkPool(
+            self,
+            lavalink_config.nodes,
+            detach=self.d.queue_store.detach,
+            reattach=self.d.queue_store.resume,
+        )
+        # Stored first, nodes may send their stats before the others connect
+        self.d.data.lavalink = pool
+        await pool.connect(self.build_lavalink)
+        await self.d.queue_store.restore()
+
+    async def build_lavalink(self, node: PoolNode) -> lavasnek_rs.Lavalink:
         builder = (
             lavasnek_rs.LavalinkBuilder(self.get_me(), bot_config.token)
-            .set_host("lavalink")
+            .set_host(node.host)
+            .set_port(node.port)
             .set_password(lavalink_config.password)
+            .set_is_ssl(lavalink_config.ssl)
+            # Voice connections go through hikari, so the pool can hand them
+            # to another node
+            .set_start_gateway(False)
         )
-        if HIKARI_VOICE:
-            builder.set_start_gateway(False)
+        return await builder.build(EventHandler(self, node.name))
+
+    async def on_voice_state_update(self, event: hikari.VoiceStateUpdateEvent) -> None:
+        if self.d.data.lavalink is not None:
+            await self.d.data.lavalink.on_voice_state_update(event)
+        await self.d.voice_reaper.on_voice_state_update(event)
 
-        event_handler = EventHandler(self)
-        lava_client = await builder.build(event_handler)
-        self.d.data.lavalink = lava_client
+    async def on_voice_server_update(
+        self, event: hikari.VoiceServerUpdateEvent
+    ) -> None:
+        if self.d.data.lavalink is not None:
+            await self.d.data.lavalink.on_voice_server_update(event)
 
     async def on_started(self, _: hikari.StartedEvent) -> None:
+        self.scheduler.add_job(
+            self.d.voice_reaper.reap,
+            "interval",
+            seconds=REAP_INTERVAL,
+            id=REAP_JOB,
+            replace_existing=True,
+        )
         self.scheduler.start()
         asyncio.create_task(self.custom_activity.change_status())
         logger.info("Bot has started sucessfully.")
+        try:
+            await self.metrics.start_server(
+                bot_config.metrics_host, bot_config.metrics_port
+            )
+        except OSError as e:
+            logger.error("Could not serve metrics: %s", e)
 
     async def on_stopping(self, _: hikari.StoppingEvent) -> None:
         self.scheduler.shutdown()
+        await self.d.queue_store.flush()
+        await self.d.lyrics.close()
+        self.d.executor.shutdown(wait=False, cancel_futures=True)
+        await self.metrics.stop_server()
         logger.info("Bot is stopping...")
 
     async def on_stopped(self, _: hikari.StoppedEvent) -> None:
@@ -112,16 +337,36 @@ class Peacebot(lightbulb.BotApp):
     async def connect_db(self) -> None:
         logger.info("Connecting to Database....")
         await Tortoise.init(tortoise_config)
+        self.metrics.count_calls(
+            type(Tortoise.get_connection("default")), DB_METHODS, "db"
+        )
         logger.info("Connected to DB sucessfully!")
+        self._db_connected.set()
+
+    async def on_guild_available(self, event: hikari.GuildAvailableEvent) -> None:
+        self._pending_guilds.add(event.guild_id)
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.create_task(self.warm_guild_cache())
+
+    async def warm_guild_cache(self) -> None:
+        """
+        Batches the guilds streamed in by the gateway and loads their config
+        in bulk, so no guild has to hit the database on its first message.
+        """
+        await asyncio.sleep(GUILD_WARMUP_DELAY)
+        await self._db_connected.wait()
+        guild_ids, self._pending_guilds = self._pending_guilds, set()
+        self._warmup_task = None
+        await self.d.guild_cache.warm(guild_ids)
 
     async def on_message(self, event: hikari.GuildMessageCreateEvent) -> None:
         if not event.is_human or not event.message.content:
             return
 
-        if not f"<@!{self.get_me().id}>" == event.message.content.strip():
+        context = await self.d.message_pipeline.process(event.message)
+        if not context.mentions_bot:
             return
-        model = await GuildModel.get_or_none(id=event.guild_id)
-        prefix = model.prefix
+        prefix = context.guild.prefix
         response = f"""
             Hi {event.author.mention}, My prefix here is {self.get_me().mention} or `{prefix}`
             Slash Commands are also here. Type in / and then select command from the popup
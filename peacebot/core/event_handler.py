@@ -4,10 +4,8 @@ from typing import TYPE_CHECKING
 
 import hikari
 import lavasnek_rs
-import miru
 
 from peacebot.core.plugins.Music import MusicError, fetch_lavalink
-from peacebot.core.plugins.Music.music import Controls
 from peacebot.core.utils.embed_colors import EmbedColors
 
 if TYPE_CHECKING:
@@ -17,20 +15,21 @@ logger = logging.getLogger(__name__)
 
 
 class EventHandler:
-    def __init__(self, bot: "Peacebot") -> None:
+    def __init__(self, bot: "Peacebot", node: str) -> None:
         self.bot = bot
+        # The Lavalink node of the pool whose events this handles
+        self.node = node
 
     async def track_start(
         self, lavalink: lavasnek_rs.Lavalink, event: lavasnek_rs.TrackStart
     ) -> None:
-        view = Controls(self.bot, timeout=120)
         logger.info(f"Track started on Guild: {event.guild_id}")
+        # lavasnek moved on to the next track, the queue copy has to follow
+        self.bot.d.queue_store.update_position(event.guild_id, 0)
+        await self.bot.d.queues.release(event.guild_id)
         node = await lavalink.get_guild_node(event.guild_id)
-
-        if node:
-            data = node.get_data()
-            channel_id = data[event.guild_id]
-            channel = self.bot.cache.get_guild_channel(channel_id)
+        if not node or not node.now_playing:
+            return
 
         embed = (
             hikari.Embed(
@@ -48,21 +47,35 @@ class EventHandler:
                 name="Author", value=node.now_playing.track.info.author, inline=True
             )
         )
-
-        message = await channel.send(embed=embed, components=view.build())
-        view.start(message)
-        await view.wait()
+        # Ready in the cache by the time anyone asks for /lyrics
+        self.bot.d.lyrics.prefetch(node.now_playing.track.info.title)
+        # Restored sessions have no text channel when none was saved
+        channel_id = node.get_data().get(event.guild_id)
+        if channel_id is None:
+            return
+        # Sent in the background, the guild's message is edited if it has one
+        self.bot.d.now_playing.announce(event.guild_id, channel_id, embed)
 
     async def track_finish(
         self, _: lavasnek_rs.Lavalink, event: lavasnek_rs.TrackFinish
     ):
         logger.info(f"Track finished on Guild: {event.guild_id}")
+        await self.bot.d.queues.release(event.guild_id)
+
+    async def player_update(
+        self, _: lavasnek_rs.Lavalink, event: lavasnek_rs.PlayerUpdate
+    ) -> None:
+        self.bot.d.queue_store.update_position(event.guild_id, event.state_position)
+
+    async def stats(self, _: lavasnek_rs.Lavalink, event: lavasnek_rs.Stats) -> None:
+        self.bot.d.data.lavalink.update_stats(self.node, event)
 
     async def track_exception(
         self, lavalink: lavasnek_rs.Lavalink, event: lavasnek_rs.TrackException
     ):
         logger.warning("Track Exception happened on Guild: %d", event.guild_id)
 
+        await self.bot.d.queues.release(event.guild_id)
         skip = await lavalink.skip(event.guild_id)
         node = await lavalink.get_guild_node(event.guild_id)
 
@@ -75,18 +88,17 @@ class EventHandler:
     async def track_stuck(
         self, lavalink: lavasnek_rs.Lavalink, event: lavasnek_rs.TrackStuck
     ) -> None:
-        view = Controls(self.bot, timeout=120)
         logger.warning("Track stuck on Guild: %d", event.guild_id)
         node = await lavalink.get_guild_node(event.guild_id)
-        if node:
-            data = node.get_data()
-            channel_id = data[event.guild_id]
-            channel = self.bot.cache.get_guild_channel(channel_id)
+        if not node or not node.now_playing:
+            return
+        channel_id = node.get_data().get(event.guild_id)
+        if channel_id is None:
+            return
+
         embed = hikari.Embed(
             title="Track Stuck",
             description=f"Looks like [{node.now_playing.track.info.title}]({node.now_playing.track.info.uri}) got stuck!",
             color=EmbedColors.ERROR,
         )
-        message = await channel.send(embed=embed, components=view.build())
-        view.start(message)
-        await view.wait()
+        self.bot.d.now_playing.announce(event.guild_id, channel_id, embed)
@@ -1,8 +1,6 @@
 import hikari
 import lightbulb
 
-from models import GuildModel
-
 admin_plugin = lightbulb.Plugin(
     name="Admin", description="Admin commands for the server"
 )
@@ -17,7 +15,7 @@ admin_plugin.add_checks(
 @lightbulb.implements(lightbulb.PrefixCommand, lightbulb.SlashCommand)
 async def changeprefix(ctx: lightbulb.Context) -> None:
     prefix = ctx.options.prefix
-    model = await GuildModel.get_or_none(id=ctx.guild_id)
+    model = await ctx.bot.d.guild_cache.get(ctx.guild_id)
     model.prefix = prefix
     await model.save()
 
@@ -14,6 +14,7 @@ import yuyo
 from lightbulb.utils import nav
 
 import peacebot.core.utils.helper_functions as hf
+from peacebot.core.utils.embed_colors import EmbedColors
 
 from . import CommandError, handle_plugins
 
@@ -145,6 +146,22 @@ async def load_plugin(ctx: lightbulb.Context) -> None:
     await handle_plugins(ctx, plugin, "load")
 
 
+@owner_plugin.command
+@lightbulb.command("cachestats", "View the lookup counters of the guild cache")
+@lightbulb.implements(lightbulb.PrefixCommand, lightbulb.SlashCommand)
+async def cache_stats(ctx: lightbulb.Context) -> None:
+    guild_cache = ctx.bot.d.guild_cache
+    embed = (
+        hikari.Embed(title="Guild Cache", color=EmbedColors.INFO)
+        .add_field(name="Cached Guilds", value=len(guild_cache), inline=True)
+        .add_field(name="Hits", value=guild_cache.hits, inline=True)
+        .add_field(name="Misses", value=guild_cache.misses, inline=True)
+        .add_field(name="Coalesced", value=guild_cache.coalesced, inline=True)
+        .add_field(name="Hit Rate", value=f"{guild_cache.hit_rate:.2%}", inline=True)
+    )
+    await ctx.respond(embed=embed)
+
+
 @owner_plugin.command
 @lightbulb.command("shutdown", "Shutdown the Bot")
 @lightbulb.implements(lightbulb.PrefixCommand, lightbulb.SlashCommand)
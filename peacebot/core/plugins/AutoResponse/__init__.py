@@ -1,32 +1,109 @@
 from __future__ import annotations
 
+import typing as t
 import uuid
 
-import hikari
 from lightbulb import LightbulbError
-from tortoise.query_utils import Q
 
 from models import AutoResponseModel, GuildModel
+from peacebot.core.utils.message_pipeline import MessageContext
 
 
 class AutoResponseError(LightbulbError):
     ...
 
 
-async def handle_message(message: hikari.Message) -> AutoResponseModel | None:
-    autoresponse_models = await AutoResponseModel.filter(
-        Q(
-            Q(
-                trigger__in=map(lambda m: m.lower(), message.content.split()),
-                extra_text=True,
-            )
-            | Q(trigger__iexact=message.content, extra_text=False)
-        )
-        & Q(Q(allowed_channel__isnull=True) | Q(allowed_channel=message.channel_id)),
-        guild__id=message.guild_id,
-        enabled=True,
-    )
-    return autoresponse_models[0] if autoresponse_models else None
+class AutoResponseMatcher:
+    """
+    Compiled autoresponses of a single guild.
+
+    Exact triggers and `extra_text` triggers are kept in separate hash maps,
+    so a message is matched with one lookup for the whole content and one
+    lookup per word, without going through the database.
+    """
+
+    def __init__(self, models: t.Iterable[AutoResponseModel] = ()) -> None:
+        self._exact: dict[str, list[AutoResponseModel]] = {}
+        self._words: dict[str, list[AutoResponseModel]] = {}
+        self._entries: dict[uuid.UUID, tuple[dict, str]] = {}
+        for model in models:
+            self.add(model)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def add(self, model: AutoResponseModel) -> None:
+        self.discard(model)
+        if not model.enabled:
+            return
+
+        table = self._words if model.extra_text else self._exact
+        trigger = model.trigger.lower()
+        table.setdefault(trigger, []).append(model)
+        self._entries[model.id] = (table, trigger)
+
+    def discard(self, model: AutoResponseModel) -> None:
+        if (entry := self._entries.pop(model.id, None)) is None:
+            return
+
+        table, trigger = entry
+        table[trigger] = [m for m in table[trigger] if m.id != model.id]
+        if not table[trigger]:
+            del table[trigger]
+
+    def match(
+        self, content: str, words: t.Iterable[str], channel_id: int
+    ) -> AutoResponseModel | None:
+        for model in self._exact.get(content, ()):
+            if model.allowed_channel in (None, channel_id):
+                return model
+
+        for word in words:
+            for model in self._words.get(word, ()):
+                if model.allowed_channel in (None, channel_id):
+                    return model
+
+        return None
+
+
+class AutoResponseCache:
+    """
+    Holds an AutoResponseMatcher per guild, compiled on the first message.
+    """
+
+    def __init__(self) -> None:
+        self._matchers: dict[int, AutoResponseMatcher] = {}
+
+    async def get(self, guild_id: int) -> AutoResponseMatcher:
+        matcher = self._matchers.get(guild_id)
+        if matcher is None:
+            models = await AutoResponseModel.filter(guild__id=guild_id, enabled=True)
+            matcher = self._matchers.setdefault(guild_id, AutoResponseMatcher(models))
+
+        return matcher
+
+    def add(self, *models: AutoResponseModel) -> None:
+        for model in models:
+            if (matcher := self._matchers.get(model.guild_id)) is not None:
+                matcher.add(model)
+
+    def discard(self, model: AutoResponseModel) -> None:
+        if (matcher := self._matchers.get(model.guild_id)) is not None:
+            matcher.discard(model)
+
+    def invalidate(self, guild_id: int) -> None:
+        self._matchers.pop(guild_id, None)
+
+
+autoresponse_cache = AutoResponseCache()
+
+
+async def handle_message(context: MessageContext) -> AutoResponseModel | None:
+    matcher = await autoresponse_cache.get(context.message.guild_id)
+    if not matcher:
+        return None
+
+    return matcher.match(context.normalized, context.tokens, context.message.channel_id)
 
 
 def is_valid_uuid(_uuid: str):
@@ -7,10 +7,16 @@ import hikari
 import lightbulb
 
 import peacebot.core.utils.helper_functions as hf
-from models import AutoResponseModel, GuildModel
+from models import AutoResponseModel
 from peacebot.core.utils.embed_colors import EmbedColors
 
-from . import AutoResponseError, clone_autoresponse, handle_message, is_valid_uuid
+from . import (
+    AutoResponseError,
+    autoresponse_cache,
+    clone_autoresponse,
+    handle_message,
+    is_valid_uuid,
+)
 
 autoresponse_plugin = lightbulb.Plugin("AutoResponse")
 autoresponse_plugin.add_checks(
@@ -112,7 +118,7 @@ async def autoresponse_add(ctx: lightbulb.Context) -> None:
         )
 
     logger.info(ctx.guild_id)
-    await AutoResponseModel.create(
+    autoresponse_model = await AutoResponseModel.create(
         guild_id=ctx.guild_id,
         trigger=ctx.options.trigger.lower(),
         response=ctx.options.response,
@@ -121,6 +127,7 @@ async def autoresponse_add(ctx: lightbulb.Context) -> None:
         extra_text=ctx.options.extra_text or False,
         mentions=ctx.options.mentions or False,
     )
+    autoresponse_cache.add(autoresponse_model)
 
     await ctx.respond(
         f"**New Autoresponse** `{ctx.options.trigger}` has been added to the server."
@@ -147,6 +154,7 @@ async def autoresponse_remove(ctx: lightbulb.Context) -> None:
         )
 
     await autoresponse_model.delete()
+    autoresponse_cache.discard(autoresponse_model)
     await ctx.respond(f"**Autoresponse** `{trigger}` has been removed from the server.")
 
 
@@ -242,7 +250,7 @@ async def autoresponse_import(ctx: lightbulb.Context) -> None:
             "Please note that you **CANNOT** import autoresponse from the **Same Server**"
         )
 
-    guild_model = await GuildModel.get_or_none(id=ctx.guild_id)
+    guild_model = await ctx.bot.d.guild_cache.get(ctx.guild_id)
 
     if is_valid_uuid(_id):
         autoresponse_model = await AutoResponseModel.get_or_none(id=_id)
@@ -251,6 +259,7 @@ async def autoresponse_import(ctx: lightbulb.Context) -> None:
 
         new_model = clone_autoresponse(autoresponse_model, guild_model)
         await new_model.save()
+        autoresponse_cache.add(new_model)
 
         return await ctx.respond(
             f"**Autoresponse** `{autoresponse_model.trigger}` has been imported to this server."
@@ -276,6 +285,7 @@ async def autoresponse_import(ctx: lightbulb.Context) -> None:
             clone_autoresponse(model, guild_model) for model in autoresponse_models
         ]
         await AutoResponseModel.bulk_create(autoresponse_models)
+        autoresponse_cache.add(*autoresponse_models)
         return await ctx.respond(
             "AutoResponse(s) have been **imported** from the provided server."
         )
@@ -303,6 +313,7 @@ async def autoresponse_toggle(ctx: lightbulb.Context) -> None:
 
     autoresponse.enabled = ctx.options.bool or not autoresponse.enabled
     await autoresponse.save()
+    autoresponse_cache.add(autoresponse)
 
     await ctx.respond(
         f"**Autoresponse** `{autoresponse.trigger}` has been **{'enabled' if autoresponse.enabled else 'disabled'}**."
@@ -314,7 +325,8 @@ async def on_message(event: hikari.GuildMessageCreateEvent) -> None:
     if not event.is_human or not event.message.content:
         return
 
-    autoresponse_model = await handle_message(event.message)
+    context = await event.app.d.message_pipeline.process(event.message)
+    autoresponse_model = await handle_message(context)
     if not autoresponse_model:
         return
 
@@ -1,81 +1,145 @@
+import time
+from datetime import datetime, timezone
+
+import hikari
 import lightbulb
 
-from peacebot.core.utils.helper_functions import error_handler
-from peacebot.core.utils.rtfm_helper import RTFMManager, SphinxObjectFileReader
+from peacebot.config.rtfm import rtfm_config
+from peacebot.core.utils.embed_colors import EmbedColors
+from peacebot.core.utils.helper_functions import CommandError, error_handler
+from peacebot.core.utils.rtfm_helper import AUTOCOMPLETE_CHOICES, RTFMRegistry
 
 rtfm_plugin = lightbulb.Plugin("RTFM", "RTFM Commands for the various Python modules")
-languages = {
-    "python": RTFMManager("python", "https://docs.python.org/3/"),
-    "hikari": RTFMManager("hikari", "https://hikari-py.github.io/hikari/"),
-    "lightbulb": RTFMManager(
-        "lightbulb", "https://hikari-lightbulb.readthedocs.io/en/latest"
-    ),
-    "django": RTFMManager("django", "https://django.readthedocs.io/en/latest/"),
-    "flask": RTFMManager("flask", "https://flask.palletsprojects.com/en/2.0.x/"),
-}
+registry = RTFMRegistry(rtfm_config.memory_budget_mb * 2 ** 20)
+for slug, url in rtfm_config.sources.items():
+    registry.add(slug, url)
+
+RTFM_REFRESH_JOB = "rtfm_refresh"
+# Sources added or removed at runtime, an empty URL marks a removed source
+RTFM_SOURCES_KEY = "rtfm:sources"
+# Discord drops autocomplete responses after 3 seconds
+AUTOCOMPLETE_BUDGET = 2.5
+
+
+@rtfm_plugin.listener(hikari.StartedEvent)
+async def prewarm_rtfm_sources(event: hikari.StartedEvent) -> None:
+    overrides = await event.app.d.redis.hgetall(RTFM_SOURCES_KEY)
+    for slug, url in overrides.items():
+        slug, url = slug.decode(), url.decode()
+        if url:
+            registry.add(slug, url)
+        elif slug in registry:
+            registry.remove(slug)
+
+    event.app.scheduler.add_job(
+        registry.refresh,
+        "interval",
+        kwargs={"loaded_only": True},
+        hours=rtfm_config.refresh_hours,
+        id=RTFM_REFRESH_JOB,
+        replace_existing=True,
+    )
+    await registry.refresh()
 
 
 @rtfm_plugin.command
+@lightbulb.option(
+    "object",
+    "The object or thing to search for",
+    required=False,
+    modifier=lightbulb.OptionModifier.CONSUME_REST,
+    autocomplete=True,
+)
+@lightbulb.option("source", "The documentation to search", autocomplete=True)
 @lightbulb.command("rtfm", "Get docs for a module")
-@lightbulb.implements(lightbulb.SlashCommandGroup, lightbulb.PrefixCommandGroup)
+@lightbulb.implements(lightbulb.SlashCommand, lightbulb.PrefixCommand)
 @error_handler()
 async def rtfm(ctx: lightbulb.Context) -> None:
-    await ctx.bot.help_command.send_group_help(ctx, ctx.command)
-
-
-@rtfm.child
-@lightbulb.option("object", "The object or thing to search for")
-@lightbulb.command("python", "Get references for Python")
-@lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
-@error_handler()
-async def rtfm_python(ctx: lightbulb.Context) -> None:
-    response_python = await languages["python"].do_rtfm(ctx.options.object)
-    await ctx.respond(response_python)
-
-
-@rtfm.child
-@lightbulb.option("object", "The object or thing to search for")
-@lightbulb.command("hikari", "Get references for Hikari")
-@lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
-@error_handler()
-async def rtfm_hikari(ctx: lightbulb.Context) -> None:
-    response_hikari = await languages["hikari"].do_rtfm(ctx.options.object)
-    await ctx.respond(response_hikari)
-
-
-@rtfm.child
-@lightbulb.option("object", "The object or thing to search for")
-@lightbulb.command("lightbulb", "Get references for Lightbulb")
-@lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
-@error_handler()
-async def rtfm_lightbulb(ctx: lightbulb.Context) -> None:
-    response_lightbulb = await languages["lightbulb"].do_rtfm(ctx.options.object)
-    await ctx.respond(response_lightbulb)
+    source = ctx.options.source.lower()
+    if source not in registry:
+        raise CommandError(
+            f"Unknown source `{source}`, available: {', '.join(map('`{}`'.format, registry))}"
+        )
+
+    await ctx.respond(await registry.do_rtfm(source, ctx.options.object))
+
+
+@rtfm.autocomplete("source", "object")
+async def rtfm_autocomplete(
+    option: hikari.AutocompleteInteractionOption,
+    interaction: hikari.AutocompleteInteraction,
+) -> list[str]:
+    # Skip keystrokes that waited too long for an answer to still be shown
+    age = datetime.now(timezone.utc) - interaction.created_at
+    if age.total_seconds() > AUTOCOMPLETE_BUDGET:
+        return []
+
+    value = str(option.value).lower()
+    if option.name == "source":
+        return [slug for slug in registry if value in slug][:AUTOCOMPLETE_CHOICES]
+
+    options = {opt.name: opt.value for opt in interaction.options or ()}
+    source = str(options.get("source", "")).lower()
+    start = time.perf_counter()
+    choices = registry.autocomplete(source, str(option.value))
+    interaction.app.metrics.latency["autocomplete", f"rtfm:{source}"].observe(
+        time.perf_counter() - start
+    )
+    return choices
 
 
-@rtfm.child
-@lightbulb.option("object", "The object or thing to search for")
-@lightbulb.command("django", "Get references for Django")
-@lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
+@rtfm_plugin.command
+@lightbulb.add_checks(lightbulb.owner_only)
+@lightbulb.option("url", "Base URL of the Sphinx documentation")
+@lightbulb.option("source", "Name of the source")
+@lightbulb.command("rtfmadd", "Add or replace a documentation source for rtfm")
+@lightbulb.implements(lightbulb.SlashCommand, lightbulb.PrefixCommand)
 @error_handler()
-async def rtfm_django(ctx: lightbulb.Context) -> None:
-    response_django = await languages["django"].do_rtfm(ctx.options.object)
-    await ctx.respond(response_django)
+async def rtfm_add(ctx: lightbulb.Context) -> None:
+    source, url = ctx.options.source.lower(), ctx.options.url.rstrip("/")
+    # The source is only replaced once the new URL has been loaded
+    manager = registry.create(source, url)
+    await manager.refresh()
+    registry.put(source, manager)
+    registry.enforce_budget()
+    await ctx.bot.d.redis.hset(RTFM_SOURCES_KEY, source, url)
+    await ctx.respond(
+        embed=hikari.Embed(
+            title="RTFM Source Added",
+            description=f"`{source}` now searches <{url}>",
+            color=EmbedColors.INFO,
+        )
+    )
 
 
-@rtfm.child
-@lightbulb.option("object", "The object or thing to search for")
-@lightbulb.command("flask", "Get references for Flask")
-@lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
+@rtfm_plugin.command
+@lightbulb.add_checks(lightbulb.owner_only)
+@lightbulb.option("source", "Name of the source")
+@lightbulb.command("rtfmremove", "Remove a documentation source from rtfm")
+@lightbulb.implements(lightbulb.SlashCommand, lightbulb.PrefixCommand)
 @error_handler()
-async def rtfm_flask(ctx: lightbulb.Context) -> None:
-    response_flask = await languages["flask"].do_rtfm(ctx.options.object)
-    await ctx.respond(response_flask)
+async def rtfm_remove(ctx: lightbulb.Context) -> None:
+    source = ctx.options.source.lower()
+    if source not in registry:
+        raise CommandError(f"Unknown source `{source}`")
+
+    registry.remove(source)
+    await ctx.bot.d.redis.hset(RTFM_SOURCES_KEY, source, "")
+    await ctx.respond(
+        embed=hikari.Embed(
+            title="RTFM Source Removed",
+            description=f"`{source}` has been removed",
+            color=EmbedColors.INFO,
+        )
+    )
 
 
 def load(bot: lightbulb.BotApp) -> None:
+    registry.executor = bot.d.executor
     bot.add_plugin(rtfm_plugin)
 
 
 def unload(bot: lightbulb.BotApp) -> None:
+    if bot.scheduler.get_job(RTFM_REFRESH_JOB) is not None:
+        bot.scheduler.remove_job(RTFM_REFRESH_JOB)
     bot.remove_plugin(rtfm_plugin)
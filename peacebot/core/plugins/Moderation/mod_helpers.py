@@ -3,7 +3,7 @@ from datetime import datetime
 import hikari
 import lightbulb
 
-from models import GuildModel, ModerationRoles
+from models import ModerationRoles
 from peacebot.core.utils.embed_colors import EmbedColors
 from peacebot.core.utils.permissions import (
     PermissionsError,
@@ -178,10 +178,7 @@ async def list_command(ctx: lightbulb.Context) -> None:
 @lightbulb.implements(lightbulb.SlashSubCommand, lightbulb.PrefixSubCommand)
 async def modlog_command(ctx: lightbulb.Context) -> None:
     channel: hikari.GuildTextChannel | None = ctx.options.channel
-    model = await GuildModel.get_or_none(id=ctx.guild_id)
-    if model is None:
-        raise PermissionsError("Guild Model not found for the server.")
-
+    model = await ctx.bot.d.guild_cache.get(ctx.guild_id)
     if channel is None:
         model.mod_log_channel = None
         await model.save()
@@ -1,9 +1,20 @@
 # import re
+import typing as t
 
 import lavasnek_rs
 import lightbulb
 
-__all__ = ["_join", "_leave", "check_voice_state", "fetch_lavalink"]
+from peacebot.core.utils.guild_queue import GuildQueue
+from peacebot.core.utils.lavalink_pool import LavalinkPool
+from peacebot.core.utils.voice_reaper import end_voice_session
+
+__all__ = [
+    "_enqueue",
+    "_join",
+    "_leave",
+    "check_voice_state",
+    "fetch_lavalink",
+]
 
 # URL_REGEX = re.compile(
 #     r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
@@ -14,6 +25,9 @@ class MusicError(lightbulb.LightbulbError):
     pass
 
 
+NO_NODE_MESSAGE = "No audio node is available right now, try again in a moment."
+
+
 async def _join(ctx: lightbulb.Context) -> int:
     lavalink = fetch_lavalink(ctx.bot)
     if ctx.bot.cache.get_voice_state(ctx.get_guild(), ctx.bot.get_me()):
@@ -31,6 +45,8 @@ async def _join(ctx: lightbulb.Context) -> int:
 
     except TimeoutError:
         raise MusicError("I cannot connect to your voice channel!")
+    except lavasnek_rs.NetworkError:
+        raise MusicError(NO_NODE_MESSAGE)
 
     await lavalink.create_session(connection_info)
     node = await lavalink.get_guild_node(ctx.guild_id)
@@ -39,16 +55,34 @@ async def _join(ctx: lightbulb.Context) -> int:
 
 
 async def _leave(ctx: lightbulb.Context):
-    lavalink = fetch_lavalink(ctx.bot)
-    await lavalink.destroy(ctx.guild_id)
-    await lavalink.stop(ctx.guild_id)
-    await lavalink.leave(ctx.guild_id)
-    await lavalink.remove_guild_node(ctx.guild_id)
-    await lavalink.remove_guild_from_loops(ctx.guild_id)
-
+    await end_voice_session(ctx.bot, ctx.guild_id)
     await ctx.respond("I left the voice channel!")
 
 
+async def _enqueue(
+    lavalink: lavasnek_rs.Lavalink,
+    queue: GuildQueue,
+    tracks: t.Sequence[lavasnek_rs.Track],
+    requester: int,
+) -> None:
+    """
+    Appends the tracks to the guild's queue with a single node update instead
+    of one round trip into lavasnek per track. The first track has to go
+    through `queue()` already, which starts the playback if nothing is playing.
+    """
+    if not tracks:
+        return
+
+    await queue.load()
+    if not queue:
+        raise MusicError("I am not connected to any voice channel")
+
+    queue.extend(
+        lavalink.play(queue.guild_id, track).requester(requester).to_track_queue()
+        for track in tracks
+    )
+
+
 def check_voice_state(f):
     async def predicate(ctx: lightbulb.Context, *args, **kwargs):
         guild = ctx.get_guild()
@@ -77,5 +111,5 @@ def check_voice_state(f):
     return predicate
 
 
-def fetch_lavalink(bot: lightbulb.BotApp) -> lavasnek_rs.Lavalink:
+def fetch_lavalink(bot: lightbulb.BotApp) -> LavalinkPool:
     return bot.d.data.lavalink
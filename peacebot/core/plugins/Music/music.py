@@ -1,81 +1,191 @@
-import random
+import functools
+import math
 from datetime import datetime
 
-import aiohttp
 import hikari
 import lavasnek_rs
 import lightbulb
-import miru
-from lightbulb.utils import nav
 
 from peacebot.core.utils.embed_colors import EmbedColors
-from peacebot.core.utils.utilities import _chunk
-
-from . import MusicError, _join, _leave, check_voice_state, fetch_lavalink
+from peacebot.core.utils.guild_queue import GuildQueue
+from peacebot.core.utils.lyrics import LyricsError
+from peacebot.core.utils.now_playing import (
+    CONTROLS_PREFIX,
+    PLAY_PAUSE,
+    REQUEUE,
+    SKIP,
+    build_controls,
+)
+from peacebot.core.utils.pagination import LazyButtonNavigator, LazyPages
+
+from . import (
+    NO_NODE_MESSAGE,
+    MusicError,
+    _enqueue,
+    _join,
+    _leave,
+    check_voice_state,
+    fetch_lavalink,
+)
 
 music_plugin = lightbulb.Plugin("Music")
 
+QUEUE_PAGE_SIZE = 8
+LYRICS_PAGE_LINES = 20
 
-class Controls(miru.View):
-    @miru.button(label="Play/Pause", style=hikari.ButtonStyle.SUCCESS)
-    async def play_pause_button(
-        self, _: miru.Button, interaction: miru.Interaction
-    ) -> None:
-        lavalink = fetch_lavalink(music_plugin.bot)
-        node = await lavalink.get_guild_node(interaction.guild_id)
-        if node.is_paused:
-            await lavalink.resume(interaction.guild_id)
-            await lavalink.set_pause(interaction.guild_id, False)
-            await interaction.send_message(
-                "Resumed the Playback!", flags=hikari.MessageFlag.EPHEMERAL
-            )
-        else:
-            await lavalink.pause(interaction.guild_id)
-            await lavalink.set_pause(interaction.guild_id, True)
-            await interaction.send_message(
-                "Paused the playback!", flags=hikari.MessageFlag.EPHEMERAL
-            )
 
-    @miru.button(label="Re-Queue", style=hikari.ButtonStyle.PRIMARY)
-    async def requeue_button(
-        self, button: miru.Button, interaction: miru.Interaction
-    ) -> None:
-        lavalink = fetch_lavalink(music_plugin.bot)
-        node = await lavalink.get_guild_node(interaction.guild_id)
-        queue = node.queue
-        now_playing = queue[0]
-        queue.insert(1, now_playing)
-        node.queue = queue
-        await lavalink.set_guild_node(interaction.guild_id, node)
-        await interaction.send_message("Added the song to the Queue again!")
-        button.disabled = True
-        await self.message.edit(components=self.build())
-
-    @miru.button(label="Skip", style=hikari.ButtonStyle.DANGER)
-    async def skip_button(
-        self, button: miru.Button, interaction: miru.Interaction
-    ) -> None:
-        lavalink = fetch_lavalink(music_plugin.bot)
-        skip = await lavalink.skip(interaction.guild_id)
-        node = await lavalink.get_guild_node(interaction.guild_id)
-
-        if not skip:
-            return await interaction.send_message(
-                "I don't see any tracks to skip 😕", flags=hikari.MessageFlag.EPHEMERAL
-            )
+def _format_duration(millis: int) -> str:
+    minutes, seconds = divmod(millis // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+def _track_line(track_queue: lavasnek_rs.TrackQueue) -> str:
+    info = track_queue.track.info
+    return f"`{_format_duration(info.length)}` [{info.title}]({info.uri}) [<@{track_queue.requester}>]"  # noqa: E501
+
+
+def _queue_page(
+    title: str,
+    guild_queue: GuildQueue,
+    upcoming: list[lavasnek_rs.TrackQueue],
+    now_playing: str,
+    index: int,
+) -> hikari.Embed:
+    """
+    Renders one page of the queue command. Only the pages that are looked at
+    get rendered, and the track lines are cached by the guild's queue.
+    """
+    start = index * QUEUE_PAGE_SIZE
+    lines = "\n".join(
+        f"{position}.{guild_queue.line(track_queue, _track_line)}"
+        for position, track_queue in enumerate(
+            upcoming[start : start + QUEUE_PAGE_SIZE], start + 1
+        )
+    )
+    return (
+        hikari.Embed(
+            title=title,
+            color=EmbedColors.INFO,
+            timestamp=datetime.now().astimezone(),
+            description=f"**Next Up**\n{lines}",
+        )
+        .set_footer(text=f"Page {index+1}")
+        .add_field(name="Now Playing", value=now_playing)
+    )
+
+
+def _lyrics_page(title: str, uri: str, lines: list[str], index: int) -> hikari.Embed:
+    start = index * LYRICS_PAGE_LINES
+    return (
+        hikari.Embed(
+            description="\n".join(lines[start : start + LYRICS_PAGE_LINES]),
+            color=EmbedColors.INFO,
+            timestamp=datetime.now().astimezone(),
+        )
+        .set_footer(text=f"Page {index+1}")
+        .set_author(name=title, url=uri)
+    )
 
-        if not node.queue and not node.now_playing:
-            await lavalink.stop(interaction.guild_id)
 
-        await interaction.send_message("Skipped!", flags=hikari.MessageFlag.EPHEMERAL)
-        button.disabled = True
-        await self.message.edit(components=self.build())
+async def _play_pause(interaction: hikari.ComponentInteraction) -> None:
+    lavalink = fetch_lavalink(music_plugin.bot)
+    node = await lavalink.get_guild_node(interaction.guild_id)
+    if not node or not node.now_playing:
+        return await interaction.create_initial_response(
+            hikari.ResponseType.MESSAGE_CREATE,
+            "There's nothing playing at the moment!",
+            flags=hikari.MessageFlag.EPHEMERAL,
+        )
 
-    async def on_timeout(self) -> None:
-        for child in self.children:
-            child.disabled = True
+    if node.is_paused:
+        await lavalink.resume(interaction.guild_id)
+        await lavalink.set_pause(interaction.guild_id, False)
+        await interaction.create_initial_response(
+            hikari.ResponseType.MESSAGE_CREATE,
+            "Resumed the Playback!",
+            flags=hikari.MessageFlag.EPHEMERAL,
+        )
+    else:
+        await lavalink.pause(interaction.guild_id)
+        await lavalink.set_pause(interaction.guild_id, True)
+        await interaction.create_initial_response(
+            hikari.ResponseType.MESSAGE_CREATE,
+            "Paused the playback!",
+            flags=hikari.MessageFlag.EPHEMERAL,
+        )
 
-        await self.message.edit(components=self.build())
+
+async def _requeue(interaction: hikari.ComponentInteraction) -> None:
+    guild_queue = await music_plugin.bot.d.queues.get(interaction.guild_id)
+    if not guild_queue:
+        return await interaction.create_initial_response(
+            hikari.ResponseType.MESSAGE_CREATE,
+            "There's nothing playing at the moment!",
+            flags=hikari.MessageFlag.EPHEMERAL,
+        )
+
+    guild_queue.requeue()
+    await interaction.create_initial_response(
+        hikari.ResponseType.MESSAGE_CREATE, "Added the song to the Queue again!"
+    )
+    # Enabled again when the message shows the next track
+    await music_plugin.bot.rest.edit_message(
+        interaction.channel_id,
+        interaction.message,
+        components=[build_controls(music_plugin.bot.rest, disabled={REQUEUE})],
+    )
+
+
+async def _skip(interaction: hikari.ComponentInteraction) -> None:
+    lavalink = fetch_lavalink(music_plugin.bot)
+    await music_plugin.bot.d.queues.release(interaction.guild_id)
+    skip = await lavalink.skip(interaction.guild_id)
+    node = await lavalink.get_guild_node(interaction.guild_id)
+
+    if not skip:
+        return await interaction.create_initial_response(
+            hikari.ResponseType.MESSAGE_CREATE,
+            "I don't see any tracks to skip 😕",
+            flags=hikari.MessageFlag.EPHEMERAL,
+        )
+
+    if not node.queue and not node.now_playing:
+        await lavalink.stop(interaction.guild_id)
+
+    await interaction.create_initial_response(
+        hikari.ResponseType.MESSAGE_CREATE,
+        "Skipped!",
+        flags=hikari.MessageFlag.EPHEMERAL,
+    )
+
+
+CONTROLS = {
+    PLAY_PAUSE: _play_pause,
+    REQUEUE: _requeue,
+    SKIP: _skip,
+}
+
+
+@music_plugin.listener(hikari.InteractionCreateEvent)
+async def on_controls(event: hikari.InteractionCreateEvent) -> None:
+    """
+    Handles the playback buttons of every now playing message. The buttons
+    are routed by custom id, so no view has to stay alive per message.
+    """
+    interaction = event.interaction
+    if (
+        not isinstance(interaction, hikari.ComponentInteraction)
+        or interaction.guild_id is None
+        or not interaction.custom_id.startswith(CONTROLS_PREFIX)
+    ):
+        return
+
+    handler = CONTROLS.get(interaction.custom_id)
+    if handler is not None:
+        await handler(interaction)
 
 
 @music_plugin.command
@@ -133,11 +243,14 @@ async def play(ctx: lightbulb.Context) -> None:
         query = " ".join(ctx.options.query)
     else:
         query = ctx.options.query
-    con = lavalink.get_guild_gateway_connection_info(ctx.guild_id)
-    if not con:
-        await _join(ctx)
+    try:
+        con = lavalink.get_guild_gateway_connection_info(ctx.guild_id)
+        if not con:
+            await _join(ctx)
 
-    query_information = await lavalink.auto_search_tracks(query)
+        query_information = await ctx.bot.d.track_cache.search(lavalink, query)
+    except lavasnek_rs.NetworkError:
+        raise MusicError(NO_NODE_MESSAGE)
     playlist = False
     if query_information.playlist_info.name:
         playlist = True
@@ -145,15 +258,18 @@ async def play(ctx: lightbulb.Context) -> None:
     if not query_information.tracks:
         raise MusicError("No matching video to the given query!")
 
-    if playlist:
+    tracks = query_information.tracks if playlist else query_information.tracks[:1]
+    guild_queue = await ctx.bot.d.queues.get(ctx.guild_id)
+    if not guild_queue:
+        # Nothing is playing, queueing through lavasnek starts the playback
+        first, *tracks = tracks
         try:
-            for track in query_information.tracks:
-                await lavalink.play(ctx.guild_id, track).requester(
-                    ctx.author.id
-                ).queue()
+            await lavalink.play(ctx.guild_id, first).requester(ctx.author.id).queue()
         except lavasnek_rs.NoSessionPresent:
             raise MusicError("I am not connected to any voice channel")
+        guild_queue.invalidate()
 
+    if playlist:
         await ctx.respond(
             embed=hikari.Embed(
                 title="Playlist Added",
@@ -162,13 +278,6 @@ async def play(ctx: lightbulb.Context) -> None:
             )
         )
     else:
-        try:
-            await lavalink.play(ctx.guild_id, query_information.tracks[0]).requester(
-                ctx.author.id
-            ).queue()
-        except lavasnek_rs.NoSessionPresent:
-            raise MusicError("I am not connected to any voice channel")
-
         await ctx.respond(
             embed=hikari.Embed(
                 title="Track Added",
@@ -176,6 +285,7 @@ async def play(ctx: lightbulb.Context) -> None:
                 color=EmbedColors.INFO,
             )
         )
+    await _enqueue(lavalink, guild_queue, tracks, ctx.author.id)
 
 
 @music_plugin.command
@@ -190,50 +300,28 @@ async def queue(ctx: lightbulb.Context) -> None:
     ----------
     None
     """
-    lavalink = fetch_lavalink(ctx.bot)
-    song_queue = []
-    node = await lavalink.get_guild_node(ctx.guild_id)
-    if not node or not node.queue:
+    guild_queue = await ctx.bot.d.queues.get(ctx.guild_id)
+    if not guild_queue:
         raise MusicError("There are no tracks in the queue.")
 
-    for song in node.queue:
-        song_queue += [
-            f"[{song.track.info.title}]({song.track.info.uri}) [<@{song.requester}>]"
-        ]
-
-    fields = []
-    counter = 1
-    if not len(song_queue[1:]) > 0:
+    now_playing = guild_queue.line(guild_queue.now_playing, _track_line)
+    upcoming = guild_queue[1:]
+    if not upcoming:
         return await ctx.respond(
-            f"No tracks in the queue.\n**Now Playing** : [{node.now_playing.track.info.title}]({node.now_playing.track.info.uri})"
-        )
-    for index, track in enumerate(_chunk(song_queue[1:], 8)):
-        string = """**Next Up**\n"""
-        for i in track:
-            amount = node.queue[counter].track.info.length
-            millis = int(amount)
-            l_seconds = (millis / 1000) % 60
-            l_seconds = int(l_seconds)
-            l_minutes = (millis / (1000 * 60)) % 60
-            l_minutes = int(l_minutes)
-            first_n = int(l_seconds / 10)
-            string += f"""{counter}.`{l_minutes}:{l_seconds if first_n !=0 else f'0{l_seconds}'}` {i}\n"""
-
-            counter += 1
-        embed = hikari.Embed(
-            title=f"Queue for {ctx.get_guild()}",
-            color=EmbedColors.INFO,
-            timestamp=datetime.now().astimezone(),
-            description=string,
-        )
-        embed.set_footer(text=f"Page {index+1}")
-        embed.add_field(
-            name="Now Playing",
-            value=f"[{node.now_playing.track.info.title}]({node.now_playing.track.info.uri}) [<@{node.now_playing.requester}>]",  # noqa: E501
+            f"No tracks in the queue.\n**Now Playing** : {now_playing}"
         )
-        fields.append(embed)
 
-    navigator = nav.ButtonNavigator(iter(fields))
+    pages = LazyPages(
+        math.ceil(len(upcoming) / QUEUE_PAGE_SIZE),
+        functools.partial(
+            _queue_page,
+            f"Queue for {ctx.get_guild()}",
+            guild_queue,
+            upcoming,
+            now_playing,
+        ),
+    )
+    navigator = LazyButtonNavigator(pages)
     await navigator.run(ctx)
 
 
@@ -307,18 +395,12 @@ async def shuffle(ctx: lightbulb.Context) -> None:
     ----------
     None
     """
-    lavalink = fetch_lavalink(ctx.bot)
-    node = await lavalink.get_guild_node(ctx.guild_id)
+    guild_queue = await ctx.bot.d.queues.get(ctx.guild_id)
 
-    if not len(node.queue) > 1:
+    if not len(guild_queue) > 1:
         raise MusicError("Cannot shuffle a single song 🥴")
 
-    queue = node.queue[1:]
-    random.shuffle(queue)
-    queue.insert(0, node.queue[0])
-
-    node.queue = queue
-    await lavalink.set_guild_node(ctx.guild_id, node)
+    guild_queue.shuffle()
 
     await ctx.respond("🔀 Queue has been shuffled.", flags=hikari.MessageFlag.EPHEMERAL)
 
@@ -338,6 +420,7 @@ async def skip(ctx: lightbulb.Context) -> None:
     None
     """
     lavalink = fetch_lavalink(ctx.bot)
+    await ctx.bot.d.queues.release(ctx.guild_id)
     skip = await lavalink.skip(ctx.guild_id)
     node = await lavalink.get_guild_node(ctx.guild_id)
 
@@ -372,7 +455,9 @@ async def stop(ctx: lightbulb.Context) -> None:
     None
     """
     lavalink = fetch_lavalink(ctx.bot)
+    await ctx.bot.d.queues.release(ctx.guild_id)
     await lavalink.stop(ctx.guild_id)
+    ctx.bot.d.queue_store.forget(ctx.guild_id)
 
     await ctx.respond("⏹️ Playback has been stopped.")
 
@@ -413,29 +498,20 @@ async def move(ctx: lightbulb.Context) -> None:
         new_index : int
             Index at which song is to be moved.
     """
-    lavalink = fetch_lavalink(ctx.bot)
     new_index = int(ctx.options.new_index)
     old_index = int(ctx.options.old_index)
 
-    node = await lavalink.get_guild_node(ctx.guild_id)
-    if not len(node.queue) >= 1:
+    guild_queue = await ctx.bot.d.queues.get(ctx.guild_id)
+    if not len(guild_queue) > 2:
         raise MusicError("There seems to be only one song in the queue.")
 
-    queue = node.queue
-    song_to_be_moved = queue[old_index]
-
     try:
-        queue.pop(old_index)
-        queue.insert(new_index, song_to_be_moved)
-
-    except KeyError:
+        song_to_be_moved = guild_queue.move(old_index, new_index)
+    except IndexError:
         raise MusicError(
             "There is no song at the given index.\nCheck the queue and try again"
         )
 
-    node.queue = queue
-
-    await lavalink.set_guild_node(ctx.guild_id, node)
     embed = hikari.Embed(
         title=f"Moved `{song_to_be_moved.track.info.title}` to Position `{new_index}`",
         color=EmbedColors.INFO,
@@ -457,10 +533,9 @@ async def remove_song(ctx: lightbulb.Context) -> None:
     index : int
             Index of the song to be removed
     """
-    lavalink = fetch_lavalink(ctx.bot)
     index: int = ctx.options.index
-    node = await lavalink.get_guild_node(ctx.guild_id)
-    if not node.queue:
+    guild_queue = await ctx.bot.d.queues.get(ctx.guild_id)
+    if not guild_queue:
         raise MusicError("No songs in the queue")
 
     if index == 0:
@@ -468,16 +543,11 @@ async def remove_song(ctx: lightbulb.Context) -> None:
             f"You cannot remove a song that's playing now.\nUse {ctx.prefix}skip to skip the song."
         )
 
-    queue = node.queue
-    song_to_be_removed = queue[index]
-
     try:
-        queue.pop(index)
+        song_to_be_removed = guild_queue.remove(index)
     except IndexError:
         raise MusicError("No such song exists at the index you provided.")
 
-    node.queue = queue
-    await lavalink.set_guild_node(ctx.guild_id, node)
     embed = hikari.Embed(
         title=f"Removed `{song_to_be_removed.track.info.title}` from the queue.",
         color=EmbedColors.INFO,
@@ -490,7 +560,6 @@ async def remove_song(ctx: lightbulb.Context) -> None:
 @lightbulb.implements(lightbulb.SlashCommand, lightbulb.PrefixCommand)
 async def nowplaying(ctx: lightbulb.Context) -> None:
     lavalink = fetch_lavalink(ctx.bot)
-    view = Controls(ctx.bot, timeout=120)
     node = await lavalink.get_guild_node(ctx.guild_id)
 
     if not node or not node.now_playing:
@@ -507,9 +576,7 @@ async def nowplaying(ctx: lightbulb.Context) -> None:
     ]
     for name, value, inline in fields:
         embed.add_field(name=name, value=value, inline=inline)
-    message = await ctx.respond(embed=embed, components=view.build())
-    view.start(await message.message())
-    await view.wait()
+    await ctx.respond(embed=embed, components=[build_controls(ctx.bot.rest)])
 
 
 @music_plugin.command
@@ -530,27 +597,20 @@ async def lyrics_command(ctx: lightbulb.Context) -> None:
     assert node is not None
     if not node.now_playing:
         raise MusicError("There doesn't seem to be anything playing right now")
-    song_name = node.now_playing.track.info.title
-    async with aiohttp.request(
-        "GET", f"https://some-random-api.ml/lyrics?title={song_name}", headers={}
-    ) as r:
-        if not 200 <= r.status <= 299:
-            raise MusicError("I couldn't find the lyrics.")
-
-        data = await r.json()
-    lyrics = str(data["lyrics"])
-    iterator = lyrics.splitlines()
-    fields = [
-        hikari.Embed(
-            description="\n".join(line),
-            color=EmbedColors.INFO,
-            timestamp=datetime.now().astimezone(),
-        )
-        .set_footer(text=f"Page {index+1}")
-        .set_author(name=song_name, url=node.now_playing.track.info.uri)
-        for index, line in enumerate(_chunk(iterator, 20))
-    ]
-    navigator = nav.ButtonNavigator(iter(fields))
+    info = node.now_playing.track.info
+    try:
+        lyrics = await ctx.bot.d.lyrics.get(info.title)
+    except LyricsError:
+        lyrics = None
+    if not lyrics:
+        raise MusicError("I couldn't find the lyrics.")
+
+    lines = lyrics.splitlines()
+    pages = LazyPages(
+        math.ceil(len(lines) / LYRICS_PAGE_LINES),
+        functools.partial(_lyrics_page, info.title, info.uri, lines),
+    )
+    navigator = LazyButtonNavigator(pages)
     await navigator.run(ctx)
 
 
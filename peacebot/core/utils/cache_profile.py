@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import hikari
+
+PLUGINS_PATH = Path("./peacebot/core/plugins")
+
+
+class Requirements(t.NamedTuple):
+    intents: hikari.Intents = hikari.Intents.NONE
+    cache: hikari.CacheComponents = hikari.CacheComponents.NONE
+    # Only needed for complete output, the commands degrade gracefully without them
+    optional_intents: hikari.Intents = hikari.Intents.NONE
+    optional_cache: hikari.CacheComponents = hikari.CacheComponents.NONE
+
+    def __or__(self, other: Requirements) -> Requirements:
+        return Requirements(*(a | b for a, b in zip(self, other)))
+
+
+# Needed by the bot itself: prefix commands, lightbulb's permission checks
+# (guild, roles and the bot's own member) and the music announcements.
+BASE_REQUIREMENTS = Requirements(
+    intents=hikari.Intents.GUILDS
+    | hikari.Intents.GUILD_MESSAGES
+    | hikari.Intents.DM_MESSAGES,
+    cache=hikari.CacheComponents.GUILDS
+    | hikari.CacheComponents.GUILD_CHANNELS
+    | hikari.CacheComponents.ROLES
+    | hikari.CacheComponents.MEMBERS,
+)
+
+PLUGIN_REQUIREMENTS: dict[str, Requirements] = {
+    "Admin": Requirements(),
+    "AutoResponse": Requirements(),
+    "Fun": Requirements(),
+    # serverinfo counts the cached members, userinfo shows the cached presence
+    "Miscellaneous": Requirements(
+        optional_intents=hikari.Intents.GUILD_MEMBERS | hikari.Intents.GUILD_PRESENCES,
+        optional_cache=hikari.CacheComponents.PRESENCES,
+    ),
+    "Moderation": Requirements(),
+    # _join and check_voice_state read the cached voice states
+    "Music": Requirements(
+        intents=hikari.Intents.GUILD_VOICE_STATES,
+        cache=hikari.CacheComponents.VOICE_STATES,
+    ),
+}
+
+CACHE_PROFILES = ("full", "standard", "minimal")
+
+
+def plugin_requirements(plugins_path: Path = PLUGINS_PATH) -> Requirements:
+    """
+    Combines the requirements of every plugin package that will be loaded.
+    Unknown plugins are assumed to need everything.
+    """
+    requirements = BASE_REQUIREMENTS
+    for path in plugins_path.iterdir():
+        if not path.is_dir() or path.name.startswith("_"):
+            continue
+
+        requirements |= PLUGIN_REQUIREMENTS.get(
+            path.name, Requirements(hikari.Intents.ALL, hikari.CacheComponents.ALL)
+        )
+
+    return requirements
+
+
+def resolve_cache_profile(
+    profile: str, plugins_path: Path = PLUGINS_PATH
+) -> tuple[hikari.Intents, hikari.CacheSettings]:
+    """
+    Returns the gateway intents and cache settings for a cache profile.
+
+    full:     every intent and cache component.
+    standard: what the loaded plugins need for complete output.
+    minimal:  what the loaded plugins cannot work without.
+    """
+    if profile == "full":
+        return hikari.Intents.ALL, hikari.CacheSettings()
+
+    if profile not in CACHE_PROFILES:
+        raise ValueError(f"Unknown cache profile {profile!r}")
+
+    requirements = plugin_requirements(plugins_path)
+    intents, components = requirements.intents, requirements.cache
+    if profile == "standard":
+        intents |= requirements.optional_intents
+        components |= requirements.optional_cache
+
+    return intents, hikari.CacheSettings(components=components)
@@ -0,0 +1,93 @@
+import logging
+import typing as t
+
+from tortoise.exceptions import IntegrityError
+
+from models import GuildModel
+from peacebot.core.utils.utilities import SingleFlight, _chunk
+
+logger = logging.getLogger(__name__)
+
+
+class GuildCache:
+    """
+    In-memory cache of the guild configuration, keyed by guild id.
+
+    Each guild is fetched from the database once, and invalidated
+    whenever the configuration is changed through the bot. Concurrent
+    lookups of a guild that is not cached yet share a single query.
+    """
+
+    WARM_BATCH_SIZE = 1000
+
+    def __init__(self) -> None:
+        self._guilds: dict[int, GuildModel] = {}
+        self._lookups: SingleFlight[int, GuildModel] = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    async def get(self, guild_id: int) -> GuildModel:
+        """
+        Returns the cached GuildModel, creating the row on the first lookup.
+        """
+        try:
+            model = self._guilds[guild_id]
+        except KeyError:
+            self.misses += 1
+            return await self._lookups.do(guild_id, lambda: self._fetch(guild_id))
+
+        self.hits += 1
+        return model
+
+    async def _fetch(self, guild_id: int) -> GuildModel:
+        model, _ = await GuildModel.get_or_create(id=guild_id)
+        return self._guilds.setdefault(guild_id, model)
+
+    async def warm(self, guild_ids: t.Iterable[int]) -> None:
+        """
+        Loads the configuration of many guilds with batched `IN (...)` queries,
+        bulk-inserting the rows of guilds that are not in the database yet.
+        """
+        missing_ids = (i for i in guild_ids if i not in self._guilds)
+        for batch in _chunk(missing_ids, self.WARM_BATCH_SIZE):
+            models = await GuildModel.filter(id__in=batch)
+            found = {model.id for model in models}
+            new_models = [GuildModel(id=i) for i in batch if i not in found]
+            if new_models:
+                try:
+                    await GuildModel.bulk_create(new_models)
+                except IntegrityError:
+                    # Some rows were created concurrently, fall back to one by one
+                    new_models = [
+                        (await GuildModel.get_or_create(id=model.id))[0]
+                        for model in new_models
+                    ]
+
+            for model in (*models, *new_models):
+                self._guilds.setdefault(model.id, model)
+
+            logger.info(
+                "Warmed up %d guild(s), created %d.", len(batch), len(new_models)
+            )
+
+    def update(self, model: GuildModel) -> None:
+        """
+        Replaces the cached entry with a freshly saved GuildModel.
+        """
+        self._guilds[model.id] = model
+
+    def invalidate(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+
+    @property
+    def coalesced(self) -> int:
+        """Number of lookups that waited on another lookup's query."""
+        return self._lookups.coalesced
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
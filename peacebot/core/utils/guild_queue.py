@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+import typing as t
+
+import lavasnek_rs
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY = 0.25
+LINE_CACHE_SLACK = 64
+
+
+class GuildQueue:
+    """
+    Python-side copy of a guild's lavasnek queue.
+
+    Reading or writing `Node.queue` converts the whole queue across the Rust
+    boundary, so edits are applied to this copy instead, and written back to
+    the node with a single `set_guild_node` once the edits of a burst are in.
+    Index 0 is the track that is playing, like in lavasnek.
+    """
+
+    def __init__(
+        self,
+        fetch_lavalink: t.Callable[[], lavasnek_rs.Lavalink],
+        guild_id: int,
+        flush_delay: float = FLUSH_DELAY,
+        on_change: t.Callable[[int], None] | None = None,
+    ) -> None:
+        self._fetch_lavalink = fetch_lavalink
+        self.guild_id = guild_id
+        self.flush_delay = flush_delay
+        self.on_change = on_change
+        self._tracks: list[lavasnek_rs.TrackQueue] | None = None
+        self._flush_task: asyncio.Task[None] | None = None
+        self._lines: dict[tuple[str, int], str] = {}
+        self.flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._tracks or ())
+
+    def __getitem__(self, index: int) -> lavasnek_rs.TrackQueue:
+        return self._require()[index]
+
+    def __iter__(self) -> t.Iterator[lavasnek_rs.TrackQueue]:
+        return iter(self._require())
+
+    @property
+    def loaded(self) -> bool:
+        return self._tracks is not None
+
+    @property
+    def dirty(self) -> bool:
+        return self._flush_task is not None
+
+    @property
+    def now_playing(self) -> lavasnek_rs.TrackQueue | None:
+        return self._tracks[0] if self._tracks else None
+
+    def _require(self) -> list[lavasnek_rs.TrackQueue]:
+        if self._tracks is None:
+            raise RuntimeError(f"The queue of guild {self.guild_id} is not loaded")
+        return self._tracks
+
+    async def load(self) -> "GuildQueue":
+        if self._tracks is None:
+            node = await self._fetch_lavalink().get_guild_node(self.guild_id)
+            # A concurrent load may have finished and been edited meanwhile
+            if self._tracks is None:
+                self._tracks = node.queue if node else []
+        return self
+
+    def line(
+        self,
+        track_queue: lavasnek_rs.TrackQueue,
+        render: t.Callable[[lavasnek_rs.TrackQueue], str],
+    ) -> str:
+        """
+        Returns the display line of a queued track, which is rendered once
+        and kept while the track sits in the queue.
+        """
+        key = (track_queue.track.track, track_queue.requester)
+        try:
+            return self._lines[key]
+        except KeyError:
+            pass
+
+        if len(self._lines) > len(self) + LINE_CACHE_SLACK:
+            queued = {(tq.track.track, tq.requester) for tq in self._tracks or ()}
+            self._lines = {k: v for k, v in self._lines.items() if k in queued}
+        line = self._lines[key] = render(track_queue)
+        return line
+
+    def _check_index(self, index: int) -> None:
+        # The playing track can only be skipped, not moved or removed
+        if not 1 <= index < len(self):
+            raise IndexError(index)
+
+    def move(self, old_index: int, new_index: int) -> lavasnek_rs.TrackQueue:
+        self._check_index(old_index)
+        self._check_index(new_index)
+        track = self._tracks.pop(old_index)
+        self._tracks.insert(new_index, track)
+        self._schedule_flush()
+        return track
+
+    def remove(self, index: int) -> lavasnek_rs.TrackQueue:
+        self._check_index(index)
+        track = self._tracks.pop(index)
+        self._schedule_flush()
+        return track
+
+    def extend(self, tracks: t.Iterable[lavasnek_rs.TrackQueue]) -> None:
+        self._require().extend(tracks)
+        self._schedule_flush()
+
+    def requeue(self) -> lavasnek_rs.TrackQueue:
+        """Plays the current track again after it finishes."""
+        track = self._require()[0]
+        self._tracks.insert(1, track)
+        self._schedule_flush()
+        return track
+
+    def shuffle(self) -> None:
+        upcoming = self._require()[1:]
+        random.shuffle(upcoming)
+        self._tracks[1:] = upcoming
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self.on_change is not None:
+            self.on_change(self.guild_id)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        self._flush_task = None
+        try:
+            await self._write()
+        except Exception:
+            logger.exception("Could not sync the queue of guild %d", self.guild_id)
+            self._tracks = None
+
+    async def flush(self) -> None:
+        """Writes pending edits to the node right away."""
+        if self._flush_task is None:
+            return
+
+        self._flush_task.cancel()
+        self._flush_task = None
+        await self._write()
+
+    async def _write(self) -> None:
+        lavalink = self._fetch_lavalink()
+        node = await lavalink.get_guild_node(self.guild_id)
+        if node is None or not self._reconcile(node.now_playing):
+            logger.debug("Dropped stale queue edits of guild %d", self.guild_id)
+            self._tracks = None
+            return
+
+        node.queue = self._tracks
+        await lavalink.set_guild_node(self.guild_id, node)
+        self.flushes += 1
+
+    def _reconcile(self, now_playing: lavasnek_rs.TrackQueue | None) -> bool:
+        """
+        Drops the tracks lavasnek finished playing since the copy was taken.
+        Returns False if the copy no longer lines up with the node.
+        """
+        if now_playing is None or not self._tracks:
+            return False
+
+        for index, track in enumerate(self._tracks):
+            if track.track.track == now_playing.track.track:
+                del self._tracks[:index]
+                return True
+        return False
+
+    def invalidate(self) -> None:
+        """Drops the copy and any pending edits, the node is read again on use."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._tracks = None
+
+
+class GuildQueues:
+    """
+    Queue copies of the guilds with a voice session, keyed by guild id.
+
+    Anything that changes the queue through lavasnek itself (playing the
+    first track, skipping, stopping or a track change) has to `release` the
+    guild's copy first, so pending edits are written before lavasnek acts
+    and the copy is read again afterwards. `on_change` is called with the
+    guild id whenever a queue may have changed.
+    """
+
+    def __init__(
+        self,
+        fetch_lavalink: t.Callable[[], lavasnek_rs.Lavalink],
+        flush_delay: float = FLUSH_DELAY,
+        on_change: t.Callable[[int], None] | None = None,
+    ) -> None:
+        self._fetch_lavalink = fetch_lavalink
+        self.flush_delay = flush_delay
+        self.on_change = on_change
+        self._queues: dict[int, GuildQueue] = {}
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._queues
+
+    async def get(self, guild_id: int) -> GuildQueue:
+        """Returns the loaded queue of the guild."""
+        try:
+            queue = self._queues[guild_id]
+        except KeyError:
+            queue = self._queues[guild_id] = GuildQueue(
+                self._fetch_lavalink, guild_id, self.flush_delay, self.on_change
+            )
+        return await queue.load()
+
+    async def release(self, guild_id: int) -> None:
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            return
+
+        try:
+            await queue.flush()
+        finally:
+            queue.invalidate()
+            if self.on_change is not None:
+                self.on_change(guild_id)
+
+    def discard(self, guild_id: int) -> None:
+        queue = self._queues.pop(guild_id, None)
+        if queue is not None:
+            queue.invalidate()
@@ -19,11 +19,14 @@ def error_handler(error_mapping: t.Optional[dict[Exception, str]] = None):
             ctx: lightbulb.context.Context, *args, **kwargs
         ) -> t.Callable:
             try:
-                return await func(ctx, *args, **kwargs)
+                with ctx.bot.metrics.handler("command", ctx.command.name):
+                    return await func(ctx, *args, **kwargs)
             except Exception as e:
                 if isinstance(e, LightbulbError):
                     raise e
 
+                ctx.bot.metrics.record_exception(ctx.command.name, e)
+
                 logging.info(error_mapping)
                 error_map = error_mapping or {}
                 error = error_map.get(e.__class__) or str(e)
@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import time
+import typing as t
+
+import hikari
+import lavasnek_rs
+
+logger = logging.getLogger(__name__)
+
+# Lavalink sends the stats of a node every minute
+STATS_TIMEOUT = 150
+MONITOR_INTERVAL = 30
+JOIN_TIMEOUT = 10
+FAILOVER_CONCURRENCY = 4
+
+# Methods of `lavasnek_rs.Lavalink` that act on the guild given first
+GUILD_METHODS = frozenset(
+    {
+        "destroy",
+        "equalize_all",
+        "equalize_band",
+        "equalize_dynamic",
+        "equalize_reset",
+        "get_guild_gateway_connection_info",
+        "get_guild_node",
+        "jump_to_time_millis",
+        "jump_to_time_secs",
+        "pause",
+        "play",
+        "remove_guild_node",
+        "resume",
+        "scrub_millis",
+        "scrub_secs",
+        "seek_millis",
+        "seek_secs",
+        "set_guild_node",
+        "set_pause",
+        "skip",
+        "stop",
+        "volume",
+    }
+)
+# Methods that any node can answer
+SHARED_METHODS = frozenset(
+    {"auto_search_tracks", "decode_track", "get_tracks", "search_tracks"}
+)
+
+SnapshotT = t.TypeVar("SnapshotT")
+
+
+class PoolNode:
+    def __init__(self, name: str, address: str) -> None:
+        self.name = name
+        self.host, _, port = address.rpartition(":")
+        self.port = int(port)
+        self.client: lavasnek_rs.Lavalink | None = None
+        self.guilds: set[int] = set()
+        self.healthy = False
+        self.playing_players = 0
+        self.cpu_load = 0.0
+        self.frame_deficit = 0
+        self._seen_at = 0.0
+
+    def __repr__(self) -> str:
+        return f"<PoolNode {self.name} {self.host}:{self.port}>"
+
+    @property
+    def penalty(self) -> float:
+        """
+        Load of the node, after the penalties Lavalink clients usually place
+        by: one per player, growing quickly with the CPU load and with frames
+        that could not be sent.
+        """
+        players = max(self.playing_players, len(self.guilds))
+        cpu = 1.05 ** (100 * self.cpu_load) * 10 - 10
+        frames = 1.03 ** (500 * self.frame_deficit / 3000) * 600 - 600
+        return players + cpu + frames
+
+    def seen(self) -> None:
+        self._seen_at = time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self._seen_at > STATS_TIMEOUT
+
+
+class LavalinkPool(t.Generic[SnapshotT]):
+    """
+    Stands in for a single `lavasnek_rs.Lavalink`, and places every guild on
+    the least loaded of several Lavalink nodes.
+
+    Guild methods go to the node the guild was placed on when it joined,
+    searches to the least loaded node. Voice connections go through hikari's
+    gateway instead of one gateway per node, so the connection info of a
+    guild can be handed to another node. A node that stops sending stats is
+    considered down, and its guilds are moved: `detach` takes a snapshot of a
+    guild's session while it still reads from the old node, `reattach`
+    starts it again after the guild has been placed on another one.
+    """
+
+    def __init__(
+        self,
+        bot: hikari.GatewayBot,
+        nodes: dict[str, str],
+        detach: t.Callable[[int], t.Awaitable[SnapshotT | None]],
+        reattach: t.Callable[[int, SnapshotT], t.Awaitable[bool]],
+    ) -> None:
+        if not nodes:
+            raise ValueError("The Lavalink pool needs at least one node.")
+        self.bot = bot
+        self.nodes = {name: PoolNode(name, address) for name, address in nodes.items()}
+        self._detach = detach
+        self._reattach = reattach
+        self._placements: dict[int, PoolNode] = {}
+        # guild id -> what the voice gateway events told about the connection
+        self._voice: dict[int, dict[str, t.Any]] = {}
+        self._joins: dict[int, asyncio.Future[dict[str, t.Any]]] = {}
+        self._monitor_task: asyncio.Task[None] | None = None
+        self.failovers = 0
+
+    def __getattr__(self, name: str) -> t.Any:
+        if name in GUILD_METHODS:
+            return lambda guild_id, *args: getattr(self.client_for(guild_id), name)(
+                guild_id, *args
+            )
+        if name in SHARED_METHODS:
+            return getattr(self._least_loaded().client, name)
+        raise AttributeError(name)
+
+    @property
+    def healthy(self) -> list[PoolNode]:
+        return [node for node in self.nodes.values() if node.healthy]
+
+    async def connect(
+        self,
+        build: t.Callable[[PoolNode], t.Awaitable[lavasnek_rs.Lavalink]],
+    ) -> None:
+        """Connects to every node, and keeps watching their health."""
+        await asyncio.gather(
+            *(self._connect(node, build) for node in self.nodes.values())
+        )
+        logger.info(
+            "Connected to %d/%d Lavalink node(s).", len(self.healthy), len(self.nodes)
+        )
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor(build))
+
+    async def _connect(
+        self,
+        node: PoolNode,
+        build: t.Callable[[PoolNode], t.Awaitable[lavasnek_rs.Lavalink]],
+    ) -> None:
+        try:
+            node.client = await build(node)
+        except Exception:
+            logger.warning("Could not connect to Lavalink node %s", node, exc_info=True)
+            return
+        node.healthy = True
+        node.seen()
+
+    def client_for(self, guild_id: int) -> lavasnek_rs.Lavalink:
+        node = self._placements.get(guild_id)
+        return (node or self._least_loaded()).client
+
+    def node_of(self, guild_id: int) -> PoolNode | None:
+        return self._placements.get(guild_id)
+
+    def _least_loaded(self) -> PoolNode:
+        nodes = self.healthy
+        if not nodes:
+            raise lavasnek_rs.NetworkError("No Lavalink node is available.")
+        return min(nodes, key=lambda node: node.penalty)
+
+    def _place(self, guild_id: int) -> PoolNode:
+        node = self._placements.get(guild_id)
+        if node is None or not node.healthy:
+            self._unplace(guild_id)
+            node = self._placements[guild_id] = self._least_loaded()
+            node.guilds.add(guild_id)
+        return node
+
+    def _unplace(self, guild_id: int) -> PoolNode | None:
+        node = self._placements.pop(guild_id, None)
+        if node is not None:
+            node.guilds.discard(guild_id)
+        return node
+
+    def update_stats(self, name: str, stats: lavasnek_rs.Stats) -> None:
+        node = self.nodes[name]
+        node.playing_players = stats.playing_players
+        node.cpu_load = stats.cpu_system_load
+        # Lavalink sends no frame stats while a node has no players
+        node.frame_deficit = max(stats.frame_stats_deficit or 0, 0)
+        node.seen()
+        if not node.healthy:
+            logger.info("Lavalink node %s is back.", name)
+            node.healthy = True
+
+    async def join(self, guild_id: int, channel_id: int) -> dict[str, t.Any]:
+        """
+        Connects to the voice channel through hikari, and returns the
+        connection info for `create_session`.
+        """
+        self._place(guild_id)
+        voice = self._voice.get(guild_id, {})
+        if voice.get("channel_id") == channel_id and "token" in voice:
+            # Already connected, like after a failover
+            return dict(voice, guild_id=guild_id)
+
+        self._voice[guild_id] = {}
+        future = self._joins[guild_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self.bot.update_voice_state(guild_id, channel_id, self_deaf=True)
+            return await asyncio.wait_for(future, JOIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The builtin one, which the music commands expect
+            raise TimeoutError(f"Could not connect to the voice channel {channel_id}")
+        finally:
+            self._joins.pop(guild_id, None)
+
+    async def create_session(self, connection_info: dict[str, t.Any]) -> None:
+        guild_id = connection_info["guild_id"]
+        await self._place(guild_id).client.create_session(connection_info)
+
+    async def leave(self, guild_id: int) -> None:
+        self._voice.pop(guild_id, None)
+        await self.bot.update_voice_state(guild_id, None)
+
+    async def remove_guild_from_loops(self, guild_id: int) -> None:
+        """The last step of tearing down a session, which frees its node."""
+        await self.client_for(guild_id).remove_guild_from_loops(guild_id)
+        self._unplace(guild_id)
+
+    async def on_voice_state_update(self, event: hikari.VoiceStateUpdateEvent) -> None:
+        state = event.state
+        if state.user_id != self.bot.get_me().id:
+            return
+        if state.channel_id is None:
+            self._voice.pop(state.guild_id, None)
+            return
+
+        voice = self._voice.setdefault(state.guild_id, {})
+        voice.update(session_id=state.session_id, channel_id=state.channel_id)
+        self._voice_updated(state.guild_id)
+        node = self._placements.get(state.guild_id)
+        if node is not None and node.client is not None:
+            node.client.raw_handle_event_voice_state_update(
+                state.guild_id, state.user_id, state.session_id, state.channel_id
+            )
+
+    async def on_voice_server_update(
+        self, event: hikari.VoiceServerUpdateEvent
+    ) -> None:
+        if event.endpoint is None:
+            return
+
+        voice = self._voice.setdefault(event.guild_id, {})
+        voice.update(endpoint=event.endpoint, token=event.token)
+        self._voice_updated(event.guild_id)
+        node = self._placements.get(event.guild_id)
+        if node is not None and node.client is not None:
+            await node.client.raw_handle_event_voice_server_update(
+                event.guild_id, event.endpoint, event.token
+            )
+
+    def _voice_updated(self, guild_id: int) -> None:
+        voice = self._voice[guild_id]
+        future = self._joins.get(guild_id)
+        if future is not None and not future.done() and len(voice) == 4:
+            future.set_result(dict(voice, guild_id=guild_id))
+
+    async def _monitor(
+        self,
+        build: t.Callable[[PoolNode], t.Awaitable[lavasnek_rs.Lavalink]],
+    ) -> None:
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for node in self.nodes.values():
+                if node.client is None:
+                    await self._connect(node, build)
+                elif node.healthy and node.stale:
+                    logger.warning("Lavalink node %s stopped sending stats.", node)
+                    await self.fail(node)
+
+    async def fail(self, node: PoolNode) -> None:
+        """Takes the node out of the pool and moves its guilds to the others."""
+        node.healthy = False
+        guild_ids = list(node.guilds)
+        if not guild_ids:
+            return
+        if not self.healthy:
+            logger.error(
+                "No Lavalink node left for the %d guild(s) of %s", len(guild_ids), node
+            )
+            return
+
+        semaphore = asyncio.Semaphore(FAILOVER_CONCURRENCY)
+
+        async def move(guild_id: int) -> bool:
+            async with semaphore:
+                try:
+                    return await self._move(guild_id, node)
+                except Exception:
+                    logger.exception("Could not move guild %d off %s", guild_id, node)
+                    return False
+
+        moved = await asyncio.gather(*map(move, guild_ids))
+        self.failovers += sum(moved)
+        logger.info(
+            "Moved %d/%d guild(s) off Lavalink node %s.",
+            sum(moved),
+            len(guild_ids),
+            node.name,
+        )
+
+    async def _move(self, guild_id: int, node: PoolNode) -> bool:
+        # The node's queue lives in lavasnek, it can be read while the
+        # Lavalink server is gone
+        snapshot = await self._detach(guild_id)
+        self._unplace(guild_id)
+        await node.client.remove_guild_node(guild_id)
+        await node.client.remove_guild_from_loops(guild_id)
+        if snapshot is None:
+            return False
+        return await self._reattach(guild_id, snapshot)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import typing as t
+from pathlib import Path
+
+import aiohttp
+import aioredis
+
+from peacebot.core.utils.utilities import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+LYRICS_TTL = 24 * 60 * 60
+# Songs without lyrics are looked up again sooner, the API may get them
+LYRICS_MISSING_TTL = 60 * 60
+LYRICS_CACHE_PREFIX = "lyrics:"
+LYRICS_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# "(Official Video)", "[Lyrics]", "(HD Remastered)" and the like
+_TITLE_NOISE = re.compile(
+    r"[(\[][^)\]]*\b(official|lyrics?|video|audio|visuali[sz]er|hd|4k|remaster(ed)?"
+    r"|mv)\b[^)\]]*[)\]]",
+    re.IGNORECASE,
+)
+
+
+class LyricsError(Exception):
+    """The lyrics source could not be reached or gave an unusable answer."""
+
+
+def normalize_title(title: str) -> str:
+    """
+    Strips the video decorations off a track title and folds its case and
+    whitespace, so the uploads of a song share a cache entry.
+    """
+    return " ".join(_TITLE_NOISE.sub(" ", title).casefold().split())
+
+
+class LyricsSource(t.Protocol):
+    async def fetch(self, title: str) -> str | None:
+        """Returns the lyrics of the song, or None if there are none."""
+
+    async def close(self) -> None:
+        """Releases the connections of the source."""
+
+
+class HTTPLyrics:
+    """Lyrics API that answers `GET <url>?title=...` with `{"lyrics": ...}`."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self._session: aiohttp.ClientSession | None = None
+
+    async def fetch(self, title: str) -> str | None:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=LYRICS_TIMEOUT)
+
+        try:
+            async with self._session.get(self.url, params={"title": title}) as r:
+                if r.status == 404:
+                    return None
+                if not 200 <= r.status <= 299:
+                    raise LyricsError(f"Lyrics API answered with {r.status}")
+                data = await r.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise LyricsError(str(e)) from e
+
+        lyrics = data.get("lyrics") if isinstance(data, dict) else None
+        return str(lyrics) if lyrics else None
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+class LocalLyrics:
+    """
+    Lyrics from a JSON file of song titles to lyrics, to run and test
+    without the lyrics API.
+    """
+
+    def __init__(self, lyrics: dict[str, str]) -> None:
+        self._lyrics = {normalize_title(title): text for title, text in lyrics.items()}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "LocalLyrics":
+        return cls(json.loads(path.read_text(encoding="utf-8")))
+
+    async def fetch(self, title: str) -> str | None:
+        return self._lyrics.get(normalize_title(title))
+
+    async def close(self) -> None:
+        pass
+
+
+def lyrics_source(source: str) -> LyricsSource:
+    if source.startswith(("http://", "https://")):
+        return HTTPLyrics(source)
+    return LocalLyrics.from_file(Path(source))
+
+
+class LyricsService:
+    """
+    Looks up song lyrics through a Redis cache shared by every shard, keyed
+    by the normalized title. Songs without lyrics are cached too, for a
+    shorter time. Concurrent lookups of a song share a single request, and
+    `prefetch` warms the cache in the background when a track starts, so
+    /lyrics for the current song is answered from Redis.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        source: LyricsSource,
+        ttl: int = LYRICS_TTL,
+        on_lookup: t.Callable[[str, float], None] | None = None,
+    ) -> None:
+        self._redis = redis
+        self.source = source
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self._lookups: SingleFlight[str, str | None] = SingleFlight()
+        self._prefetches: set[asyncio.Task[None]] = set()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.errors = 0
+
+    async def get(self, title: str) -> str | None:
+        """
+        Returns the lyrics of the song, or None if it has none. Raises
+        LyricsError if the source failed and nothing is cached.
+        """
+        key = normalize_title(title)
+        if not key:
+            return None
+        return await self._lookups.do(key, lambda: self._lookup(key))
+
+    def prefetch(self, title: str) -> None:
+        task = asyncio.create_task(self._prefetch(title))
+        # The loop only keeps weak references to its tasks
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+
+    async def _prefetch(self, title: str) -> None:
+        try:
+            await self.get(title)
+        except LyricsError as e:
+            logger.debug("Could not prefetch the lyrics of %r: %s", title, e)
+        else:
+            self.prefetched += 1
+
+    async def _lookup(self, key: str) -> str | None:
+        start = time.perf_counter()
+        cached = await self._get_cached(key)
+        if cached is not None:
+            self.hits += 1
+            self._observe("redis", start)
+            return cached or None
+
+        try:
+            lyrics = await self.source.fetch(key)
+        except LyricsError:
+            self.errors += 1
+            raise
+        self.misses += 1
+        self._observe("source", start)
+        await self._set_cached(key, lyrics)
+        return lyrics
+
+    async def _get_cached(self, key: str) -> str | None:
+        try:
+            cached = await self._redis.get(LYRICS_CACHE_PREFIX + key)
+        except aioredis.RedisError:
+            logger.warning("Could not read the cached lyrics of %r", key, exc_info=True)
+            return None
+        return cached.decode() if cached is not None else None
+
+    async def _set_cached(self, key: str, lyrics: str | None) -> None:
+        try:
+            # An empty entry remembers that the song has no lyrics
+            await self._redis.set(
+                LYRICS_CACHE_PREFIX + key,
+                lyrics or "",
+                ex=self.ttl if lyrics else min(self.ttl, LYRICS_MISSING_TTL),
+            )
+        except aioredis.RedisError:
+            logger.warning("Could not cache the lyrics of %r", key, exc_info=True)
+
+    def _observe(self, source: str, start: float) -> None:
+        if self.on_lookup is not None:
+            self.on_lookup(source, time.perf_counter() - start)
+
+    @property
+    def coalesced(self) -> int:
+        return self._lookups.coalesced
+
+    async def close(self) -> None:
+        for task in self._prefetches:
+            task.cancel()
+        await self.source.close()
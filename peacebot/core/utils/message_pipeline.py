@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import hikari
+
+from models import GuildModel
+
+if TYPE_CHECKING:
+    from peacebot.core.bot import Peacebot
+
+
+class MessageContext:
+    """
+    Pre-processed view of a guild message shared by every message listener.
+    """
+
+    __slots__ = ("message", "content", "normalized", "tokens", "guild", "mentions_bot")
+
+    def __init__(
+        self,
+        message: hikari.Message,
+        guild: GuildModel | None,
+        bot_id: hikari.Snowflake | None,
+    ) -> None:
+        self.message = message
+        self.content = (message.content or "").strip()
+        self.normalized = self.content.lower()
+        self.tokens = tuple(self.normalized.split())
+        self.guild = guild
+        self.mentions_bot = bot_id is not None and self.content in (
+            f"<@{bot_id}>",
+            f"<@!{bot_id}>",
+        )
+
+
+class MessagePipeline:
+    """
+    Builds a MessageContext once per message, no matter how many listeners
+    (prefix resolution, mention reply, autoresponses) ask for it.
+    """
+
+    MAX_CONTEXTS = 512
+
+    def __init__(self, bot: "Peacebot") -> None:
+        self.bot = bot
+        self._contexts: OrderedDict[int, asyncio.Future[MessageContext]] = OrderedDict()
+
+    async def process(self, message: hikari.Message) -> MessageContext:
+        future = self._contexts.get(message.id)
+        if future is None:
+            future = asyncio.ensure_future(self._build(message))
+            self._contexts[message.id] = future
+            if len(self._contexts) > self.MAX_CONTEXTS:
+                self._contexts.popitem(last=False)
+
+        return await asyncio.shield(future)
+
+    async def _build(self, message: hikari.Message) -> MessageContext:
+        guild = None
+        if message.guild_id:
+            guild = await self.bot.d.guild_cache.get(message.guild_id)
+
+        me = self.bot.get_me()
+        return MessageContext(message, guild, me.id if me else None)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+import typing as t
+from collections import defaultdict
+
+import lightbulb
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_METHODS = (
+    "execute_insert",
+    "execute_many",
+    "execute_query",
+    "execute_query_dict",
+    "execute_script",
+)
+HTTP_METHODS = ("_request",)
+
+current_handler: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_handler", default="none"
+)
+
+
+class Histogram:
+    def __init__(self, buckets: t.Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> t.Iterator[tuple[str, int]]:
+        total = 0
+        for bound, count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value: t.Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: t.Any) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """
+    Collects latency histograms, error counts and DB/HTTP call counts for
+    every command and listener, and serves them in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self.latency: defaultdict[tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.errors: defaultdict[tuple[str, str, str], int] = defaultdict(int)
+        self.exceptions: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.calls: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self.gauges: dict[str, tuple[str, t.Callable[[], float]]] = {}
+        self._command_starts: dict[int, float] = {}
+        self._runner: web.AppRunner | None = None
+
+    @contextlib.contextmanager
+    def handler(self, kind: str, name: str) -> t.Iterator[None]:
+        """
+        Attributes the DB and HTTP calls made inside the block to the handler.
+        """
+        token = current_handler.set(f"{kind}:{name}")
+        try:
+            yield
+        finally:
+            current_handler.reset(token)
+
+    def instrument_listener(self, callback: t.Callable) -> t.Callable:
+        name = getattr(callback, "__qualname__", repr(callback))
+
+        @functools.wraps(callback)
+        async def wrapper(event: t.Any) -> None:
+            start = time.perf_counter()
+            with self.handler("listener", name):
+                try:
+                    await callback(event)
+                except Exception as e:
+                    self.errors["listener", name, e.__class__.__name__] += 1
+                    raise
+                finally:
+                    self.latency["listener", name].observe(time.perf_counter() - start)
+
+        return wrapper
+
+    def count_calls(self, cls: type, methods: t.Iterable[str], kind: str) -> None:
+        """
+        Wraps the coroutine methods of a client class so that every call is
+        counted against the handler that made it.
+        """
+        for method_name in methods:
+            method = getattr(cls, method_name, None)
+            if method is None or getattr(method, "__instrumented__", False):
+                continue
+
+            setattr(cls, method_name, self._counted(method, kind))
+
+    def _counted(self, method: t.Callable, kind: str) -> t.Callable:
+        @functools.wraps(method)
+        async def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            self.calls[kind, current_handler.get()] += 1
+            return await method(*args, **kwargs)
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    def record_exception(self, command: str, exception: Exception) -> None:
+        self.exceptions[command, exception.__class__.__name__] += 1
+
+    def register_gauge(
+        self, name: str, description: str, callback: t.Callable[[], float]
+    ) -> None:
+        self.gauges[name] = (description, callback)
+
+    async def on_command_invocation(
+        self, event: lightbulb.events.CommandInvocationEvent
+    ) -> None:
+        self._command_starts[id(event.context)] = time.perf_counter()
+
+    async def on_command_completion(
+        self, event: lightbulb.events.CommandCompletionEvent
+    ) -> None:
+        self._observe_command(event.context)
+
+    async def on_command_error(self, event: lightbulb.CommandErrorEvent) -> None:
+        command = event.context.command
+        if command is None:
+            return
+
+        error = event.exception
+        if isinstance(error, lightbulb.CommandInvocationError):
+            error = error.original
+        self.errors["command", command.name, error.__class__.__name__] += 1
+        self._observe_command(event.context)
+
+    def _observe_command(self, context: lightbulb.Context) -> None:
+        start = self._command_starts.pop(id(context), None)
+        if start is not None and context.command is not None:
+            self.latency["command", context.command.name].observe(
+                time.perf_counter() - start
+            )
+
+    def render(self) -> str:
+        lines = [
+            "# HELP peacebot_handler_latency_seconds Latency of commands and listeners.",
+            "# TYPE peacebot_handler_latency_seconds histogram",
+        ]
+        for (kind, name), histogram in sorted(self.latency.items()):
+            for bound, count in histogram.cumulative():
+                labels = _labels(kind=kind, name=name, le=bound)
+                lines.append(f"peacebot_handler_latency_seconds_bucket{labels} {count}")
+            labels = _labels(kind=kind, name=name)
+            lines.append(
+                f"peacebot_handler_latency_seconds_sum{labels} {histogram.sum}"
+            )
+            lines.append(
+                f"peacebot_handler_latency_seconds_count{labels} {histogram.count}"
+            )
+
+        lines += [
+            "# HELP peacebot_handler_errors_total Errors raised by commands and listeners.",
+            "# TYPE peacebot_handler_errors_total counter",
+        ]
+        for (kind, name, exception), count in sorted(self.errors.items()):
+            labels = _labels(kind=kind, name=name, exception=exception)
+            lines.append(f"peacebot_handler_errors_total{labels} {count}")
+
+        lines += [
+            "# HELP peacebot_command_exceptions_total Unexpected exceptions wrapped by the error handler.",
+            "# TYPE peacebot_command_exceptions_total counter",
+        ]
+        for (command, exception), count in sorted(self.exceptions.items()):
+            labels = _labels(command=command, exception=exception)
+            lines.append(f"peacebot_command_exceptions_total{labels} {count}")
+
+        lines += [
+            "# HELP peacebot_calls_total Database and HTTP calls made by each handler.",
+            "# TYPE peacebot_calls_total counter",
+        ]
+        for (kind, handler), count in sorted(self.calls.items()):
+            labels = _labels(kind=kind, handler=handler)
+            lines.append(f"peacebot_calls_total{labels} {count}")
+
+        for name, (description, callback) in sorted(self.gauges.items()):
+            lines += [
+                f"# HELP {name} {description}",
+                f"# TYPE {name} gauge",
+                f"{name} {callback()}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    async def _handle_metrics(self, _: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain")
+
+    async def start_server(self, host: str, port: int) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    async def stop_server(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
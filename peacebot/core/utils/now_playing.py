@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import typing as t
+
+import hikari
+from hikari.api.special_endpoints import ActionRowBuilder
+
+logger = logging.getLogger(__name__)
+
+CONTROLS_PREFIX = "music:"
+PLAY_PAUSE = "music:play_pause"
+REQUEUE = "music:requeue"
+SKIP = "music:skip"
+CONTROL_BUTTONS = (
+    (PLAY_PAUSE, "Play/Pause", hikari.ButtonStyle.SUCCESS),
+    (REQUEUE, "Re-Queue", hikari.ButtonStyle.PRIMARY),
+    (SKIP, "Skip", hikari.ButtonStyle.DANGER),
+)
+
+
+def build_controls(
+    rest: hikari.api.RESTClient, disabled: t.Collection[str] = ()
+) -> ActionRowBuilder:
+    """
+    Playback buttons of the guild's music session. Their custom ids carry
+    everything a click needs, so they keep working on any message and
+    across restarts without a view listening for them.
+    """
+    row = rest.build_action_row()
+    for custom_id, label, style in CONTROL_BUTTONS:
+        (
+            row.add_button(style, custom_id)
+            .set_label(label)
+            .set_is_disabled(custom_id in disabled)
+            .add_to_container()
+        )
+    return row
+
+
+class NowPlayingAnnouncer:
+    """
+    Keeps one now-playing message per guild and edits it on every track
+    change, instead of sending a new message with its own view per track.
+
+    Announcements are sent from a background task per guild, so the Lavalink
+    event handlers return at once, and a burst of track changes only shows
+    the latest one.
+    """
+
+    def __init__(self, rest: hikari.api.RESTClient) -> None:
+        self.rest = rest
+        # guild id -> (channel id, message id)
+        self._messages: dict[int, tuple[int, int]] = {}
+        self._pending: dict[int, tuple[int, hikari.Embed]] = {}
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def announce(self, guild_id: int, channel_id: int, embed: hikari.Embed) -> None:
+        if guild_id in self._pending:
+            self.coalesced += 1
+        self._pending[guild_id] = (channel_id, embed)
+        if guild_id not in self._tasks:
+            self._tasks[guild_id] = asyncio.create_task(self._drain(guild_id))
+
+    async def _drain(self, guild_id: int) -> None:
+        try:
+            while (pending := self._pending.pop(guild_id, None)) is not None:
+                try:
+                    await self._show(guild_id, *pending)
+                except hikari.HikariError:
+                    logger.warning(
+                        "Could not announce the track in guild %d",
+                        guild_id,
+                        exc_info=True,
+                    )
+        finally:
+            self._tasks.pop(guild_id, None)
+
+    async def _show(self, guild_id: int, channel_id: int, embed: hikari.Embed) -> None:
+        components = [build_controls(self.rest)]
+        message = self._messages.get(guild_id)
+        if message is not None and message[0] == channel_id:
+            try:
+                await self.rest.edit_message(
+                    channel_id, message[1], embed=embed, components=components
+                )
+            except hikari.NotFoundError:
+                # The message got deleted, a new one takes its place
+                pass
+            else:
+                self.edited += 1
+                return
+
+        sent = await self.rest.create_message(
+            channel_id, embed=embed, components=components
+        )
+        self._messages[guild_id] = (channel_id, sent.id)
+        self.sent += 1
+
+    async def close(self, guild_id: int) -> None:
+        """Stops announcing in the guild and takes the buttons off its message."""
+        self._pending.pop(guild_id, None)
+        task = self._tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+        message = self._messages.pop(guild_id, None)
+        if message is None:
+            return
+        try:
+            await self.rest.edit_message(*message, components=[])
+        except hikari.HikariError:
+            logger.debug("Could not close the now playing message of %d", guild_id)
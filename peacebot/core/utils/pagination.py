@@ -0,0 +1,56 @@
+import typing as t
+from collections import OrderedDict
+
+from lightbulb.utils import nav
+
+T = t.TypeVar("T")
+
+KEEP_PAGES = 4
+
+
+class LazyPages(t.Sequence[T]):
+    """
+    Pages that are only rendered when they are shown. The last few rendered
+    pages are kept, so paging back and forth does not render them again.
+    """
+
+    def __init__(
+        self, count: int, render: t.Callable[[int], T], keep: int = KEEP_PAGES
+    ) -> None:
+        if count < 1:
+            raise ValueError("You cannot have fewer than 1 page.")
+        self._count = count
+        self._render = render
+        self._keep = keep
+        self._pages: OrderedDict[int, T] = OrderedDict()
+        self.rendered = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> T:  # type: ignore[override]
+        if not -self._count <= index < self._count:
+            raise IndexError(index)
+
+        index %= self._count
+        try:
+            self._pages.move_to_end(index)
+            return self._pages[index]
+        except KeyError:
+            pass
+
+        page = self._pages[index] = self._render(index)
+        self.rendered += 1
+        if len(self._pages) > self._keep:
+            self._pages.popitem(last=False)
+        return page
+
+
+class LazyButtonNavigator(nav.ButtonNavigator[T]):
+    """ButtonNavigator that does not render every page up front."""
+
+    def __init__(self, pages: t.Sequence[T], **kwargs: t.Any) -> None:
+        # ButtonNavigator copies its pages into a tuple, so it gets placeholders
+        # of the right length and the real pages are swapped in afterwards
+        super().__init__(range(len(pages)), **kwargs)
+        self.pages = pages
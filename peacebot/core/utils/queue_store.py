@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import time
+import typing as t
+
+import aioredis
+import lavasnek_rs
+
+if t.TYPE_CHECKING:
+    from peacebot.core.bot import Peacebot
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SNAPSHOTS_KEY = "music:queues"
+SNAPSHOT_VERSION = 1
+WRITE_BEHIND_DELAY = 2
+POSITION_SAVE_INTERVAL = 15
+RESTORE_CONCURRENCY = 4
+RESOLVE_CONCURRENCY = 8
+
+
+class QueueSnapshot(t.NamedTuple):
+    voice_channel_id: int
+    text_channel_id: int | None
+    # Milliseconds into the track that is playing
+    position: int
+    # (URI, requester) of every queued track, the playing one first
+    tracks: list[tuple[str, int]]
+
+    def dumps(self) -> str:
+        return json.dumps([SNAPSHOT_VERSION, *self], separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> "QueueSnapshot":
+        version, voice_channel_id, text_channel_id, position, tracks = json.loads(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unknown queue snapshot version {version}")
+        return cls(
+            voice_channel_id,
+            text_channel_id,
+            position,
+            [(uri, requester) for uri, requester in tracks],
+        )
+
+
+class QueueStore:
+    """
+    Write-behind persistence of the guilds' music queues in Redis, so that
+    playback resumes where it stopped after a restart.
+
+    Queue changes only mark the guild, the snapshots of every marked guild
+    are written together with one HSET a moment later. Snapshots keep the
+    URI of each track, lavasnek tracks cannot be rebuilt in Python, so
+    they are loaded again when the queue is restored.
+    """
+
+    def __init__(self, bot: "Peacebot", delay: float = WRITE_BEHIND_DELAY) -> None:
+        self.bot = bot
+        self.delay = delay
+        self._dirty: set[int] = set()
+        self._deleted: set[int] = set()
+        self._positions: dict[int, tuple[int, float]] = {}
+        self._saved_at: dict[int, float] = {}
+        self._flush_task: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+        self._restored = False
+        self.batches = 0
+        self.writes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty) + len(self._deleted)
+
+    def mark(self, guild_id: int) -> None:
+        self._deleted.discard(guild_id)
+        self._dirty.add(guild_id)
+        self._schedule_flush()
+
+    def forget(self, guild_id: int) -> None:
+        self._dirty.discard(guild_id)
+        self._deleted.add(guild_id)
+        self._positions.pop(guild_id, None)
+        self._saved_at.pop(guild_id, None)
+        self._schedule_flush()
+
+    def update_position(self, guild_id: int, position: int) -> None:
+        now = time.monotonic()
+        self._positions[guild_id] = (position, now)
+        if now - self._saved_at.get(guild_id, 0) > POSITION_SAVE_INTERVAL:
+            self.mark(guild_id)
+
+    def position(self, guild_id: int) -> int:
+        position, observed_at = self._positions.get(guild_id, (0, time.monotonic()))
+        return position + int((time.monotonic() - observed_at) * 1000)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.delay)
+        self._flush_task = None
+        try:
+            async with self._flush_lock:
+                await self._write()
+        except Exception:
+            logger.exception("Could not save the music queues")
+
+    async def flush(self) -> None:
+        """
+        Writes the snapshots of every marked guild right away, after the
+        batch that is being written already.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        async with self._flush_lock:
+            await self._write()
+
+    async def _write(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        deleted, self._deleted = self._deleted, set()
+        snapshots: dict[str, str] = {}
+        for guild_id in dirty:
+            snapshot = await self.snapshot(guild_id)
+            if snapshot is None:
+                deleted.add(guild_id)
+            else:
+                snapshots[str(guild_id)] = snapshot.dumps()
+        if not snapshots and not deleted:
+            return
+
+        redis: aioredis.Redis = self.bot.d.redis
+        try:
+            if snapshots:
+                await redis.hset(QUEUE_SNAPSHOTS_KEY, mapping=snapshots)
+            if deleted:
+                await redis.hdel(QUEUE_SNAPSHOTS_KEY, *map(str, deleted))
+        except aioredis.RedisError:
+            logger.warning("Could not save the music queues", exc_info=True)
+            # Try again after the delay, unless the guild changed since
+            self._dirty |= dirty - self._deleted
+            self._deleted |= deleted - self._dirty
+            self._schedule_flush()
+            return
+
+        now = time.monotonic()
+        for guild_id in dirty:
+            self._saved_at[guild_id] = now
+        self.batches += 1
+        self.writes += len(snapshots) + len(deleted)
+
+    async def snapshot(self, guild_id: int) -> QueueSnapshot | None:
+        lavalink: lavasnek_rs.Lavalink | None = self.bot.d.data.lavalink
+        if lavalink is None:
+            return None
+
+        voice_state = self.bot.cache.get_voice_state(guild_id, self.bot.get_me())
+        node = await lavalink.get_guild_node(guild_id)
+        if voice_state is None or voice_state.channel_id is None or node is None:
+            return None
+
+        queue = await self.bot.d.queues.get(guild_id)
+        if not queue:
+            return None
+
+        data = node.get_data()
+        return QueueSnapshot(
+            voice_state.channel_id,
+            data.get(guild_id) if isinstance(data, dict) else None,
+            self.position(guild_id),
+            [(track.track.info.uri, track.requester) for track in queue],
+        )
+
+    async def restore(self) -> None:
+        """
+        Rejoins the voice channels of the saved queues and resumes their
+        playback. Only runs once per process, later shard READYs are
+        reconnects that kept their sessions.
+        """
+        if self._restored:
+            return
+        self._restored = True
+
+        try:
+            saved = await self.bot.d.redis.hgetall(QUEUE_SNAPSHOTS_KEY)
+        except aioredis.RedisError:
+            logger.warning("Could not load the saved music queues", exc_info=True)
+            return
+
+        semaphore = asyncio.Semaphore(RESTORE_CONCURRENCY)
+
+        async def restore(guild_id: int, data: bytes) -> bool:
+            async with semaphore:
+                try:
+                    return await self.resume(guild_id, QueueSnapshot.loads(data))
+                except Exception:
+                    logger.exception("Could not restore the queue of %d", guild_id)
+                    return False
+
+        guild_ids = [int(guild_id) for guild_id in saved]
+        restored = await asyncio.gather(
+            *(
+                restore(guild_id, data)
+                for guild_id, data in zip(guild_ids, saved.values())
+            )
+        )
+        for guild_id, ok in zip(guild_ids, restored):
+            if not ok:
+                self.forget(guild_id)
+        logger.info("Restored %d/%d music queue(s).", sum(restored), len(restored))
+
+    async def detach(self, guild_id: int) -> QueueSnapshot | None:
+        """
+        Takes the snapshot of a guild whose session is about to move to
+        another Lavalink node, and drops its queue copy so that pending
+        edits are not written to the new node.
+        """
+        snapshot = await self.snapshot(guild_id)
+        self.bot.d.queues.discard(guild_id)
+        return snapshot
+
+    async def resume(self, guild_id: int, snapshot: QueueSnapshot) -> bool:
+        """Joins the snapshot's voice channel and resumes its playback."""
+        lavalink: lavasnek_rs.Lavalink = self.bot.d.data.lavalink
+        # Start with the first track that still loads, the rest can follow
+        for index, (uri, requester) in enumerate(snapshot.tracks):
+            first = await self._load(lavalink, uri)
+            if first is not None:
+                break
+        else:
+            return False
+
+        connection_info = await lavalink.join(guild_id, snapshot.voice_channel_id)
+        await lavalink.create_session(connection_info)
+        node = await lavalink.get_guild_node(guild_id)
+        if node is not None and snapshot.text_channel_id is not None:
+            node.set_data({guild_id: snapshot.text_channel_id})
+
+        position = snapshot.position if index == 0 else 0
+        self.update_position(guild_id, position)
+        await lavalink.play(guild_id, first).requester(requester).start_time_millis(
+            position
+        ).queue()
+
+        rest = snapshot.tracks[index + 1 :]
+        semaphore = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+        async def load(uri: str) -> lavasnek_rs.Track | None:
+            async with semaphore:
+                return await self._load(lavalink, uri)
+
+        tracks = await asyncio.gather(*(load(uri) for uri, _ in rest))
+        await self.bot.d.queues.release(guild_id)
+        queue = await self.bot.d.queues.get(guild_id)
+        queue.extend(
+            lavalink.play(guild_id, track).requester(requester).to_track_queue()
+            for track, (_, requester) in zip(tracks, rest)
+            if track is not None
+        )
+        return True
+
+    @staticmethod
+    async def _load(
+        lavalink: lavasnek_rs.Lavalink, uri: str
+    ) -> lavasnek_rs.Track | None:
+        try:
+            loaded = await lavalink.get_tracks(uri)
+        except lavasnek_rs.NetworkError:
+            logger.warning("Could not load %s", uri, exc_info=True)
+            return None
+        return loaded.tracks[0] if loaded.tracks else None
@@ -1,15 +1,40 @@
+import asyncio
+import bisect
+import heapq
 import io
+import logging
+import math
 import os
+import pickle
 import re
+import sys
+import time
 import typing
 import zlib
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import Executor
 from datetime import datetime
+from pathlib import Path
 
 import aiohttp
 import hikari
 from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
 
 from peacebot.core.utils.embed_colors import EmbedColors
+from peacebot.core.utils.utilities import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+RTFM_CACHE_DIR = Path("./.rtfm_cache")
+RTFM_TIMEOUT = aiohttp.ClientTimeout(total=60)
+# Discord shows at most 25 choices of up to 100 characters
+AUTOCOMPLETE_CHOICES = 25
+AUTOCOMPLETE_CHOICE_LENGTH = 100
+AUTOCOMPLETE_CACHE_SIZE = 2048
+# Tables reloaded after an eviction are only revalidated upstream after this
+REVALIDATE_AFTER = 60 * 60
 
 
 class SphinxObjectFileReader:
@@ -34,102 +59,556 @@ class SphinxObjectFileReader:
         yield decompressor.flush()
 
     def read_compressed_lines(self):
-        buf = b""
+        # Only the trailing partial line is carried over to the next chunk,
+        # and every chunk is decoded once, so this stays linear in the input
+        partial = b""
         for chunk in self.read_compressed_chunks():
-            buf += chunk
-            pos = buf.find(b"\n")
-            while pos != -1:
-                yield buf[:pos].decode("utf-8")
-                buf = buf[pos + 1 :]
-                pos = buf.find(b"\n")
+            end = chunk.rfind(b"\n")
+            if end == -1:
+                partial += chunk
+                continue
 
+            yield from (partial + chunk[:end]).decode("utf-8").split("\n")
+            partial = chunk[end + 1 :]
+
+        if partial:
+            yield partial.decode("utf-8")
+
+
+def _pack(strings: typing.Sequence[str]) -> tuple[str, array]:
+    """
+    Concatenates strings into one, with the offsets they start at and a final
+    offset at the end.
+    """
+    offsets = array("I", [0])
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+    return "".join(strings), offsets
+
+
+class Inventory(typing.Mapping[str, str]):
+    """
+    Read-only mapping of the objects of an inventory to their URLs.
+
+    Instead of a dict of full URLs, the keys are kept sorted in a single string
+    and looked up by bisection, every page is stored once with only the anchor
+    kept per entry, and the URL is joined on the base URL when it is looked up.
+    """
+
+    __slots__ = (
+        "base_url",
+        "_keys",
+        "_key_offsets",
+        "_pages",
+        "_page_ids",
+        "_anchors",
+        "_anchor_offsets",
+    )
+
+    def __init__(self, base_url: str, locations: typing.Mapping[str, str]) -> None:
+        self.base_url = sys.intern(base_url)
+        keys = sorted(locations)
+        pages: dict[str, int] = {}
+        self._page_ids = array("I")
+        anchors = []
+        for key in keys:
+            page, separator, anchor = locations[key].partition("#")
+            self._page_ids.append(pages.setdefault(page, len(pages)))
+            anchors.append(separator + anchor)
+
+        self._keys, self._key_offsets = _pack(keys)
+        self._anchors, self._anchor_offsets = _pack(anchors)
+        self._pages = tuple(pages)
+
+    def __len__(self) -> int:
+        return len(self._key_offsets) - 1
+
+    def __iter__(self) -> typing.Iterator[str]:
+        keys, offsets = self._keys, self._key_offsets
+        return (keys[offsets[i] : offsets[i + 1]] for i in range(len(self)))
+
+    def __getitem__(self, key: str) -> str:
+        return os.path.join(self.base_url, self.location(self._find(key)))
+
+    def _key(self, index: int) -> str:
+        return self._keys[self._key_offsets[index] : self._key_offsets[index + 1]]
+
+    def _bisect(self, key: str) -> int:
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, key: str) -> int:
+        index = self._bisect(key)
+        if index == len(self) or self._key(index) != key:
+            raise KeyError(key)
+        return index
+
+    def prefixed(self, prefix: str, limit: int) -> list[str]:
+        """Returns up to `limit` keys starting with `prefix`, in order."""
+        keys = []
+        for index in range(self._bisect(prefix), len(self)):
+            key = self._key(index)
+            if len(keys) == limit or not key.startswith(prefix):
+                break
+            keys.append(key)
+        return keys
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self._keys)
+            + sys.getsizeof(self._key_offsets)
+            + sys.getsizeof(self._anchors)
+            + sys.getsizeof(self._anchor_offsets)
+            + sys.getsizeof(self._page_ids)
+            + sys.getsizeof(self._pages)
+            + sum(map(sys.getsizeof, self._pages))
+        )
 
-class RTFMManager:
-    def __init__(self, slug, url):
-        self._slug = slug
-        self._url = url
-        self._rtfm_cache = {}
+    def location(self, index: int) -> str:
+        """The location of the entry at `index`, relative to the base URL."""
+        anchor = self._anchors[
+            self._anchor_offsets[index] : self._anchor_offsets[index + 1]
+        ]
+        return self._pages[self._page_ids[index]] + anchor
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to the keys containing them.
+
+    The keys sharing the most trigrams with a query are scored first, which
+    sets a score cutoff. Only the keys whose length still allows them to reach
+    that cutoff are then compared, so results are the same as a full
+    `process.extract` scan with `fuzz.QRatio`, without comparing the keys that
+    are too short or too long to compete.
+    """
+
+    CANDIDATES = 64
+
+    def __init__(self, keys: typing.Iterable[str]) -> None:
+        self.keys = list(keys)
+        # Keys are indexed the way process.extract preprocesses them
+        self._processed = [default_process(key) for key in self.keys]
+        postings: defaultdict[str, array] = defaultdict(lambda: array("I"))
+        for index, key in enumerate(self._processed):
+            for trigram in self.trigrams(key):
+                postings[trigram].append(index)
+        self._postings = dict(postings)
+        self._common = max(len(self.keys) // 8, self.CANDIDATES)
+
+        self._by_length = array(
+            "I", sorted(range(len(self.keys)), key=lambda i: len(self._processed[i]))
+        )
+        self._by_length_keys = [self._processed[i] for i in self._by_length]
+        self._lengths = array("I", map(len, self._by_length_keys))
+        self.nbytes = self._size()
+
+    def _size(self) -> int:
+        # _by_length_keys shares its strings with _processed
+        return (
+            sum(map(sys.getsizeof, (self.keys, self._processed, self._postings)))
+            + sum(map(sys.getsizeof, self.keys))
+            + sum(map(sys.getsizeof, self._processed))
+            + sum(map(sys.getsizeof, self._postings))
+            + sum(map(sys.getsizeof, self._postings.values()))
+            + sys.getsizeof(self._by_length)
+            + sys.getsizeof(self._by_length_keys)
+            + sys.getsizeof(self._lengths)
+        )
 
-    def purge_cache(self):
-        del self._rtfm_cache
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def trigrams(text: str) -> set[str]:
+        # Padding lets short words and word boundaries produce trigrams
+        text = f"  {text} "
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def candidates(self, query: str) -> list[int]:
+        """
+        Returns the indexes of the keys sharing the most trigrams with the
+        preprocessed query.
+        """
+        shared = Counter()
+        for trigram in self.trigrams(query):
+            postings = self._postings.get(trigram, ())
+            # Trigrams most keys contain cost the most and tell the least
+            if len(postings) <= self._common:
+                shared.update(postings)
+
+        return [index for index, _ in shared.most_common(self.CANDIDATES)]
+
+    def _length_range(self, length: int, cutoff: float) -> tuple[int, int]:
+        """
+        Returns the slice of `_by_length` whose keys can score at least
+        `cutoff`. QRatio is 200 * LCS / (len(a) + len(b)), and the longest
+        common subsequence is at most as long as the shorter string.
+        """
+        if cutoff <= 0:
+            return 0, len(self._lengths)
+
+        shortest = math.floor(cutoff * length / (200 - cutoff)) if cutoff < 200 else 0
+        longest = math.ceil(length * (200 - cutoff) / cutoff)
+        return (
+            bisect.bisect_left(self._lengths, shortest),
+            bisect.bisect_right(self._lengths, longest),
+        )
 
-    def parse_object_inv(self, stream, url):
-        # key: URL
-        result = {}
-
-        # first line is version info
-        inv_version = stream.readline().rstrip()
-
-        if inv_version != "# Sphinx inventory version 2":
-            raise RuntimeError("Invalid objects.inv file version.")
-
-        # next line is "# Project: <name>"
-        # then after that is "# Version: <version>"
-        projname = stream.readline().rstrip()[11:]
-        version = stream.readline().rstrip()[11:]
-
-        # next line says if it's a zlib header
-        line = stream.readline()
-        if "zlib" not in line:
-            raise RuntimeError("Invalid objects.inv file, not z-lib compatible.")
-
-        # This code mostly comes from the Sphinx repository.
-        entry_regex = re.compile(r"(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)")
-        for line in stream.read_compressed_lines():
-            match = entry_regex.match(line.rstrip())
-            if not match:
-                continue
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float, int]]:
+        """
+        Returns `(key, score, index)` tuples like `process.extract`.
+        """
+        processed = default_process(query)
+        candidates = self.candidates(processed)
+        scores = [
+            fuzz.QRatio(processed, self._processed[index], processor=None)
+            for index in candidates
+        ]
+        best = sorted(scores, reverse=True)[:limit]
+        cutoff = best[-1] if len(best) == limit else 0
+
+        start, stop = self._length_range(len(processed), cutoff)
+        if stop - start > len(self.keys) // 2:
+            # A weak best match prunes little, a plain scan is cheaper then
+            return [
+                (self.keys[index], score, index)
+                for _, score, index in process.extract(
+                    processed,
+                    self._processed,
+                    scorer=fuzz.QRatio,
+                    processor=None,
+                    limit=limit,
+                )
+            ]
 
-            name, directive, prio, location, dispname = match.groups()
-            domain, _, subdirective = directive.partition(":")
-            if directive == "py:module" and name in result:
-                # From the Sphinx Repository:
-                # due to a bug in 1.1 and below,
-                # two inventory entries are created
-                # for Python modules, and the first
-                # one is correct
-                continue
+        matches = process.extract(
+            processed,
+            self._by_length_keys[start:stop],
+            scorer=fuzz.QRatio,
+            processor=None,
+            limit=None,
+            score_cutoff=cutoff,
+        )
+
+        # Ties are ordered by position in the inventory, as process.extract does
+        ranked = heapq.nsmallest(
+            limit,
+            (
+                (-score, self._by_length[start + position])
+                for _, score, position in matches
+            ),
+        )
+        return [(self.keys[index], -score, index) for score, index in ranked]
+
+
+def parse_object_inv(stream, slug, url):
+    # key: location relative to the URL
+    result = {}
+
+    # first line is version info
+    inv_version = stream.readline().rstrip()
+
+    if inv_version != "# Sphinx inventory version 2":
+        raise RuntimeError("Invalid objects.inv file version.")
+
+    # next line is "# Project: <name>"
+    # then after that is "# Version: <version>"
+    projname = stream.readline().rstrip()[11:]
+    version = stream.readline().rstrip()[11:]
 
-            # Most documentation pages have a label
-            if directive == "std:doc":
-                subdirective = "label"
+    # next line says if it's a zlib header
+    line = stream.readline()
+    if "zlib" not in line:
+        raise RuntimeError("Invalid objects.inv file, not z-lib compatible.")
 
-            if location.endswith("$"):
-                location = location[:-1] + name
+    # This code mostly comes from the Sphinx repository.
+    entry_regex = re.compile(r"(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s+(\S+)\s+(.*)")
+    for line in stream.read_compressed_lines():
+        match = entry_regex.match(line.rstrip())
+        if not match:
+            continue
 
-            key = name if dispname == "-" else dispname
-            prefix = f"{subdirective}:" if domain == "std" else ""
+        name, directive, prio, location, dispname = match.groups()
+        domain, _, subdirective = directive.partition(":")
+        if directive == "py:module" and name in result:
+            # From the Sphinx Repository:
+            # due to a bug in 1.1 and below,
+            # two inventory entries are created
+            # for Python modules, and the first
+            # one is correct
+            continue
 
-            remove_pref = f"{prefix}{key}".startswith(self._slug + ".")
-            result[
-                f"{prefix}{key}"[len(self._slug + ".") if remove_pref else 0 :]
-            ] = os.path.join(url, location)
+        # Most documentation pages have a label
+        if directive == "std:doc":
+            subdirective = "label"
 
-        return result
+        if location.endswith("$"):
+            location = location[:-1] + name
 
-    async def build_rtfm_lookup_table(self, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url + "/objects.inv") as resp:
-                if resp.status != 200:
-                    raise RuntimeError(
-                        "Cannot build rtfm lookup table, try again later."
-                    )
+        key = name if dispname == "-" else dispname
+        prefix = f"{subdirective}:" if domain == "std" else ""
 
-                stream = SphinxObjectFileReader(await resp.read())
-                cache = self.parse_object_inv(stream, url)
+        remove_pref = f"{prefix}{key}".startswith(slug + ".")
+        result[f"{prefix}{key}"[len(slug + ".") if remove_pref else 0 :]] = location
 
-        self._rtfm_cache = cache
+    return Inventory(url, result)
+
+
+def build_lookup_table(
+    slug: str, url: str, data: bytes
+) -> tuple[Inventory, TrigramIndex]:
+    """
+    Parses and indexes an objects.inv. This is CPU bound, so it runs in the
+    bot's executor and has to stay a module level function.
+    """
+    table = parse_object_inv(SphinxObjectFileReader(data), slug, url)
+    return table, TrigramIndex(table)
+
+
+class RTFMManager:
+    # Bump whenever the layout of the lookup table changes
+    CACHE_VERSION = 2
+
+    def __init__(self, slug, url, cache_dir: Path = RTFM_CACHE_DIR):
+        self._slug = slug
+        self._url = url
+        self._rtfm_cache = Inventory(url, {})
+        self._index: TrigramIndex | None = None
+        self._cache_file = cache_dir / f"{slug}.pickle"
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._validated_at: float | None = None
+        self._revalidation: asyncio.Task | None = None
+        self._refreshes: SingleFlight[str, None] = SingleFlight()
+        # Set by the plugin to the bot's executor, None uses asyncio's default
+        self.executor: Executor | None = None
+        self._completions: OrderedDict[str, list[str]] = OrderedDict()
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._rtfm_cache)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the lookup table and its index."""
+        index = self._index.nbytes if self._index is not None else 0
+        return self._rtfm_cache.nbytes + index
+
+    def purge_cache(self):
+        """
+        Drops the lookup table from memory, the next lookup reloads it from
+        the disk cache.
+        """
+        self.set_lookup_table(Inventory(self._url, {}))
+
+    def delete_disk_cache(self) -> None:
+        self._cache_file.unlink(missing_ok=True)
+
+    def set_lookup_table(
+        self, table: Inventory, index: TrigramIndex | None = None
+    ) -> None:
+        self._rtfm_cache = table
+        self._index = index
+        self._completions.clear()
+
+    async def build_index(self) -> None:
+        """
+        Indexes a table loaded from the disk cache in the executor.
+        """
+        table = self._rtfm_cache
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(self.executor, TrigramIndex, table)
+        if self._rtfm_cache is table:
+            self._index = index
+
+    def search(self, obj: str, limit: int = 10) -> list[tuple[str, float, int]]:
+        if self._index is None:
+            # Still being indexed, scanning is cheaper than indexing on the loop
+            return process.extract(
+                obj, self._rtfm_cache.keys(), scorer=fuzz.QRatio, limit=limit
+            )
+
+        return self._index.search(obj, limit)
+
+    def parse_object_inv(self, stream, url):
+        return parse_object_inv(stream, self._slug, url)
+
+    def load_disk_cache(self) -> bool:
+        """
+        Loads the lookup table saved by a previous run, along with the
+        validators needed to revalidate it against upstream.
+        """
+        try:
+            with self._cache_file.open("rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("Ignoring unreadable RTFM cache %s: %s", self._cache_file, e)
+            return False
+
+        if data.get("version") != self.CACHE_VERSION or data.get("url") != self._url:
+            return False
+
+        self.set_lookup_table(data["table"])
+        self._etag = data["etag"]
+        self._last_modified = data["last_modified"]
+        return True
+
+    def save_disk_cache(self) -> None:
+        data = {
+            "version": self.CACHE_VERSION,
+            "url": self._url,
+            "etag": self._etag,
+            "last_modified": self._last_modified,
+            "table": self._rtfm_cache,
+        }
+        tmp_file = self._cache_file.with_suffix(".tmp")
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with tmp_file.open("wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Readers never see a half written file
+            os.replace(tmp_file, self._cache_file)
+        except OSError as e:
+            logger.warning("Could not write RTFM cache %s: %s", self._cache_file, e)
+
+    async def build_rtfm_lookup_table(
+        self,
+        url,
+        revalidate: bool = False,
+        session: aiohttp.ClientSession | None = None,
+    ):
+        """
+        Downloads and parses objects.inv. With `revalidate`, the request is
+        conditional on the cached ETag/Last-Modified and a 304 keeps the
+        current table.
+        """
+        if session is None:
+            async with aiohttp.ClientSession(timeout=RTFM_TIMEOUT) as session:
+                return await self.build_rtfm_lookup_table(url, revalidate, session)
+
+        headers = {}
+        if revalidate:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+        async with session.get(url + "/objects.inv", headers=headers) as resp:
+            if resp.status == 304:
+                logger.debug("RTFM inventory for %s is up to date", self._slug)
+                self._validated_at = time.monotonic()
+                return
+
+            if resp.status != 200:
+                raise RuntimeError("Cannot build rtfm lookup table, try again later.")
+
+            data = await resp.read()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+
+        loop = asyncio.get_running_loop()
+        cache, index = await loop.run_in_executor(
+            self.executor, build_lookup_table, self._slug, url, data
+        )
+        # Swapped in one step, queries see either the old or the new table
+        self._etag, self._last_modified = etag, last_modified
+        self._validated_at = time.monotonic()
+        self.set_lookup_table(cache, index)
+        self.save_disk_cache()
+
+    async def refresh(self, session: aiohttp.ClientSession | None = None) -> None:
+        """
+        Loads the lookup table, from the disk cache if possible, and
+        revalidates it. Concurrent refreshes share a single download.
+        """
+        await self._refreshes.do(self._url, lambda: self._refresh(session))
+
+    async def _refresh(self, session: aiohttp.ClientSession | None) -> None:
+        if not self._rtfm_cache:
+            self.load_disk_cache()
+        if self._rtfm_cache and self._index is None:
+            await self.build_index()
+
+        await self.build_rtfm_lookup_table(
+            self._url, revalidate=bool(self._rtfm_cache), session=session
+        )
+
+    async def _revalidate(self) -> None:
+        try:
+            await self.refresh()
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+            # The cached table keeps being served until the next refresh
+            logger.warning(
+                "Could not revalidate RTFM inventory for %s: %s", self._slug, e
+            )
+
+    async def ensure_lookup_table(self) -> None:
+        """
+        Serves the on-disk table right away and revalidates it in the
+        background, only downloading in the foreground on a cold cache.
+        """
+        if self._rtfm_cache:
+            return
+
+        if self.load_disk_cache():
+            stale = (
+                self._validated_at is None
+                or time.monotonic() - self._validated_at > REVALIDATE_AFTER
+            )
+            self._revalidation = asyncio.create_task(
+                self._revalidate() if stale else self.build_index()
+            )
+            return
+
+        await self.refresh()
+
+    def autocomplete(self, text: str) -> list[str]:
+        """
+        Returns the choices for what a user typed so far: the keys it is a
+        prefix of, then the best fuzzy matches. Memoized per input, since every
+        keystroke sends a new autocomplete interaction.
+        """
+        text = text.strip()
+        if not text or not self._rtfm_cache:
+            return []
+
+        try:
+            self._completions.move_to_end(text)
+            return self._completions[text]
+        except KeyError:
+            pass
+
+        choices = dict.fromkeys(self._rtfm_cache.prefixed(text, AUTOCOMPLETE_CHOICES))
+        if len(choices) < AUTOCOMPLETE_CHOICES:
+            choices.update(
+                (key, None) for key, _, __ in self.search(text, AUTOCOMPLETE_CHOICES)
+            )
+        completions = [
+            key for key in choices if len(key) <= AUTOCOMPLETE_CHOICE_LENGTH
+        ][:AUTOCOMPLETE_CHOICES]
+
+        self._completions[text] = completions
+        if len(self._completions) > AUTOCOMPLETE_CACHE_SIZE:
+            self._completions.popitem(last=False)
+        return completions
 
     async def do_rtfm(self, obj: str) -> str | hikari.Embed:
         if obj is None:
             return self._url
 
-        if not self._rtfm_cache:
-            await self.build_rtfm_lookup_table(self._url)
+        await self.ensure_lookup_table()
 
-        matches = process.extract(
-            obj, self._rtfm_cache.keys(), scorer=fuzz.QRatio, limit=10
-        )
+        matches = self.search(obj, limit=10)
 
         e = hikari.Embed(colour=EmbedColors.INFO, title=f"RTFM for {obj}").set_footer(
             text=f"Module: {self._slug}"
@@ -141,3 +620,176 @@ class RTFMManager:
             f"[`{key}`]({self._rtfm_cache[key]})" for key, _, __ in matches
         )
         return e
+
+
+async def refresh_rtfm_sources(
+    managers: typing.Iterable[RTFMManager],
+    concurrency: int = 4,
+    on_refreshed: typing.Callable[[RTFMManager], None] | None = None,
+) -> None:
+    """
+    Loads or revalidates the sources over one HTTP session, `concurrency` at a
+    time. A source that fails keeps serving its current table.
+    """
+    managers = list(managers)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def refresh(manager: RTFMManager) -> None:
+        async with semaphore:
+            await manager.refresh(session)
+        if on_refreshed is not None:
+            on_refreshed(manager)
+
+    async with aiohttp.ClientSession(timeout=RTFM_TIMEOUT) as session:
+        results = await asyncio.gather(*map(refresh, managers), return_exceptions=True)
+
+    refreshed = 0
+    for manager, result in zip(managers, results):
+        if isinstance(result, Exception):
+            logger.warning(
+                "Could not refresh RTFM inventory for %s: %s", manager._slug, result
+            )
+        else:
+            refreshed += 1
+    logger.info("Refreshed %d/%d RTFM source(s)", refreshed, len(managers))
+
+
+class RTFMRegistry:
+    """
+    The documentation sources /rtfm can search, by name.
+
+    Lookup tables are loaded on use and kept in least recently used order.
+    Whenever the loaded tables exceed the memory budget, the least recently
+    used ones are dropped from memory; they are reloaded from the disk cache
+    the next time they are searched.
+    """
+
+    def __init__(self, memory_budget: int, cache_dir: Path = RTFM_CACHE_DIR) -> None:
+        self.memory_budget = memory_budget
+        self.evictions = 0
+        self._cache_dir = cache_dir
+        self._managers: OrderedDict[str, RTFMManager] = OrderedDict()
+        self._executor: Executor | None = None
+        self._loading: set[asyncio.Task] = set()
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._managers
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(sorted(self._managers))
+
+    def __len__(self) -> int:
+        return len(self._managers)
+
+    @property
+    def executor(self) -> Executor | None:
+        return self._executor
+
+    @executor.setter
+    def executor(self, executor: Executor | None) -> None:
+        self._executor = executor
+        for manager in self._managers.values():
+            manager.executor = executor
+
+    @property
+    def nbytes(self) -> int:
+        return sum(manager.nbytes for manager in self._managers.values())
+
+    @property
+    def loaded(self) -> list[str]:
+        return [slug for slug, manager in self._managers.items() if manager.loaded]
+
+    def get(self, slug: str) -> RTFMManager:
+        """
+        Returns a source and marks it as the most recently used. Indexes
+        finish building in the background, so this also catches up on the
+        memory budget.
+        """
+        manager = self._managers[slug]
+        self._managers.move_to_end(slug)
+        self.enforce_budget()
+        return manager
+
+    def create(self, slug: str, url: str) -> RTFMManager:
+        """Builds a source without registering it, to check it first."""
+        manager = RTFMManager(slug, url, self._cache_dir)
+        manager.executor = self._executor
+        return manager
+
+    def add(self, slug: str, url: str) -> RTFMManager:
+        """Registers a source, replacing the one registered under that name."""
+        return self.put(slug, self.create(slug, url))
+
+    def put(self, slug: str, manager: RTFMManager) -> RTFMManager:
+        """Registers a built source, replacing the one registered under that name."""
+        replaced = self._managers.pop(slug, None)
+        if replaced is not None:
+            # The disk cache is shared by name and kept, a cache of another
+            # URL is rejected when loaded
+            replaced.purge_cache()
+
+        self._managers[slug] = manager
+        return manager
+
+    def remove(self, slug: str) -> None:
+        manager = self._managers.pop(slug)
+        manager.purge_cache()
+        manager.delete_disk_cache()
+
+    def enforce_budget(self) -> None:
+        """
+        Drops the least recently used tables until the loaded ones fit in the
+        memory budget. The most recently used table is always kept.
+        """
+        nbytes = self.nbytes
+        for slug, manager in list(self._managers.items())[:-1]:
+            if nbytes <= self.memory_budget:
+                break
+            if manager.loaded:
+                nbytes -= manager.nbytes
+                manager.purge_cache()
+                self.evictions += 1
+                logger.debug("Evicted RTFM inventory for %s", slug)
+
+    async def do_rtfm(self, slug: str, obj: str) -> str | hikari.Embed:
+        response = await self.get(slug).do_rtfm(obj)
+        self.enforce_budget()
+        return response
+
+    def autocomplete(self, slug: str, text: str) -> list[str]:
+        """
+        Completes from loaded sources only, a source that is not loaded is
+        loaded in the background for the next keystrokes.
+        """
+        if slug not in self._managers:
+            return []
+
+        manager = self.get(slug)
+        if not manager.loaded:
+            task = asyncio.create_task(self._load(manager))
+            self._loading.add(task)
+            task.add_done_callback(self._loading.discard)
+            return []
+
+        return manager.autocomplete(text)
+
+    async def _load(self, manager: RTFMManager) -> None:
+        try:
+            await manager.ensure_lookup_table()
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+            logger.warning("Could not load RTFM inventory for %s: %s", manager._slug, e)
+        self.enforce_budget()
+
+    async def refresh(self, loaded_only: bool = False) -> None:
+        """
+        Refreshes every source, or only the loaded ones, keeping the memory
+        budget as the tables come in.
+        """
+        managers = [
+            manager
+            for manager in self._managers.values()
+            if manager.loaded or not loaded_only
+        ]
+        await refresh_rtfm_sources(
+            managers, on_refreshed=lambda _: self.enforce_budget()
+        )
@@ -0,0 +1,156 @@
+import logging
+import time
+import typing as t
+from collections import OrderedDict
+
+import aioredis
+import lavasnek_rs
+
+from peacebot.core.utils.utilities import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TRACK_CACHE_SIZE = 512
+TRACK_CACHE_TTL = 6 * 60 * 60
+TRACK_CACHE_PREFIX = "tracks:"
+
+
+def is_url(query: str) -> bool:
+    return query.startswith(("http://", "https://"))
+
+
+def normalize_query(query: str) -> str:
+    """
+    Folds the case and whitespace of a search, so that "Never  Gonna" and
+    "never gonna" share an entry. URLs are kept as they are, their ids are
+    case sensitive.
+    """
+    query = query.strip()
+    if is_url(query):
+        return query
+    return " ".join(query.casefold().split())
+
+
+class TrackSearchCache:
+    """
+    Caches the results of `Lavalink.auto_search_tracks`.
+
+    Results are kept in an in-process LRU, in front of a Redis entry shared
+    by every shard that maps a search to the URI of the track it resolved
+    to. lavasnek tracks cannot be rebuilt in Python, so a Redis hit still
+    loads the track by its URI, which skips the YouTube search. Concurrent
+    searches for the same query share a single lookup.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        max_size: int = TRACK_CACHE_SIZE,
+        ttl: int = TRACK_CACHE_TTL,
+        on_lookup: t.Callable[[str, float], None] | None = None,
+    ) -> None:
+        self._redis = redis
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_lookup = on_lookup
+        self._tracks: OrderedDict[str, tuple[float, lavasnek_rs.Tracks]] = OrderedDict()
+        self._lookups: SingleFlight[str, lavasnek_rs.Tracks] = SingleFlight()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.saved = 0.0
+        self._search_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    async def search(
+        self, lavalink: lavasnek_rs.Lavalink, query: str
+    ) -> lavasnek_rs.Tracks:
+        start = time.perf_counter()
+        key = normalize_query(query)
+        tracks = self._get(key)
+        if tracks is not None:
+            self.hits += 1
+            self._observe("memory", start)
+            return tracks
+
+        return await self._lookups.do(key, lambda: self._lookup(lavalink, key, start))
+
+    async def _lookup(
+        self, lavalink: lavasnek_rs.Lavalink, key: str, start: float
+    ) -> lavasnek_rs.Tracks:
+        uri = await self._get_uri(key)
+        if uri is not None:
+            tracks = await lavalink.get_tracks(uri)
+            if tracks.tracks:
+                self.redis_hits += 1
+                self._put(key, tracks)
+                self._observe("redis", start)
+                return tracks
+
+        tracks = await lavalink.auto_search_tracks(key)
+        self.misses += 1
+        self._search_time += time.perf_counter() - start
+        self._observe("lavalink", start)
+        if not tracks.tracks:
+            return tracks
+
+        self._put(key, tracks)
+        # Playlists and direct links are loaded without a search anyway
+        if not is_url(key) and not tracks.playlist_info.name:
+            await self._set_uri(key, tracks.tracks[0].info.uri)
+        return tracks
+
+    def _get(self, key: str) -> lavasnek_rs.Tracks | None:
+        try:
+            expires, tracks = self._tracks[key]
+        except KeyError:
+            return None
+
+        if expires < time.monotonic():
+            del self._tracks[key]
+            return None
+
+        self._tracks.move_to_end(key)
+        return tracks
+
+    def _put(self, key: str, tracks: lavasnek_rs.Tracks) -> None:
+        self._tracks[key] = (time.monotonic() + self.ttl, tracks)
+        self._tracks.move_to_end(key)
+        while len(self._tracks) > self.max_size:
+            self._tracks.popitem(last=False)
+
+    async def _get_uri(self, key: str) -> str | None:
+        if is_url(key):
+            return None
+
+        try:
+            uri = await self._redis.get(TRACK_CACHE_PREFIX + key)
+        except aioredis.RedisError:
+            logger.warning("Could not read the cached track of %r", key, exc_info=True)
+            return None
+        return uri.decode() if uri is not None else None
+
+    async def _set_uri(self, key: str, uri: str) -> None:
+        try:
+            await self._redis.set(TRACK_CACHE_PREFIX + key, uri, ex=self.ttl)
+        except aioredis.RedisError:
+            logger.warning("Could not cache the track of %r", key, exc_info=True)
+
+    def _observe(self, source: str, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        if source != "lavalink" and self.misses:
+            self.saved += max(self._search_time / self.misses - elapsed, 0.0)
+        if self.on_lookup is not None:
+            self.on_lookup(source, elapsed)
+
+    @property
+    def coalesced(self) -> int:
+        """Number of searches that waited on another search's lookup."""
+        return self._lookups.coalesced
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.redis_hits + self.misses
+        return (self.hits + self.redis_hits) / lookups if lookups else 0.0
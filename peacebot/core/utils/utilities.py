@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import typing as t
 
+_KeyT = t.TypeVar("_KeyT")
 _ValueT = t.TypeVar("_ValueT")
 T = t.TypeVar("T")
 
@@ -16,3 +18,33 @@ def _chunk(iterator: t.Iterator[_ValueT], max: int) -> t.Iterator[list[_ValueT]]
 
     if chunk:
         yield chunk
+
+
+class SingleFlight(t.Generic[_KeyT, T]):
+    """
+    Coalesces concurrent calls for the same key into a single in-flight task.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[_KeyT, asyncio.Task[T]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: _KeyT, func: t.Callable[[], t.Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: _KeyT, task: asyncio.Task[T]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
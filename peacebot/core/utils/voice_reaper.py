@@ -0,0 +1,159 @@
+import logging
+import time
+import typing as t
+
+import hikari
+
+if t.TYPE_CHECKING:
+    from peacebot.core.bot import Peacebot
+
+logger = logging.getLogger(__name__)
+
+REAP_IDLE_AFTER = 5 * 60
+REAP_INTERVAL = 30
+REAP_JOB = "voice-session-reaper"
+
+
+async def end_voice_session(bot: "Peacebot", guild_id: int) -> None:
+    """Ends the guild's voice session and frees everything it holds."""
+    lavalink = bot.d.data.lavalink
+    bot.d.queues.discard(guild_id)
+    bot.d.queue_store.forget(guild_id)
+    bot.d.voice_reaper.forget(guild_id)
+    await bot.d.now_playing.close(guild_id)
+    await lavalink.destroy(guild_id)
+    await lavalink.stop(guild_id)
+    await lavalink.leave(guild_id)
+    await lavalink.remove_guild_node(guild_id)
+    await lavalink.remove_guild_from_loops(guild_id)
+
+
+class VoiceSessionReaper:
+    """
+    Tears down the voice sessions nobody listens to.
+
+    A session is idle while the bot is alone in its voice channel, or while
+    nothing is playing. The bot's voice state events add and remove sessions,
+    and someone joining the bot's channel makes its session active again
+    right away. `reap` runs every REAP_INTERVAL seconds, rechecks each
+    session, and tears down those that stayed idle for `idle_after` seconds
+    with `teardown`, by default the same way the leave command does.
+    """
+
+    def __init__(
+        self,
+        bot: "Peacebot",
+        idle_after: float = REAP_IDLE_AFTER,
+        teardown: t.Callable[[int], t.Awaitable[None]] | None = None,
+    ) -> None:
+        self.bot = bot
+        self.teardown = teardown or (
+            lambda guild_id: end_voice_session(self.bot, guild_id)
+        )
+        self.idle_after = idle_after
+        # guild id -> since when the session is idle, None while it is active
+        self._sessions: dict[int, float | None] = {}
+        self._reaping = False
+        self.reaped = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._sessions
+
+    @property
+    def idle(self) -> int:
+        return sum(since is not None for since in self._sessions.values())
+
+    @property
+    def active(self) -> int:
+        return len(self._sessions) - self.idle
+
+    def idle_since(self, guild_id: int) -> float | None:
+        return self._sessions.get(guild_id)
+
+    def forget(self, guild_id: int) -> None:
+        self._sessions.pop(guild_id, None)
+
+    async def on_voice_state_update(self, event: hikari.VoiceStateUpdateEvent) -> None:
+        state = event.state
+        if state.user_id == self.bot.get_me().id:
+            if state.channel_id is None:
+                self.forget(state.guild_id)
+            else:
+                # Joined or moved, the next check decides if anyone listens
+                self._sessions[state.guild_id] = None
+            return
+
+        if state.guild_id not in self._sessions or state.member.is_bot:
+            return
+        channel_id = self._channel_of(state.guild_id)
+        if state.channel_id == channel_id:
+            self._sessions[state.guild_id] = None
+        elif event.old_state is not None and event.old_state.channel_id == channel_id:
+            if self._sessions[state.guild_id] is None and not self._has_listeners(
+                state.guild_id, channel_id
+            ):
+                self._sessions[state.guild_id] = time.monotonic()
+
+    def _channel_of(self, guild_id: int) -> int | None:
+        voice_state = self.bot.cache.get_voice_state(guild_id, self.bot.get_me())
+        return voice_state.channel_id if voice_state is not None else None
+
+    def _has_listeners(self, guild_id: int, channel_id: int | None) -> bool:
+        if channel_id is None:
+            return False
+        states = self.bot.cache.get_voice_states_view_for_guild(guild_id)
+        return any(
+            state.channel_id == channel_id and not state.member.is_bot
+            for state in states.values()
+        )
+
+    async def _is_idle(self, guild_id: int) -> bool:
+        if not self._has_listeners(guild_id, self._channel_of(guild_id)):
+            return True
+
+        lavalink = self.bot.d.data.lavalink
+        if lavalink is None:
+            return False
+        node = await lavalink.get_guild_node(guild_id)
+        return node is None or node.now_playing is None
+
+    async def reap(self) -> None:
+        """Rechecks every session and tears down the ones idle for too long."""
+        if self._reaping:
+            return
+
+        self._reaping = True
+        try:
+            now = time.monotonic()
+            expired = []
+            for guild_id in list(self._sessions):
+                idle = await self._is_idle(guild_id)
+                if guild_id not in self._sessions:
+                    continue
+                if not idle:
+                    self._sessions[guild_id] = None
+                    continue
+
+                since = self._sessions[guild_id]
+                if since is None:
+                    self._sessions[guild_id] = now
+                elif now - since >= self.idle_after:
+                    expired.append(guild_id)
+
+            for guild_id in expired:
+                await self._reap(guild_id)
+        finally:
+            self._reaping = False
+
+    async def _reap(self, guild_id: int) -> None:
+        self.forget(guild_id)
+        try:
+            await self.teardown(guild_id)
+        except Exception:
+            logger.exception("Could not tear down the voice session of %d", guild_id)
+            return
+        self.reaped += 1
+        logger.info("Left the idle voice session of guild %d", guild_id)